@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Conversacion, Mensaje
+from .models import BandejaChat, Conversacion, LecturaConversacion, Mensaje
 
 admin.site.register(Conversacion)
 admin.site.register(Mensaje)
+admin.site.register(LecturaConversacion)
+admin.site.register(BandejaChat)
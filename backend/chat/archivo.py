@@ -0,0 +1,211 @@
+# chat/archivo.py
+"""
+Archivo en frío de mensajes de chat.
+
+`archivar(conversacion_id, hasta)` mueve los mensajes de una conversación
+anteriores a `hasta` a segmentos JSONL comprimidos con gzip (uno por tramo de
+hasta `por_segmento` mensajes) en CHAT_ARCHIVO_ROOT y los borra de la tabla.
+Cada segmento queda registrado en SegmentoArchivo. Como se archiva siempre en
+orden (creado_en, id) y sólo lo anterior a un corte, lo archivado de una
+conversación es un prefijo de su historial: la paginación
+(chat/pagination.py) lee la tabla y, cuando se le acaba, sigue por acá.
+
+Lo archivado sale del índice full-text: la búsqueda de mensajes
+(/api/mensajes/?search=) ya no lo encuentra. Los archivados que algún
+participante no había leído se descuentan de sus contadores
+(LecturaConversacion.no_leidos y BandejaChat, que cambia de versión) en la
+misma transacción que los borra.
+
+Los segmentos son inmutables; se cachean descomprimidos los últimos leídos.
+"""
+import gzip
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from chat import search_index
+
+CACHE_SEGMENTOS = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def storage():
+    return FileSystemStorage(location=settings.CHAT_ARCHIVO_ROOT)
+
+
+# --------------------------
+# Escritura
+# --------------------------
+
+def _fila(m):
+    return {
+        "id": m["id"], "emisor_id": m["emisor_id"], "contenido": m["contenido"],
+        "creado_en": m["creado_en"].isoformat(),
+    }
+
+
+def archivar(conversacion_id, hasta, por_segmento=5000):
+    """
+    Archiva los mensajes de la conversación con creado_en < `hasta`; dejan de
+    aparecer en la búsqueda y de contar como no leídos.
+    Devuelve la lista de SegmentoArchivo creados.
+    """
+    from chat.models import (
+        Conversacion, LecturaConversacion, Mensaje, SegmentoArchivo, bloquear_secuencias, restar_no_leidos,
+    )
+
+    fila = Conversacion.objects.filter(pk=conversacion_id).values_list("cliente_id", "cuidador_id").first()
+    participantes = [u for u in fila or () if u is not None]
+
+    segmentos = []
+    while True:
+        filas = list(
+            Mensaje.objects.filter(conversacion_id=conversacion_id, creado_en__lt=hasta)
+            .order_by("creado_en", "id")
+            .values("id", "emisor_id", "contenido", "creado_en")[:por_segmento]
+        )
+        if not filas:
+            return segmentos
+        crudo = "".join(json.dumps(_fila(m), ensure_ascii=False) + "\n" for m in filas).encode()
+        comprimido = gzip.compress(crudo, compresslevel=6)
+        nombre = storage().save(
+            f"{conversacion_id}/{filas[0]['id']}-{filas[-1]['id']}.jsonl.gz", ContentFile(comprimido),
+        )
+        ids = [m["id"] for m in filas]
+        try:
+            with transaction.atomic():
+                bloquear_secuencias(participantes)
+                marcas = dict(
+                    LecturaConversacion.objects.select_for_update()
+                    .filter(conversacion_id=conversacion_id, usuario_id__in=participantes)
+                    .values_list("usuario_id", "ultimo_leido_id")
+                )
+                for usuario_id, ultimo in marcas.items():
+                    restar_no_leidos(conversacion_id, usuario_id, sum(
+                        1 for m in filas if m["id"] > ultimo and m["emisor_id"] != usuario_id
+                    ))
+                segmento = SegmentoArchivo.objects.create(
+                    conversacion_id=conversacion_id, archivo=nombre,
+                    desde_id=ids[0], hasta_id=ids[-1],
+                    desde_en=filas[0]["creado_en"], hasta_en=filas[-1]["creado_en"],
+                    cantidad=len(filas), bytes_originales=len(crudo), bytes_comprimidos=len(comprimido),
+                )
+                search_index.eliminar(ids)
+                # sin señales por fila: el índice full-text ya se limpió arriba
+                Mensaje.objects.filter(id__in=ids)._raw_delete(Mensaje.objects.db)
+        except Exception:
+            storage().delete(nombre)
+            raise
+        segmentos.append(segmento)
+
+
+def borrar_archivo(segmento):
+    storage().delete(segmento.archivo)
+
+
+# --------------------------
+# Lectura
+# --------------------------
+
+def leer(segmento):
+    """Filas del segmento (dicts) en orden (creado_en, id)."""
+    clave = (settings.CHAT_ARCHIVO_ROOT, segmento.archivo)
+    with _cache_lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+    with storage().open(segmento.archivo, "rb") as f:
+        texto = gzip.decompress(f.read()).decode()
+    filas = []
+    for linea in texto.splitlines():
+        fila = json.loads(linea)
+        fila["creado_en"] = parse_datetime(fila["creado_en"])
+        filas.append(fila)
+    with _cache_lock:
+        _cache[clave] = filas
+        while len(_cache) > CACHE_SEGMENTOS:
+            _cache.popitem(last=False)
+    return filas
+
+
+def _segmentos(conversacion, descendente=False):
+    from chat.models import SegmentoArchivo
+
+    orden = "-desde_id" if descendente else "desde_id"
+    return SegmentoArchivo.objects.filter(conversacion=conversacion).order_by(orden)
+
+
+def _clave(fila):
+    return fila["creado_en"], fila["id"]
+
+
+def _mensajes(conversacion, filas):
+    """Filas archivadas -> instancias de Mensaje (no guardadas) con su emisor."""
+    from chat.models import Mensaje
+
+    usuarios = get_user_model().objects.in_bulk({f["emisor_id"] for f in filas})
+    mensajes = []
+    for f in filas:
+        if f["emisor_id"] not in usuarios:
+            continue
+        m = Mensaje(id=f["id"], conversacion_id=conversacion.pk, emisor_id=f["emisor_id"],
+                    contenido=f["contenido"], creado_en=f["creado_en"])
+        m.emisor = usuarios[f["emisor_id"]]
+        m.archivado = True
+        mensajes.append(m)
+    return mensajes
+
+
+def ancla(conversacion, mensaje_id):
+    """{"creado_en", "id", "archivado": True} del mensaje archivado, o None."""
+    segmento = _segmentos(conversacion).filter(desde_id__lte=mensaje_id, hasta_id__gte=mensaje_id).first()
+    if segmento is None:
+        return None
+    for fila in leer(segmento):
+        if fila["id"] == mensaje_id:
+            return {"creado_en": fila["creado_en"], "id": fila["id"], "archivado": True}
+    return None
+
+
+def anteriores(conversacion, desde, n):
+    """
+    Hasta `n` mensajes archivados anteriores al ancla `desde` (o los últimos
+    archivados si es None), del más nuevo al más viejo.
+    """
+    filas = []
+    if n <= 0:
+        return filas
+    segmentos = _segmentos(conversacion, descendente=True)
+    if desde is not None:
+        segmentos = segmentos.filter(desde_id__lte=desde["id"])
+    for segmento in segmentos.iterator():
+        for fila in reversed(leer(segmento)):
+            if desde is None or _clave(fila) < (desde["creado_en"], desde["id"]):
+                filas.append(fila)
+                if len(filas) == n:
+                    return _mensajes(conversacion, filas)
+    return _mensajes(conversacion, filas)
+
+
+def posteriores(conversacion, desde, n, incluida=False):
+    """Hasta `n` mensajes archivados posteriores al ancla `desde`, en orden cronológico."""
+    filas = []
+    if n <= 0:
+        return filas
+    clave = (desde["creado_en"], desde["id"])
+    for segmento in _segmentos(conversacion).filter(hasta_id__gte=desde["id"]).iterator():
+        for fila in leer(segmento):
+            if _clave(fila) > clave or (incluida and _clave(fila) == clave):
+                filas.append(fila)
+                if len(filas) == n:
+                    return _mensajes(conversacion, filas)
+    return _mensajes(conversacion, filas)
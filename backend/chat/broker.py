@@ -0,0 +1,86 @@
+# chat/broker.py
+"""
+Fan-out de eventos de chat hacia los WebSockets conectados.
+
+Un broker reparte eventos (dicts serializables a JSON) por canal; cada socket
+se suscribe al canal de su usuario con una asyncio.Queue. `publish` es
+síncrono y se puede llamar desde cualquier hilo (las vistas de Django corren
+en un thread pool bajo ASGI): la entrega entra al event loop del socket con
+`call_soon_threadsafe`.
+
+El default es `InMemoryBroker`, que alcanza para un solo proceso. Con varios
+workers o nodos se configura otro en `CHAT_BROKER` (ruta a una subclase de
+`Broker`, p.ej. una sobre Redis pub/sub que reenvíe a un InMemoryBroker local).
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# evento que reemplaza a la cola si un socket no da abasto: el cliente re-sincroniza por REST
+RESYNC = {"type": "resync"}
+
+
+class Broker:
+    def publish(self, canal, evento):
+        raise NotImplementedError
+
+    def subscribe(self, canal, cola, loop):
+        raise NotImplementedError
+
+    def unsubscribe(self, canal, cola):
+        raise NotImplementedError
+
+
+def entregar(cola, evento):
+    try:
+        cola.put_nowait(evento)
+    except asyncio.QueueFull:  # consumidor lento
+        while not cola.empty():
+            cola.get_nowait()
+        cola.put_nowait(RESYNC)
+
+
+class InMemoryBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs = defaultdict(dict)  # canal -> {cola: loop}
+
+    def publish(self, canal, evento):
+        with self._lock:
+            destinos = list(self._subs.get(canal, {}).items())
+        for cola, loop in destinos:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(entregar, cola, evento)
+        return len(destinos)
+
+    def subscribe(self, canal, cola, loop):
+        with self._lock:
+            self._subs[canal][cola] = loop
+
+    def unsubscribe(self, canal, cola):
+        with self._lock:
+            subs = self._subs.get(canal)
+            if subs is not None:
+                subs.pop(cola, None)
+                if not subs:
+                    del self._subs[canal]
+
+    def conexiones(self):
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, "CHAT_BROKER", "chat.broker.InMemoryBroker"))()
+    return _broker
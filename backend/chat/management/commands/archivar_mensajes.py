@@ -0,0 +1,76 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from chat import archivo
+from chat.models import Mensaje
+
+
+def _paginas_libres():
+    """Bytes en páginas libres de SQLite (lo que un VACUUM devolvería al disco)."""
+    if connection.vendor != "sqlite":
+        return None
+    with connection.cursor() as cur:
+        cur.execute("PRAGMA freelist_count")
+        libres = cur.fetchone()[0]
+        cur.execute("PRAGMA page_size")
+        return libres * cur.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los mensajes de chat más viejos que --dias (CHAT_ARCHIVO_DIAS) a "
+        "segmentos JSONL gzip por conversación y los borra de la tabla. Informa "
+        "bytes liberados y velocidad. La paginación del historial lee el archivo; "
+        "la búsqueda de mensajes no (lo archivado deja de aparecer en ?search=). "
+        "Los archivados sin leer se descuentan de los contadores de no leídos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=None)
+        parser.add_argument("--por-segmento", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Sólo cuenta lo que se archivaría.")
+
+    def handle(self, *args, **opts):
+        dias = settings.CHAT_ARCHIVO_DIAS if opts["dias"] is None else opts["dias"]
+        if dias < 0 or opts["por_segmento"] < 1:
+            raise CommandError("--dias no puede ser negativo y --por-segmento tiene que ser positivo.")
+        corte = timezone.now() - timedelta(days=dias)
+        viejos = Mensaje.objects.filter(creado_en__lt=corte)
+        conversaciones = list(viejos.order_by().values_list("conversacion_id", flat=True).distinct())
+
+        if opts["dry_run"]:
+            self.stdout.write(
+                f"Se archivarían {viejos.count()} mensajes de {len(conversaciones)} conversaciones "
+                f"(anteriores a {corte:%Y-%m-%d})."
+            )
+            return
+
+        libres_antes = _paginas_libres()
+        t0 = time.perf_counter()
+        segmentos = []
+        for conversacion_id in conversaciones:
+            segmentos += archivo.archivar(conversacion_id, corte, por_segmento=opts["por_segmento"])
+        segundos = time.perf_counter() - t0
+
+        mensajes = sum(s.cantidad for s in segmentos)
+        originales = sum(s.bytes_originales for s in segmentos)
+        comprimidos = sum(s.bytes_comprimidos for s in segmentos)
+        self.stdout.write(
+            f"{mensajes} mensajes de {len(conversaciones)} conversaciones en {len(segmentos)} segmentos "
+            f"({originales / 1024:.1f} KiB de contenido -> {comprimidos / 1024:.1f} KiB gzip"
+            + (f", {originales / comprimidos:.1f}x" if comprimidos else "") + ")"
+        )
+        if libres_antes is not None:
+            liberados = _paginas_libres() - libres_antes
+            self.stdout.write(f"Bytes liberados en la base: {liberados} (páginas libres; VACUUM los devuelve al disco)")
+        if segundos > 0 and mensajes:
+            self.stdout.write(
+                f"Throughput: {mensajes / segundos:.0f} mensajes/s, {originales / segundos / 1024 / 1024:.2f} MiB/s "
+                f"({segundos:.2f} s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Archivado terminado."))
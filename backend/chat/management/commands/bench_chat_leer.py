@@ -0,0 +1,100 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chat.models import Conversacion, LecturaConversacion, Mensaje, reconstruir_contadores
+from chat.views import ConversacionViewSet
+from users.models import Usuario
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de marcar como leído: POST /conversaciones/{id}/leer/ y /leer-todo/ "
+        "con conversaciones de --mensajes no leídos (10k por defecto). Los datos se "
+        "crean dentro de una transacción que se descarta al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mensajes", type=int, default=10000)
+        parser.add_argument("--conversaciones", type=int, default=5)
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        if opts["mensajes"] < 1 or opts["conversaciones"] < 1:
+            raise CommandError("--mensajes y --conversaciones tienen que ser positivos.")
+        try:
+            with transaction.atomic():
+                self._medir(opts["mensajes"], opts["conversaciones"], opts["repeticiones"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _poblar(self, lector, clientes, n):
+        convs = Conversacion.objects.bulk_create([Conversacion(cliente=c, cuidador=lector) for c in clientes])
+        for conv in convs:
+            Mensaje.objects.bulk_create(
+                [Mensaje(conversacion=conv, emisor=conv.cliente, contenido=f"mensaje {i}") for i in range(n)],
+                batch_size=2000,
+            )
+            ultimo = conv.mensajes.order_by("-id").first()
+            conv.registrar_mensaje(ultimo)
+        # marcas en cero y contadores desde los mensajes (bulk_create no pasa por registrar_mensaje)
+        LecturaConversacion.objects.filter(usuario=lector, conversacion__in=convs).update(ultimo_leido_id=0)
+        reconstruir_contadores()
+        return convs
+
+    def _post(self, view, lector, url, **kwargs):
+        request = APIRequestFactory().post(url)
+        force_authenticate(request, user=lector)
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            response = view(request, **kwargs)
+            ms = (time.perf_counter() - t0) * 1000
+        if response.status_code != 200:
+            raise CommandError(f"{url}: {response.status_code} {response.data}")
+        return ms, len(ctx.captured_queries), response.data
+
+    def _medir(self, n, k, repeticiones):
+        lector = Usuario.objects.create(username="bench-leer-lector", password="!")
+        clientes = Usuario.objects.bulk_create(
+            [Usuario(username=f"bench-leer-{i}", password="!") for i in range(k * repeticiones)]
+        )
+        leer = ConversacionViewSet.as_view({"post": "leer"})
+        leer_todo = ConversacionViewSet.as_view({"post": "leer_todo"})
+
+        tiempos, queries = [], None
+        for r in range(repeticiones):
+            conv, = self._poblar(lector, clientes[r * k: r * k + 1], n)
+            ms, queries, data = self._post(leer, lector, f"/api/conversaciones/{conv.id}/leer/", pk=conv.id)
+            if data["no_leidos"] != 0:
+                raise CommandError("La conversación no quedó leída.")
+            tiempos.append(ms)
+        tiempos.sort()
+        self.stdout.write(
+            f"leer/ con {n} no leídos: p50 {tiempos[len(tiempos) // 2]:.2f} ms | max {tiempos[-1]:.2f} ms | "
+            f"{queries} queries"
+        )
+
+        LecturaConversacion.objects.filter(usuario=lector).delete()
+        Conversacion.objects.filter(cuidador=lector).delete()
+        tiempos = []
+        for r in range(repeticiones):
+            self._poblar(lector, clientes[r * k: (r + 1) * k], n)
+            antes = sum(LecturaConversacion.objects.filter(usuario=lector).values_list("no_leidos", flat=True))
+            ms, queries, data = self._post(leer_todo, lector, "/api/conversaciones/leer-todo/")
+            if data["count"] != 0:
+                raise CommandError("Quedaron mensajes sin leer.")
+            tiempos.append(ms)
+        tiempos.sort()
+        self.stdout.write(
+            f"leer-todo/ con {k} conversaciones x {n} no leídos ({antes} en total): "
+            f"p50 {tiempos[len(tiempos) // 2]:.2f} ms | max {tiempos[-1]:.2f} ms | {queries} queries"
+        )
@@ -0,0 +1,133 @@
+import asyncio
+import random
+import threading
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat import ws
+from chat.broker import get_broker
+from chat.realtime import canal_usuario
+from users.models import Usuario
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _Socket:
+    """Conexión simulada: el protocolo ASGI de websocket sin red."""
+
+    def __init__(self, usuario_id, token):
+        self.usuario_id = usuario_id
+        self.entrada = asyncio.Queue()
+        self.aceptado = asyncio.Event()
+        self.scope = {"type": "websocket", "path": ws.PATH, "query_string": f"token={token}".encode(), "headers": []}
+        self.al_recibir = None
+
+    async def send(self, evento):
+        if evento["type"] == "websocket.accept":
+            self.aceptado.set()
+        elif evento["type"] == "websocket.send" and self.al_recibir:
+            self.al_recibir()
+        elif evento["type"] == "websocket.close":
+            raise RuntimeError(f"socket {self.usuario_id} rechazado")
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del WebSocket de chat en proceso: abre N sockets ociosos "
+        "(sin red) y mide memoria por socket, tiempo de conexión y latencia de fan-out. "
+        "Los usuarios se crean dentro de una transacción que se descarta al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sockets", type=int, default=3000)
+        parser.add_argument("--mensajes", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        if opts["sockets"] < 1:
+            raise CommandError("--sockets tiene que ser positivo.")
+        try:
+            with transaction.atomic():
+                usuarios = Usuario.objects.bulk_create(
+                    [Usuario(username=f"bench-ws-{i}", password="!") for i in range(opts["sockets"])],
+                    batch_size=2000,
+                )
+                tokens = [(u.id, str(AccessToken.for_user(u))) for u in usuarios]
+                async_to_sync(self._medir)(tokens, opts["mensajes"], random.Random(opts["seed"]))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    async def _medir(self, tokens, mensajes, rnd):
+        broker = get_broker()
+        base = broker.conexiones()
+        sockets = [_Socket(uid, token) for uid, token in tokens]
+
+        tracemalloc.start()
+        mem0 = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        tareas = []
+        for s in sockets:
+            tareas.append(asyncio.create_task(ws.chat_websocket(s.scope, s.entrada.get, s.send)))
+            s.entrada.put_nowait({"type": "websocket.connect"})
+        await asyncio.gather(*(s.aceptado.wait() for s in sockets))
+        conexion = time.perf_counter() - t0
+        por_socket = (tracemalloc.get_traced_memory()[0] - mem0) / len(sockets)
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{len(sockets)} sockets abiertos en {conexion * 1000:.0f} ms "
+            f"(~{por_socket / 1024:.1f} KiB por socket ocioso, {broker.conexiones() - base} suscripciones)"
+        )
+
+        loop = asyncio.get_running_loop()
+
+        # fan-out: un evento a cada socket, publicado desde otro hilo como lo haría una vista
+        pendientes = [len(sockets)]
+        listo = asyncio.Event()
+
+        def recibido():
+            pendientes[0] -= 1
+            if pendientes[0] == 0:
+                listo.set()
+
+        for s in sockets:
+            s.al_recibir = recibido
+        t0 = time.perf_counter()
+        hilo = threading.Thread(
+            target=lambda: [broker.publish(canal_usuario(s.usuario_id), {"type": "bench"}) for s in sockets]
+        )
+        hilo.start()
+        await listo.wait()
+        hilo.join()
+        self.stdout.write(f"fan-out a {len(sockets)} sockets: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        # latencia de un mensaje punto a punto con todos los demás sockets ociosos
+        latencias = []
+        for _ in range(mensajes):
+            s = rnd.choice(sockets)
+            llegada = asyncio.Event()
+            s.al_recibir = llegada.set
+            t0 = time.perf_counter()
+            await loop.run_in_executor(None, broker.publish, canal_usuario(s.usuario_id), {"type": "bench"})
+            await llegada.wait()
+            latencias.append(time.perf_counter() - t0)
+            s.al_recibir = None
+        latencias.sort()
+        self.stdout.write(
+            f"latencia publish->send: p50 {latencias[len(latencias) // 2] * 1000:.2f} ms | "
+            f"p99 {latencias[int(len(latencias) * 0.99)] * 1000:.2f} ms"
+        )
+
+        for s in sockets:
+            s.entrada.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(*tareas)
+        if broker.conexiones() != base:
+            raise CommandError("Quedaron suscripciones colgadas después de cerrar los sockets.")
+        self.stdout.write(self.style.SUCCESS("Todos los sockets cerrados, sin suscripciones colgadas."))
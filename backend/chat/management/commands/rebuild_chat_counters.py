@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chat.models import reconstruir_contadores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores de no leídos (por conversación y por usuario) "
+        "desde los mensajes y las marcas de lectura. Para reparar si se desincronizan."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = reconstruir_contadores()
+        self.stdout.write(self.style.SUCCESS(f"Contadores de no leídos reconstruidos: {total} usuarios."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from chat import search_index
+from chat.models import Mensaje
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice full-text de mensajes de chat."
+
+    def handle(self, *args, **options):
+        if not search_index.soportado():
+            self.stdout.write(self.style.WARNING("El motor de base de datos no tiene índice full-text."))
+            return
+        total = search_index.reconstruir(Mensaje.objects.values_list("id", "contenido").iterator())
+        self.stdout.write(self.style.SUCCESS(f"Índice full-text de mensajes reconstruido: {total} mensajes."))
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def leido_por_a_marcas(apps, schema_editor):
+    """
+    Cada (conversación, lector) pasa a tener como marca el mayor id que tenía
+    marcado como leído. Como la app marcaba todo al abrir la conversación, las
+    filas de leido_por son un prefijo de los mensajes ajenos y no se pierde nada.
+    """
+    Mensaje = apps.get_model('chat', 'Mensaje')
+    LecturaConversacion = apps.get_model('chat', 'LecturaConversacion')
+    Through = Mensaje.leido_por.through
+    filas = (
+        Through.objects.order_by()
+        .values('mensaje__conversacion_id', 'usuario_id')
+        .annotate(ultimo=Max('mensaje_id'))
+    )
+    LecturaConversacion.objects.bulk_create(
+        [
+            LecturaConversacion(
+                conversacion_id=f['mensaje__conversacion_id'], usuario_id=f['usuario_id'], ultimo_leido_id=f['ultimo'],
+            )
+            for f in filas.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+def marcas_a_leido_por(apps, schema_editor):
+    Mensaje = apps.get_model('chat', 'Mensaje')
+    LecturaConversacion = apps.get_model('chat', 'LecturaConversacion')
+    Through = Mensaje.leido_por.through
+    for lectura in LecturaConversacion.objects.iterator():
+        ids = (
+            Mensaje.objects
+            .filter(conversacion_id=lectura.conversacion_id, id__lte=lectura.ultimo_leido_id)
+            .exclude(emisor_id=lectura.usuario_id)
+            .values_list('id', flat=True)
+        )
+        Through.objects.bulk_create(
+            [Through(mensaje_id=i, usuario_id=lectura.usuario_id) for i in ids],
+            batch_size=1000, ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LecturaConversacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_leido_id', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('conversacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas', to='chat.conversacion')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas_chat', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('conversacion', 'usuario'), name='uniq_lectura_conv_usuario')],
+            },
+        ),
+        migrations.RunPython(leido_por_a_marcas, marcas_a_leido_por),
+        migrations.RemoveField(
+            model_name='mensaje',
+            name='leido_por',
+        ),
+    ]
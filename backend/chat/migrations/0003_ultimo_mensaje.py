@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+
+def poblar_ultimo_mensaje(apps, schema_editor):
+    Conversacion = apps.get_model('chat', 'Conversacion')
+    Mensaje = apps.get_model('chat', 'Mensaje')
+    ultimo = Mensaje.objects.filter(conversacion=OuterRef('pk')).order_by('-id')[:1]
+    Conversacion.objects.update(
+        ultimo_mensaje_id=Subquery(ultimo.values('id')),
+        ultimo_mensaje_texto=Coalesce(Substr(Subquery(ultimo.values('contenido')), 1, 255), Value('')),
+        ultimo_mensaje_en=Subquery(ultimo.values('creado_en')),
+        ultimo_mensaje_emisor_id=Subquery(ultimo.values('emisor_id')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_lectura_conversacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_mensaje_emisor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_mensaje_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_mensaje_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_mensaje_texto',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(poblar_ultimo_mensaje, migrations.RunPython.noop),
+    ]
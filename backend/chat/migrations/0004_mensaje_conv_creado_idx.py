@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_ultimo_mensaje'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mensaje',
+            index=models.Index(fields=['conversacion', 'creado_en', 'id'], name='mensaje_conv_creado_idx'),
+        ),
+    ]
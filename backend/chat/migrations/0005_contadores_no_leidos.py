@@ -0,0 +1,56 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def llenar_contadores(apps, schema_editor):
+    """
+    Los contadores arrancan desde las marcas de lectura existentes: una fila de
+    LecturaConversacion por participante (con sus no leídos) y el total por
+    usuario en BandejaChat.
+    """
+    Conversacion = apps.get_model("chat", "Conversacion")
+    Mensaje = apps.get_model("chat", "Mensaje")
+    Lectura = apps.get_model("chat", "LecturaConversacion")
+    Bandeja = apps.get_model("chat", "BandejaChat")
+    marcas = {(l.conversacion_id, l.usuario_id): l for l in Lectura.objects.all()}
+    totales = {}
+    for conv in Conversacion.objects.all().iterator():
+        for usuario_id in (conv.cliente_id, conv.cuidador_id):
+            if usuario_id is None:  # participante todavía nulo ("temporal")
+                continue
+            lectura = marcas.get((conv.id, usuario_id)) or Lectura(conversacion_id=conv.id, usuario_id=usuario_id)
+            lectura.no_leidos = (
+                Mensaje.objects.filter(conversacion_id=conv.id, id__gt=lectura.ultimo_leido_id)
+                .exclude(emisor_id=usuario_id).count()
+            )
+            lectura.save()
+            totales[usuario_id] = totales.get(usuario_id, 0) + lectura.no_leidos
+    Bandeja.objects.bulk_create([Bandeja(usuario_id=u, no_leidos=n, version=1) for u, n in totales.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_mensaje_conv_creado_idx'),
+        ('users', '0002_usuario_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BandejaChat',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='bandeja_chat', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('no_leidos', models.IntegerField(default=0)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lecturaconversacion',
+            name='no_leidos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(llenar_contadores, migrations.RunPython.noop),
+    ]
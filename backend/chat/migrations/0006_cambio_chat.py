@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_contadores_no_leidos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioChat',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('mensaje', 'Mensaje nuevo'), ('conversacion', 'Conversación nueva'), ('lectura', 'Lectura')], max_length=12)),
+                ('mensaje_id', models.BigIntegerField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('conversacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='chat.conversacion')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios_chat', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usuario', 'id'], name='cambio_chat_usuario_idx')],
+            },
+        ),
+    ]
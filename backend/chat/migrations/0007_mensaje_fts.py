@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:04
+
+import django.db.models.deletion
+import users.search_index
+from django.db import migrations, models
+
+from chat import search_index
+
+
+def crear_indice(apps, schema_editor):
+    conn = schema_editor.connection
+    if not search_index.soportado(conn):
+        return
+    search_index.crear_tabla(conn)
+    Mensaje = apps.get_model('chat', 'Mensaje')
+    search_index.reconstruir(Mensaje.objects.values_list('id', 'contenido').iterator(), conn)
+
+
+def borrar_indice(apps, schema_editor):
+    search_index.borrar_tabla(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_cambio_chat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MensajeFTS',
+            fields=[
+                ('mensaje', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts', serialize=False, to='chat.mensaje')),
+                ('contenido', models.TextField()),
+                ('documento', users.search_index.FullTextField(db_column='chat_mensaje_fts')),
+            ],
+            options={
+                'db_table': 'chat_mensaje_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_mensaje_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SegmentoArchivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(max_length=255)),
+                ('desde_id', models.BigIntegerField()),
+                ('hasta_id', models.BigIntegerField()),
+                ('desde_en', models.DateTimeField()),
+                ('hasta_en', models.DateTimeField()),
+                ('cantidad', models.PositiveIntegerField()),
+                ('bytes_originales', models.PositiveBigIntegerField()),
+                ('bytes_comprimidos', models.PositiveBigIntegerField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('conversacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segmentos', to='chat.conversacion')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conversacion', 'desde_id'], name='segmento_conv_desde_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,10 @@
 # chat/models.py
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from users.search_index import FullTextField
 
 User = settings.AUTH_USER_MODEL
 
@@ -17,6 +21,13 @@ class Conversacion(models.Model):
     )
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
+    # último mensaje desnormalizado para el listado (ver registrar_mensaje)
+    ultimo_mensaje_id = models.BigIntegerField(null=True, blank=True)
+    ultimo_mensaje_texto = models.CharField(max_length=255, blank=True, default="")
+    ultimo_mensaje_en = models.DateTimeField(null=True, blank=True)
+    ultimo_mensaje_emisor = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
 
     class Meta:
         constraints = [
@@ -26,14 +37,329 @@ class Conversacion(models.Model):
             )
         ]
 
+    TEXTO_MAX = 255
+
+    @transaction.atomic
+    def registrar_mensaje(self, msg):
+        """
+        Actualiza el último mensaje y `actualizado_en` con un solo UPDATE
+        (sólo avanza: si llega tarde un mensaje más viejo no pisa al nuevo) y
+        suma el mensaje a los no leídos del otro participante. Deja el cambio
+        en la secuencia de sync de ambos. Todo en una transacción: llamarla
+        dentro de la misma que crea el mensaje.
+        """
+        bloquear_secuencias((self.cliente_id, self.cuidador_id))
+        campos = {
+            "ultimo_mensaje_id": msg.id,
+            "ultimo_mensaje_texto": msg.contenido[: self.TEXTO_MAX],
+            "ultimo_mensaje_en": msg.creado_en,
+            "ultimo_mensaje_emisor_id": msg.emisor_id,
+            "actualizado_en": timezone.now(),
+        }
+        Conversacion.objects.filter(
+            models.Q(ultimo_mensaje_id__isnull=True) | models.Q(ultimo_mensaje_id__lt=msg.id), pk=self.pk,
+        ).update(**campos)
+        for campo, valor in campos.items():
+            setattr(self, campo, valor)
+        # contadores de no leídos del otro participante
+        for usuario_id in (self.cliente_id, self.cuidador_id):
+            if usuario_id is not None and usuario_id != msg.emisor_id:
+                sumar_no_leido(self.pk, usuario_id, msg.id)
+        registrar_cambio(self, CambioChat.MENSAJE, (self.cliente_id, self.cuidador_id), mensaje_id=msg.id)
+
 class Mensaje(models.Model):
     conversacion = models.ForeignKey(Conversacion, on_delete=models.CASCADE, related_name="mensajes")
     emisor = models.ForeignKey(User, on_delete=models.CASCADE, related_name="mensajes_enviados")
     contenido = models.TextField()
     creado_en = models.DateTimeField(auto_now_add=True)
-    leido_por = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name="mensajes_leidos")
 
     class Meta:
         ordering = ["creado_en"]
-    
-    
+        indexes = [
+            # historial paginado por (creado_en, id) dentro de una conversación
+            models.Index(fields=["conversacion", "creado_en", "id"], name="mensaje_conv_creado_idx"),
+        ]
+
+
+class SegmentoArchivo(models.Model):
+    """
+    Tramo de mensajes viejos de una conversación movido a un archivo JSONL
+    gzip (chat/archivo.py). Los segmentos de una conversación son un prefijo
+    contiguo de su historial en orden (creado_en, id).
+    """
+    conversacion = models.ForeignKey(Conversacion, on_delete=models.CASCADE, related_name="segmentos")
+    archivo = models.CharField(max_length=255)
+    desde_id = models.BigIntegerField()
+    hasta_id = models.BigIntegerField()
+    desde_en = models.DateTimeField()
+    hasta_en = models.DateTimeField()
+    cantidad = models.PositiveIntegerField()
+    bytes_originales = models.PositiveBigIntegerField()
+    bytes_comprimidos = models.PositiveBigIntegerField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["conversacion", "desde_id"], name="segmento_conv_desde_idx")]
+
+    def __str__(self):
+        return f"Conversación {self.conversacion_id}: mensajes {self.desde_id}-{self.hasta_id}"
+
+
+class MensajeFTS(models.Model):
+    """
+    Índice full-text de mensajes (tabla FTS5 / tsvector creada por migración).
+    Sólo lectura desde el ORM; se mantiene desde chat/search_index.py.
+    """
+    mensaje = models.OneToOneField(Mensaje, on_delete=models.DO_NOTHING, primary_key=True, db_column="rowid", related_name="fts")
+    contenido = models.TextField()
+    documento = FullTextField(db_column="chat_mensaje_fts")
+
+    class Meta:
+        managed = False
+        db_table = "chat_mensaje_fts"
+
+
+class LecturaConversacion(models.Model):
+    """
+    Marca de lectura por (conversación, participante): todo mensaje de la
+    conversación con id <= ultimo_leido_id cuenta como leído para ese usuario.
+    Leer es un UPDATE y los no leídos son un conteo por rango de ids.
+
+    `no_leidos` es el contador mantenido de esa conversación (sube con cada
+    mensaje ajeno, baja al leer); la suma por usuario está en BandejaChat.
+    """
+    conversacion = models.ForeignKey(Conversacion, on_delete=models.CASCADE, related_name="lecturas")
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="lecturas_chat")
+    ultimo_leido_id = models.BigIntegerField(default=0)
+    no_leidos = models.IntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["conversacion", "usuario"], name="uniq_lectura_conv_usuario")
+        ]
+
+
+class BandejaChat(models.Model):
+    """
+    Total de no leídos por usuario, mantenido junto con LecturaConversacion.
+    `version` cambia cada vez que cambia el total: es el ETag de /unread.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="bandeja_chat")
+    no_leidos = models.IntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Bandeja de {self.usuario_id}: {self.no_leidos} (v{self.version})"
+
+
+class CambioChat(models.Model):
+    """
+    Secuencia de cambios de chat por usuario, para /conversaciones/sync/.
+    El id autoincremental es el token de sincronización: pedir los cambios
+    desde un token es un range scan sobre (usuario, id). Se inserta siempre
+    con bloquear_secuencias tomado (registrar_cambio).
+    """
+    MENSAJE = "mensaje"
+    CONVERSACION = "conversacion"
+    LECTURA = "lectura"
+    TIPOS = [(MENSAJE, "Mensaje nuevo"), (CONVERSACION, "Conversación nueva"), (LECTURA, "Lectura")]
+
+    id = models.BigAutoField(primary_key=True)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="cambios_chat")
+    conversacion = models.ForeignKey(Conversacion, on_delete=models.CASCADE, related_name="+")
+    tipo = models.CharField(max_length=12, choices=TIPOS)
+    mensaje_id = models.BigIntegerField(null=True, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["usuario", "id"], name="cambio_chat_usuario_idx")]
+
+
+def bloquear_secuencias(usuario_ids):
+    """
+    Toma el bloqueo de la secuencia de sync de cada usuario (su fila de
+    BandejaChat, creándola si falta) hasta el fin de la transacción. Todo el
+    que inserta CambioChat de un usuario lo toma antes, así los ids de ese
+    usuario se confirman en orden (ver chat/sync.py). Se bloquea en orden de
+    id para que dos transacciones con los mismos usuarios no se traben entre sí,
+    y al principio, antes de las marcas de lectura y los contadores.
+    """
+    ids = sorted({u for u in usuario_ids if u is not None})
+    if not ids:
+        return
+    filas = BandejaChat.objects.select_for_update().filter(usuario_id__in=ids).order_by("usuario_id")
+    faltan = set(ids) - set(filas.values_list("usuario_id", flat=True))
+    if faltan:
+        BandejaChat.objects.bulk_create([BandejaChat(usuario_id=u) for u in sorted(faltan)], ignore_conflicts=True)
+        list(filas.values_list("usuario_id"))
+
+
+@transaction.atomic
+def registrar_cambio(conversacion, tipo, usuarios, mensaje_id=None):
+    bloquear_secuencias(usuarios)
+    CambioChat.objects.bulk_create([
+        CambioChat(usuario_id=u, conversacion_id=conversacion.pk, tipo=tipo, mensaje_id=mensaje_id)
+        for u in usuarios if u is not None
+    ])
+
+
+def ultimo_leido(usuario, conversacion=models.OuterRef("conversacion")):
+    """Subquery con la marca de lectura del usuario (0 si nunca abrió la conversación)."""
+    marca = LecturaConversacion.objects.filter(conversacion=conversacion, usuario=usuario).values("ultimo_leido_id")
+    return Coalesce(models.Subquery(marca[:1]), 0)
+
+
+def no_leidos(usuario):
+    """
+    Mensajes de otros, en conversaciones del usuario, posteriores a su marca de
+    lectura. Es la fuente de verdad de los contadores (ver rebuild_chat_counters).
+    """
+    return (
+        Mensaje.objects
+        .filter(models.Q(conversacion__cliente=usuario) | models.Q(conversacion__cuidador=usuario))
+        .exclude(emisor=usuario)
+        .filter(id__gt=ultimo_leido(usuario))
+    )
+
+
+def bandeja(usuario):
+    """(no_leidos, version) del usuario: una lectura por clave primaria."""
+    fila = BandejaChat.objects.filter(usuario=usuario).values_list("no_leidos", "version").first()
+    return fila or (0, 0)
+
+
+def contar_no_leidos(usuario):
+    return bandeja(usuario)[0]
+
+
+def _ajustar_bandeja(usuario_id, delta):
+    if not delta:
+        return
+    actualizadas = BandejaChat.objects.filter(usuario_id=usuario_id).update(
+        no_leidos=models.F("no_leidos") + delta, version=models.F("version") + 1,
+    )
+    if not actualizadas:
+        _, creada = BandejaChat.objects.get_or_create(
+            usuario_id=usuario_id, defaults={"no_leidos": max(delta, 0), "version": 1},
+        )
+        if not creada:  # la creó otra request en el medio
+            _ajustar_bandeja(usuario_id, delta)
+
+
+def sumar_no_leido(conversacion_id, usuario_id, mensaje_id):
+    """Un mensaje ajeno nuevo para `usuario_id`; no cuenta si ya lo tiene leído."""
+    actualizadas = LecturaConversacion.objects.filter(
+        conversacion_id=conversacion_id, usuario_id=usuario_id, ultimo_leido_id__lt=mensaje_id,
+    ).update(no_leidos=models.F("no_leidos") + 1)
+    if not actualizadas:
+        lectura, creada = LecturaConversacion.objects.get_or_create(
+            conversacion_id=conversacion_id, usuario_id=usuario_id, defaults={"no_leidos": 1},
+        )
+        if not creada:
+            if lectura.ultimo_leido_id < mensaje_id:  # la creó otra request en el medio
+                return sumar_no_leido(conversacion_id, usuario_id, mensaje_id)
+            return  # la marca ya pasó este mensaje (llegó tarde)
+    _ajustar_bandeja(usuario_id, 1)
+
+
+def restar_no_leidos(conversacion_id, usuario_id, cantidad):
+    """Descuenta `cantidad` no leídos de la conversación y de la bandeja (mensajes que dejan la tabla)."""
+    if cantidad <= 0:
+        return
+    LecturaConversacion.objects.filter(conversacion_id=conversacion_id, usuario_id=usuario_id).update(
+        no_leidos=models.F("no_leidos") - cantidad,
+    )
+    _ajustar_bandeja(usuario_id, -cantidad)
+
+
+@transaction.atomic
+def marcar_leido(conversacion, usuario, hasta_id=None):
+    """
+    Mueve la marca de lectura hasta `hasta_id` (por defecto el último mensaje)
+    y recalcula el contador de la conversación con lo que queda después.
+    Nunca retrocede. Devuelve True si cambió algo.
+    """
+    if hasta_id is None:
+        hasta_id = conversacion.ultimo_mensaje_id
+        if hasta_id is None:
+            return False
+    bloquear_secuencias([usuario.pk])
+    lectura, _ = LecturaConversacion.objects.select_for_update().get_or_create(
+        conversacion=conversacion, usuario=usuario,
+    )
+    if lectura.ultimo_leido_id >= hasta_id:
+        return False
+    # releído con la marca bloqueada: un mensaje que llegó recién ya está acá o
+    # su sumar_no_leido espera al bloqueo y ve la marca nueva
+    ultimo = Conversacion.objects.filter(pk=conversacion.pk).values_list("ultimo_mensaje_id", flat=True).first()
+    if ultimo is not None and hasta_id >= ultimo:
+        restantes = 0  # lo normal: se lee hasta el final, no hace falta contar
+    else:
+        restantes = conversacion.mensajes.filter(id__gt=hasta_id).exclude(emisor=usuario).count()
+    LecturaConversacion.objects.filter(pk=lectura.pk).update(
+        ultimo_leido_id=hasta_id, no_leidos=restantes, actualizado_en=timezone.now(),
+    )
+    _ajustar_bandeja(usuario.pk, restantes - lectura.no_leidos)
+    registrar_cambio(conversacion, CambioChat.LECTURA, [usuario.pk])
+    return True
+
+
+@transaction.atomic
+def marcar_todo_leido(usuario):
+    """
+    Lleva todas las marcas del usuario hasta el último mensaje de cada
+    conversación: un UPDATE sobre las lecturas con no leídos, sin importar
+    cuántos mensajes haya. Devuelve los ids de conversación que cambiaron.
+    """
+    bloquear_secuencias([usuario.pk])
+    filas = list(
+        LecturaConversacion.objects.select_for_update()
+        .filter(usuario=usuario, no_leidos__gt=0)
+        .values_list("conversacion_id", "no_leidos")
+    )
+    if not filas:
+        return []
+    ids = [c for c, _ in filas]
+    ultimo = Conversacion.objects.filter(pk=models.OuterRef("conversacion_id")).values("ultimo_mensaje_id")[:1]
+    LecturaConversacion.objects.filter(usuario=usuario, conversacion_id__in=ids).update(
+        ultimo_leido_id=Coalesce(models.Subquery(ultimo), models.F("ultimo_leido_id")),
+        no_leidos=0, actualizado_en=timezone.now(),
+    )
+    _ajustar_bandeja(usuario.pk, -sum(n for _, n in filas))
+    CambioChat.objects.bulk_create([
+        CambioChat(usuario_id=usuario.pk, conversacion_id=c, tipo=CambioChat.LECTURA) for c in ids
+    ])
+    return ids
+
+
+def no_leidos_por_conversacion(usuario, conversacion_ids):
+    """{conversacion_id: no leídos} para varias conversaciones, de los contadores."""
+    filas = LecturaConversacion.objects.filter(
+        usuario=usuario, conversacion_id__in=conversacion_ids, no_leidos__gt=0,
+    ).values_list("conversacion_id", "no_leidos")
+    return dict(filas)
+
+
+def reconstruir_contadores():
+    """Recalcula LecturaConversacion.no_leidos y BandejaChat desde los mensajes (reparación)."""
+    totales = {}
+    lecturas = {(l.conversacion_id, l.usuario_id): l for l in LecturaConversacion.objects.all()}
+    for conv in Conversacion.objects.all().iterator():
+        for usuario_id in (conv.cliente_id, conv.cuidador_id):
+            if usuario_id is None:
+                continue
+            lectura = lecturas.get((conv.id, usuario_id))
+            if lectura is None:
+                lectura = lecturas[(conv.id, usuario_id)] = LecturaConversacion.objects.create(
+                    conversacion=conv, usuario_id=usuario_id,
+                )
+            n = conv.mensajes.filter(id__gt=lectura.ultimo_leido_id).exclude(emisor_id=usuario_id).count()
+            if n != lectura.no_leidos:
+                LecturaConversacion.objects.filter(pk=lectura.pk).update(no_leidos=n)
+            totales[usuario_id] = totales.get(usuario_id, 0) + n
+    for usuario_id, total in totales.items():
+        fila, creada = BandejaChat.objects.get_or_create(usuario_id=usuario_id, defaults={"no_leidos": total, "version": 1})
+        if not creada and fila.no_leidos != total:
+            BandejaChat.objects.filter(pk=usuario_id).update(no_leidos=total, version=models.F("version") + 1)
+    return len(totales)
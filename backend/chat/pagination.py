@@ -0,0 +1,119 @@
+# chat/pagination.py
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+from chat import archivo
+
+
+class MensajeCursorPagination(BasePagination):
+    """
+    Historial de una conversación por ventanas, anclado en ids de mensaje:
+
+    - sin parámetros: los `limit` más nuevos
+    - `?before=<id>`: los `limit` anteriores a ese mensaje (scroll hacia arriba)
+    - `?after=<id>`: los `limit` posteriores (ponerse al día)
+    - `?around=<id>`: una ventana centrada en ese mensaje, incluyéndolo (saltar
+      a un resultado de búsqueda)
+
+    Ordena por (creado_en, id), que es el índice de Mensaje, así cada página
+    es un range scan de `limit` filas sin importar el largo del historial.
+    Con `conversacion`, cuando la tabla se queda sin mensajes sigue por los
+    segmentos archivados (chat/archivo.py), que son siempre lo más viejo.
+
+    Respuesta: {"results": [...en orden cronológico], "older": id|null, "newer": id|null}
+    donde `older`/`newer` son los anclas para pedir más en cada sentido (null si no hay).
+    """
+    limit_query_param = "limit"
+    default_limit = 50
+    max_limit = 200
+    invalid_cursor_message = "Cursor inválido"
+
+    def __init__(self, conversacion=None):
+        self.conversacion = conversacion
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except (TypeError, ValueError):
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def _ancla(self, request, queryset, param):
+        raw = request.query_params.get(param)
+        if not raw:
+            return None
+        try:
+            pk = int(raw)
+        except ValueError:
+            raise ValidationError({param: "Tiene que ser un id de mensaje."})
+        ancla = queryset.filter(pk=pk).values("creado_en", "id").first()
+        if ancla is None and self.conversacion is not None:
+            ancla = archivo.ancla(self.conversacion, pk)
+        if ancla is None:
+            raise NotFound(self.invalid_cursor_message)
+        return ancla
+
+    def _anteriores(self, queryset, ancla):
+        return queryset.filter(
+            Q(creado_en__lt=ancla["creado_en"]) | Q(creado_en=ancla["creado_en"], id__lt=ancla["id"])
+        ).order_by("-creado_en", "-id")
+
+    def _posteriores(self, queryset, ancla, incluida=False):
+        mismo = {"id__gte" if incluida else "id__gt": ancla["id"]}
+        return queryset.filter(
+            Q(creado_en__gt=ancla["creado_en"]) | Q(creado_en=ancla["creado_en"], **mismo)
+        ).order_by("creado_en", "id")
+
+    def _leer_anteriores(self, queryset, ancla, n):
+        """Hasta n + 1 mensajes anteriores al ancla (o los más nuevos), del más nuevo al más viejo."""
+        if ancla and ancla.get("archivado"):
+            return archivo.anteriores(self.conversacion, ancla, n + 1)
+        filas = self._anteriores(queryset, ancla) if ancla else queryset.order_by("-creado_en", "-id")
+        filas = list(filas[: n + 1])
+        if len(filas) <= n and self.conversacion is not None:
+            filas += archivo.anteriores(self.conversacion, None, n + 1 - len(filas))
+        return filas
+
+    def _leer_posteriores(self, queryset, ancla, n, incluida=False):
+        """Hasta n + 1 mensajes posteriores al ancla, en orden cronológico."""
+        if ancla.get("archivado"):
+            filas = archivo.posteriores(self.conversacion, ancla, n + 1, incluida=incluida)
+            if len(filas) <= n:
+                filas += list(queryset.order_by("creado_en", "id")[: n + 1 - len(filas)])
+            return filas
+        return list(self._posteriores(queryset, ancla, incluida)[: n + 1])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        limit = self.get_limit(request)
+        centro = self._ancla(request, queryset, "around")
+        if centro:
+            previos = self._leer_anteriores(queryset, centro, limit // 2)
+            hay_previos = len(previos) > limit // 2
+            previos = previos[: limit // 2][::-1]
+            resto = limit - len(previos)
+            siguientes = self._leer_posteriores(queryset, centro, resto, incluida=True)
+            self.page = previos + siguientes[:resto]
+            self.hay_anteriores, self.hay_posteriores = hay_previos, len(siguientes) > resto
+            return self.page
+
+        antes = self._ancla(request, queryset, "before")
+        despues = None if antes else self._ancla(request, queryset, "after")
+
+        if despues:
+            filas = self._leer_posteriores(queryset, despues, limit)
+            self.page = filas[:limit]
+            self.hay_anteriores, self.hay_posteriores = True, len(filas) > limit
+        else:
+            filas = self._leer_anteriores(queryset, antes, limit)
+            self.page = filas[:limit][::-1]
+            self.hay_anteriores, self.hay_posteriores = len(filas) > limit, antes is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "results": data,
+            "older": self.page[0].id if self.page and self.hay_anteriores else None,
+            "newer": self.page[-1].id if self.page and self.hay_posteriores else None,
+        })
@@ -0,0 +1,213 @@
+# chat/presencia.py
+"""
+Presencia ("en línea") y "escribiendo..." del chat, en memoria con vencimiento.
+
+La alimenta la capa de WebSocket (chat/ws.py): al conectar y con cada ping
+del cliente se renueva el latido del usuario (vence a los
+CHAT_PRESENCIA_TTL segundos). Los sockets abiertos por usuario se cuentan
+en el registro (`conectar`/`desconectar`), no en cada worker: sólo al
+cerrarse el último socket del usuario en cualquier proceso se da de baja.
+"Escribiendo" es un latido por (conversación, usuario) que vence a los
+CHAT_ESCRIBIENDO_TTL segundos. Nada de esto toca la base.
+
+Las consultas son por lote: `en_linea(ids)` y `escribiendo_en(pares)` cuestan
+una llamada sin importar cuántas conversaciones muestre el listado.
+
+El registro se elige en `CHAT_PRESENCIA` como el broker:
+- `InMemoryPresencia` (default): un solo proceso.
+- `CachePresencia`: en el cache de Django; con Redis/Memcached lo comparten
+  todos los workers (el TTL lo aplica el cache).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+def ttl_presencia():
+    return getattr(settings, "CHAT_PRESENCIA_TTL", 60)
+
+
+def ttl_escribiendo():
+    return getattr(settings, "CHAT_ESCRIBIENDO_TTL", 8)
+
+
+class Presencia:
+    def conectar(self, usuario_id):
+        """Suma un socket abierto del usuario y renueva el latido; True si es el primero."""
+        raise NotImplementedError
+
+    def desconectar(self, usuario_id):
+        """Resta un socket; si era el último, da de baja al usuario y devuelve True."""
+        raise NotImplementedError
+
+    def latido(self, usuario_id):
+        raise NotImplementedError
+
+    def salir(self, usuario_id):
+        raise NotImplementedError
+
+    def en_linea(self, usuario_ids):
+        """Subconjunto de `usuario_ids` con latido vigente."""
+        raise NotImplementedError
+
+    def escribiendo(self, conversacion_id, usuario_id, activo=True):
+        raise NotImplementedError
+
+    def escribiendo_en(self, pares):
+        """Subconjunto de los pares (conversacion_id, usuario_id) que están escribiendo."""
+        raise NotImplementedError
+
+
+class InMemoryPresencia(Presencia):
+    def __init__(self, reloj=time.monotonic):
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._usuarios = {}     # usuario_id -> vence
+        self._escribiendo = {}  # (conversacion_id, usuario_id) -> vence
+        self._sockets = {}      # usuario_id -> sockets abiertos
+        self._proxima_purga = 0
+
+    def _purgar(self, ahora):
+        # barrido completo a lo sumo una vez por TTL: las lecturas ya filtran vencidos
+        if ahora < self._proxima_purga:
+            return
+        self._proxima_purga = ahora + min(ttl_presencia(), ttl_escribiendo())
+        for d in (self._usuarios, self._escribiendo):
+            for clave in [k for k, vence in d.items() if vence <= ahora]:
+                del d[clave]
+
+    def conectar(self, usuario_id):
+        with self._lock:
+            self._sockets[usuario_id] = self._sockets.get(usuario_id, 0) + 1
+            primero = self._sockets[usuario_id] == 1
+        self.latido(usuario_id)
+        return primero
+
+    def desconectar(self, usuario_id):
+        with self._lock:
+            quedan = self._sockets.get(usuario_id, 0) - 1
+            if quedan > 0:
+                self._sockets[usuario_id] = quedan
+                return False
+            self._sockets.pop(usuario_id, None)
+            self._usuarios.pop(usuario_id, None)
+        return True
+
+    def latido(self, usuario_id):
+        ahora = self._reloj()
+        with self._lock:
+            self._usuarios[usuario_id] = ahora + ttl_presencia()
+            self._purgar(ahora)
+
+    def salir(self, usuario_id):
+        with self._lock:
+            self._usuarios.pop(usuario_id, None)
+
+    def en_linea(self, usuario_ids):
+        ahora = self._reloj()
+        with self._lock:
+            return {u for u in usuario_ids if self._usuarios.get(u, 0) > ahora}
+
+    def escribiendo(self, conversacion_id, usuario_id, activo=True):
+        ahora = self._reloj()
+        with self._lock:
+            if activo:
+                self._escribiendo[(conversacion_id, usuario_id)] = ahora + ttl_escribiendo()
+            else:
+                self._escribiendo.pop((conversacion_id, usuario_id), None)
+            self._purgar(ahora)
+
+    def escribiendo_en(self, pares):
+        ahora = self._reloj()
+        with self._lock:
+            return {p for p in pares if self._escribiendo.get(tuple(p), 0) > ahora}
+
+    def tamanio(self):
+        with self._lock:
+            return len(self._usuarios) + len(self._escribiendo)
+
+
+class CachePresencia(Presencia):
+    """
+    Una clave por usuario / (conversación, usuario) con timeout = TTL; lecturas con get_many.
+
+    Los sockets abiertos por usuario son un contador compartido (incr/decr
+    atómicos en Redis/Memcached), así un worker no da de baja a un usuario
+    que sigue conectado por otro. El contador vence con el latido: si un
+    worker muere sin descontar sus sockets, el usuario igual sale por TTL.
+    """
+
+    def __init__(self, alias="default"):
+        self.cache = caches[alias]
+
+    @staticmethod
+    def _clave_usuario(usuario_id):
+        return f"chat:presencia:{usuario_id}"
+
+    @staticmethod
+    def _clave_escribiendo(conversacion_id, usuario_id):
+        return f"chat:escribiendo:{conversacion_id}:{usuario_id}"
+
+    @staticmethod
+    def _clave_sockets(usuario_id):
+        return f"chat:sockets:{usuario_id}"
+
+    def conectar(self, usuario_id):
+        clave = self._clave_sockets(usuario_id)
+        self.cache.add(clave, 0, ttl_presencia())
+        try:
+            abiertos = self.cache.incr(clave)
+        except ValueError:  # venció entre add e incr
+            self.cache.set(clave, 1, ttl_presencia())
+            abiertos = 1
+        self.latido(usuario_id)
+        return abiertos == 1
+
+    def desconectar(self, usuario_id):
+        clave = self._clave_sockets(usuario_id)
+        try:
+            quedan = self.cache.decr(clave)
+        except ValueError:  # ya vencido
+            quedan = 0
+        if quedan > 0:
+            return False
+        self.cache.delete_many([clave, self._clave_usuario(usuario_id)])
+        return True
+
+    def latido(self, usuario_id):
+        self.cache.set(self._clave_usuario(usuario_id), 1, ttl_presencia())
+        self.cache.touch(self._clave_sockets(usuario_id), ttl_presencia())
+
+    def salir(self, usuario_id):
+        self.cache.delete(self._clave_usuario(usuario_id))
+
+    def en_linea(self, usuario_ids):
+        claves = {self._clave_usuario(u): u for u in usuario_ids}
+        return {claves[k] for k in self.cache.get_many(list(claves))}
+
+    def escribiendo(self, conversacion_id, usuario_id, activo=True):
+        clave = self._clave_escribiendo(conversacion_id, usuario_id)
+        if activo:
+            self.cache.set(clave, 1, ttl_escribiendo())
+        else:
+            self.cache.delete(clave)
+
+    def escribiendo_en(self, pares):
+        claves = {self._clave_escribiendo(c, u): (c, u) for c, u in pares}
+        return {claves[k] for k in self.cache.get_many(list(claves))}
+
+
+_presencia = None
+_presencia_lock = threading.Lock()
+
+
+def get_presencia():
+    global _presencia
+    if _presencia is None:
+        with _presencia_lock:
+            if _presencia is None:
+                _presencia = import_string(getattr(settings, "CHAT_PRESENCIA", "chat.presencia.InMemoryPresencia"))()
+    return _presencia
@@ -0,0 +1,48 @@
+# chat/realtime.py
+"""
+Publicación de eventos de chat desde código síncrono (vistas, signals).
+
+Eventos que recibe cada participante por /ws/chat/:
+- {"type": "mensaje", "conversacion": id, "mensaje": {...MensajeSerializer}}
+- {"type": "unread", "count": n, "has_unread": bool}
+
+Se publican en el commit de la transacción, así nadie recibe un mensaje que
+después se revierte.
+"""
+from django.db import transaction
+
+from chat.broker import get_broker
+
+
+def canal_usuario(usuario_id):
+    return f"usuario:{usuario_id}"
+
+
+def publicar(usuario_id, evento):
+    transaction.on_commit(lambda: get_broker().publish(canal_usuario(usuario_id), evento))
+
+
+def publicar_unread(usuario):
+    from chat.models import contar_no_leidos
+
+    total = contar_no_leidos(usuario)
+    publicar(usuario.pk, {"type": "unread", "count": total, "has_unread": total > 0})
+
+
+def publicar_mensaje(msg):
+    from chat.serializer import MensajeSerializer
+
+    conv = msg.conversacion
+    data = MensajeSerializer(msg).data
+    for usuario_id in (conv.cliente_id, conv.cuidador_id):
+        if usuario_id is None:
+            continue
+        # isOwn depende de quién lo recibe (el emisor puede tener otras pestañas abiertas)
+        publicar(usuario_id, {
+            "type": "mensaje",
+            "conversacion": conv.pk,
+            "mensaje": {**data, "isOwn": usuario_id == msg.emisor_id},
+        })
+    receptor = conv.cuidador if msg.emisor_id == conv.cliente_id else conv.cliente
+    if receptor is not None:
+        publicar_unread(receptor)
@@ -0,0 +1,174 @@
+# chat/search_index.py
+"""
+Índice full-text de mensajes de chat sobre `Mensaje.contenido`.
+
+Mismo esquema que users/search_index.py:
+
+- SQLite: tabla virtual FTS5 (`chat_mensaje_fts`, rowid = mensaje.id).
+- PostgreSQL: tabla con columna tsvector generada + índice GIN.
+
+El modelo no administrado `MensajeFTS` lee con el ORM (lookup `match` de
+users.search_index); las escrituras van por SQL crudo desde acá y se disparan
+en el post_save / post_delete de Mensaje (chat/signals.py).
+"""
+from django.db import connection
+from django.db.models import FloatField, Func, Q, TextField, Value
+from django.db.models.functions import Substr
+
+from users.search_index import PG_CONFIG, construir_consulta, soportado, tokens
+
+TABLA = "chat_mensaje_fts"
+# marcas del fragmento: el frontend las convierte en <mark>
+MARCA_INICIO, MARCA_FIN = "[[", "]]"
+PALABRAS_FRAGMENTO = 12
+
+
+# --------------------------
+# Lectura (ORM)
+# --------------------------
+
+class Relevancia(Func):
+    """Mayor = más relevante. bm25 / ts_rank."""
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        documento, _ = self.source_expressions
+        sql, params = compiler.compile(documento)
+        return f"(-bm25({sql}))", params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        documento, consulta = self.source_expressions
+        doc_sql, doc_params = compiler.compile(documento)
+        q_sql, q_params = compiler.compile(consulta)
+        return f"ts_rank({doc_sql}, to_tsquery('{PG_CONFIG}', {q_sql}))", doc_params + q_params
+
+
+class Fragmento(Func):
+    """Fragmento del contenido alrededor de los términos encontrados, con marcas."""
+    output_field = TextField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        documento, _, _ = self.source_expressions
+        sql, params = compiler.compile(documento)
+        return (
+            f"snippet({sql}, 0, %s, %s, '…', {PALABRAS_FRAGMENTO})",
+            params + [MARCA_INICIO, MARCA_FIN],
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        _, contenido, consulta = self.source_expressions
+        c_sql, c_params = compiler.compile(contenido)
+        q_sql, q_params = compiler.compile(consulta)
+        opciones = f"StartSel={MARCA_INICIO}, StopSel={MARCA_FIN}, MaxWords={PALABRAS_FRAGMENTO}, MinWords=3"
+        return (
+            f"ts_headline('{PG_CONFIG}', {c_sql}, to_tsquery('{PG_CONFIG}', {q_sql}), '{opciones}')",
+            c_params + q_params,
+        )
+
+
+def buscar(usuario, texto):
+    """
+    Mensajes de las conversaciones de `usuario` que coinciden con `texto`,
+    anotados con `relevancia` y `fragmento` y ordenados por relevancia.
+    None si el texto no tiene términos. En motores sin índice cae a icontains.
+    """
+    from chat.models import Mensaje
+
+    consulta = construir_consulta(texto)
+    if consulta is None:
+        return None
+    propios = Mensaje.objects.filter(Q(conversacion__cliente=usuario) | Q(conversacion__cuidador=usuario))
+    if not soportado():
+        # motores sin índice: icontains por término, sin ranking
+        for token in tokens(texto):
+            propios = propios.filter(contenido__icontains=token)
+        return propios.annotate(
+            relevancia=Value(0.0, output_field=FloatField()), fragmento=Substr("contenido", 1, 120),
+        ).order_by("-id")
+    campo = "fts__documento"
+    return (
+        propios
+        .filter(**{f"{campo}__match": consulta})
+        .annotate(
+            relevancia=Relevancia(campo, Value(consulta)),
+            fragmento=Fragmento(campo, "contenido", Value(consulta)),
+        )
+        .order_by("-relevancia", "-id")
+    )
+
+
+# --------------------------
+# Escritura
+# --------------------------
+
+def indexar(mensaje, conn=None):
+    conn = conn or connection
+    if not soportado(conn):
+        return
+    with conn.cursor() as cur:
+        if conn.vendor == "postgresql":
+            cur.execute(
+                f"INSERT INTO {TABLA} (rowid, contenido) VALUES (%s, %s) "
+                f"ON CONFLICT (rowid) DO UPDATE SET contenido = EXCLUDED.contenido",
+                [mensaje.pk, mensaje.contenido],
+            )
+        else:
+            cur.execute(f"DELETE FROM {TABLA} WHERE rowid = %s", [mensaje.pk])
+            cur.execute(f"INSERT INTO {TABLA} (rowid, contenido) VALUES (%s, %s)", [mensaje.pk, mensaje.contenido])
+
+
+def eliminar(mensaje_ids, conn=None):
+    conn = conn or connection
+    if not soportado(conn) or not mensaje_ids:
+        return
+    with conn.cursor() as cur:
+        marcas = ", ".join(["%s"] * len(mensaje_ids))
+        cur.execute(f"DELETE FROM {TABLA} WHERE rowid IN ({marcas})", list(mensaje_ids))
+
+
+def reconstruir(filas, conn=None):
+    """Vacía y vuelve a llenar el índice. `filas` es un iterable de (id, contenido)."""
+    conn = conn or connection
+    if not soportado(conn):
+        return 0
+    total = 0
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {TABLA}")
+        lote = []
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) == 2000:
+                cur.executemany(f"INSERT INTO {TABLA} (rowid, contenido) VALUES (%s, %s)", lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            cur.executemany(f"INSERT INTO {TABLA} (rowid, contenido) VALUES (%s, %s)", lote)
+            total += len(lote)
+    return total
+
+
+# --------------------------
+# DDL (usado por la migración)
+# --------------------------
+
+def crear_tabla(conn):
+    with conn.cursor() as cur:
+        if conn.vendor == "postgresql":
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLA} ("
+                f" rowid bigint PRIMARY KEY REFERENCES chat_mensaje(id) ON DELETE CASCADE,"
+                f" contenido text NOT NULL DEFAULT '',"
+                f" {TABLA} tsvector GENERATED ALWAYS AS (to_tsvector('{PG_CONFIG}', contenido)) STORED)"
+            )
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {TABLA}_gin ON {TABLA} USING GIN ({TABLA})")
+        elif conn.vendor == "sqlite":
+            cur.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5("
+                f"contenido, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+
+def borrar_tabla(conn):
+    if soportado(conn):
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLA}")
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import Conversacion, Mensaje
+from .models import Conversacion, Mensaje, no_leidos_por_conversacion, ultimo_leido
+from .presencia import get_presencia
 from users.models import Usuario  # tu user
 
 class ConversacionListSerializer(serializers.ModelSerializer):
@@ -10,10 +11,12 @@ class ConversacionListSerializer(serializers.ModelSerializer):
     hora = serializers.SerializerMethodField()
     noLeidos = serializers.SerializerMethodField()
     user_id = serializers.SerializerMethodField()
+    enLinea = serializers.SerializerMethodField()
+    escribiendo = serializers.SerializerMethodField()
 
     class Meta:
         model = Conversacion
-        fields = ["id", "nombre", "tipo", "ultimoMensaje", "hora", "noLeidos", "user_id"]
+        fields = ["id", "nombre", "tipo", "ultimoMensaje", "hora", "noLeidos", "user_id", "enLinea", "escribiendo"]
 
     def get_contraparte(self, obj):
         user = self.context["request"].user
@@ -33,22 +36,49 @@ class ConversacionListSerializer(serializers.ModelSerializer):
         return "Usuario"
 
     def get_ultimoMensaje(self, obj):
-        m = obj.mensajes.order_by("-creado_en").first()
-        return m.contenido if m else ""
+        return obj.ultimo_mensaje_texto
 
     def get_hora(self, obj):
-        m = obj.mensajes.order_by("-creado_en").first()
-        if not m:
+        if not obj.ultimo_mensaje_en:
             return ""
-        return timezone.localtime(m.creado_en).strftime("%H:%M")
+        return timezone.localtime(obj.ultimo_mensaje_en).strftime("%H:%M")
 
     def get_noLeidos(self, obj):
+        # el listado precalcula todos los conteos en una consulta agrupada
+        no_leidos = self.context.get("no_leidos")
+        if no_leidos is not None:
+            return no_leidos.get(obj.id, 0)
         user = self.context["request"].user
-        return obj.mensajes.exclude(emisor=user).exclude(leido_por=user).count()
+        return obj.mensajes.exclude(emisor=user).filter(id__gt=ultimo_leido(user, obj)).count()
 
     def get_user_id(self, obj):
         return self.get_contraparte(obj).id
 
+    # presencia: el listado la consulta por lote (contexto_listado)
+    def get_enLinea(self, obj):
+        en_linea = self.context.get("en_linea")
+        if en_linea is None:
+            en_linea = get_presencia().en_linea([self.get_contraparte(obj).id])
+        return self.get_contraparte(obj).id in en_linea
+
+    def get_escribiendo(self, obj):
+        par = (obj.id, self.get_contraparte(obj).id)
+        escribiendo = self.context.get("escribiendo")
+        if escribiendo is None:
+            escribiendo = get_presencia().escribiendo_en([par])
+        return par in escribiendo
+
+
+def contexto_listado(usuario, conversaciones):
+    """No leídos y presencia de varias conversaciones: una consulta / llamada por cada uno."""
+    otros = [(c.id, c.cuidador_id if c.cliente_id == usuario.id else c.cliente_id) for c in conversaciones]
+    presencia = get_presencia()
+    return {
+        "no_leidos": no_leidos_por_conversacion(usuario, [c.id for c in conversaciones]),
+        "en_linea": presencia.en_linea({otro for _, otro in otros}),
+        "escribiendo": presencia.escribiendo_en(otros),
+    }
+
 
 
 class MensajeSerializer(serializers.ModelSerializer):
@@ -72,3 +102,17 @@ class MensajeSerializer(serializers.ModelSerializer):
     def get_isOwn(self, obj):
         request = self.context.get("request")
         return bool(request and request.user and obj.emisor_id == request.user.id)
+
+
+class MensajeBusquedaSerializer(MensajeSerializer):
+    """Resultado de búsqueda: el mensaje, su fragmento con marcas y el ancla para abrirlo."""
+    conversacion = serializers.IntegerField(source="conversacion_id")
+    snippet = serializers.CharField(source="fragmento")
+    cursor = serializers.SerializerMethodField()
+
+    class Meta(MensajeSerializer.Meta):
+        fields = ["id", "conversacion", "sender", "snippet", "time", "isOwn", "cursor"]
+
+    def get_cursor(self, obj):
+        # GET /conversaciones/{conversacion}/mensajes/?around=<id>
+        return {"around": obj.id}
@@ -0,0 +1,24 @@
+# chat/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from chat import archivo, search_index
+from chat.models import Mensaje, SegmentoArchivo
+
+
+@receiver(post_save, sender=Mensaje)
+def indexar_mensaje(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search_index.indexar(instance)
+
+
+@receiver(post_delete, sender=Mensaje)
+def desindexar_mensaje(sender, instance, **kwargs):
+    search_index.eliminar([instance.pk])
+
+
+@receiver(post_delete, sender=SegmentoArchivo)
+def borrar_segmento(sender, instance, **kwargs):
+    transaction.on_commit(lambda: archivo.borrar_archivo(instance))
@@ -0,0 +1,93 @@
+# chat/sync.py
+"""
+Sincronización incremental del chat (`/conversaciones/sync/?since=<token>`).
+
+El token es el id del último CambioChat que vio el cliente. Cada llamada lee
+los cambios posteriores del usuario (range scan sobre (usuario, id), a lo sumo
+`LIMITE` por vez) y arma la respuesta con lo que tocaron: mensajes nuevos,
+conversaciones actualizadas (con su último mensaje y no leídos) y marcas de
+lectura. El costo depende de cuántos cambios hubo, no del largo del historial.
+
+Garantía de orden: un id autoincremental se asigna al insertar, no al
+confirmar, así que dos transacciones podrían confirmar sus cambios fuera de
+orden y un cliente que ya guardó el id mayor nunca vería el menor. Para que
+no pase, todo insert de CambioChat de un usuario se hace con su secuencia
+bloqueada (`models.bloquear_secuencias`, fila de BandejaChat con
+select_for_update hasta el commit): la transacción siguiente de ese usuario
+recién obtiene un id después de que la anterior confirmó. Entonces, para
+cada usuario, todo id menor que uno visible ya está confirmado y el token
+`id__gt` no se saltea cambios. (En SQLite las escrituras ya son serializadas.)
+
+Sin `since` sólo devuelve el token actual: el cliente lo guarda antes de hacer
+la carga completa y a partir de ahí pide deltas.
+"""
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import CambioChat, Conversacion, LecturaConversacion, Mensaje, bandeja
+from .serializer import ConversacionListSerializer, MensajeSerializer, contexto_listado
+
+LIMITE = 500
+
+
+def token_actual(usuario):
+    ultimo = CambioChat.objects.filter(usuario=usuario).order_by("-id").values_list("id", flat=True).first()
+    return str(ultimo or 0)
+
+
+def parse_token(raw):
+    try:
+        token = int(raw)
+    except (TypeError, ValueError):
+        raise ValidationError({"since": "Token de sincronización inválido."})
+    if token < 0:
+        raise ValidationError({"since": "Token de sincronización inválido."})
+    return token
+
+
+def cambios_desde(request, since):
+    usuario = request.user
+    cambios = list(
+        CambioChat.objects.filter(usuario=usuario, id__gt=since)
+        .order_by("id")
+        .values_list("id", "conversacion_id", "tipo", "mensaje_id")[: LIMITE + 1]
+    )
+    hay_mas = len(cambios) > LIMITE
+    cambios = cambios[:LIMITE]
+    if not cambios:
+        total, version = bandeja(usuario)
+        return {
+            "token": str(since), "has_more": False, "mensajes": [], "conversaciones": [], "lecturas": [],
+            "unread": {"count": total, "has_unread": total > 0, "version": version},
+        }
+
+    conv_ids = {c[1] for c in cambios}
+    mensaje_ids = [c[3] for c in cambios if c[2] == CambioChat.MENSAJE and c[3] is not None]
+    leidas = {c[1] for c in cambios if c[2] == CambioChat.LECTURA}
+
+    contexto = {"request": request}
+    mensajes = Mensaje.objects.filter(id__in=mensaje_ids).select_related("emisor").order_by("id")
+    conversaciones = list(
+        Conversacion.objects
+        .filter(Q(cliente=usuario) | Q(cuidador=usuario), id__in=conv_ids)
+        .select_related("cliente__cliente", "cliente__cuidador", "cuidador__cliente", "cuidador__cuidador")
+        .order_by("-actualizado_en")
+    )
+    lecturas = LecturaConversacion.objects.filter(usuario=usuario, conversacion_id__in=leidas).order_by("conversacion_id")
+    total, version = bandeja(usuario)
+    return {
+        "token": str(cambios[-1][0]),
+        "has_more": hay_mas,
+        "mensajes": [
+            {"conversacion": m.conversacion_id, "mensaje": MensajeSerializer(m, context=contexto).data}
+            for m in mensajes
+        ],
+        "conversaciones": ConversacionListSerializer(
+            conversaciones, many=True, context={**contexto, **contexto_listado(usuario, conversaciones)},
+        ).data,
+        "lecturas": [
+            {"conversacion": l.conversacion_id, "ultimo_leido": l.ultimo_leido_id, "no_leidos": l.no_leidos}
+            for l in lecturas
+        ],
+        "unread": {"count": total, "has_unread": total > 0, "version": version},
+    }
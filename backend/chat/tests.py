@@ -1,3 +1,936 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat import presencia, ws
+from chat.broker import get_broker
+from chat.models import (
+    BandejaChat, Conversacion, LecturaConversacion, Mensaje, SegmentoArchivo, bandeja, contar_no_leidos, marcar_leido,
+    no_leidos, no_leidos_por_conversacion, reconstruir_contadores,
+)
+from chat.presencia import CachePresencia, InMemoryPresencia
+from users.models import Cliente, Cuidador, Usuario
+
+
+def crear_conversacion():
+    cliente = Usuario.objects.create_user(username="cliente", first_name="Carla")
+    Cliente.objects.create(usuario=cliente)
+    cuidador = Usuario.objects.create_user(username="cuidador", first_name="Pedro")
+    Cuidador.objects.create(usuario=cuidador, anios_experiencia=3)
+    return Conversacion.objects.create(cliente=cliente, cuidador=cuidador)
+
+
+def socket(token=None, headers=()):
+    query = f"token={token}".encode() if token else b""
+    return ApplicationCommunicator(ws.chat_websocket, {
+        "type": "websocket", "path": ws.PATH, "query_string": query, "headers": list(headers),
+    })
+
+
+class ChatWebSocketTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conv = crear_conversacion()
+        cls.cliente, cls.cuidador = cls.conv.cliente, cls.conv.cuidador
+
+    def _token(self, user):
+        return str(AccessToken.for_user(user))
+
+    def test_sin_token_cierra(self):
+        async def run():
+            com = socket()
+            await com.send_input({"type": "websocket.connect"})
+            return await com.receive_output(1)
+        self.assertEqual(async_to_sync(run)(), {"type": "websocket.close", "code": ws.CIERRE_NO_AUTORIZADO})
+
+    def test_token_invalido_cierra(self):
+        async def run():
+            com = socket("no-es-un-jwt")
+            await com.send_input({"type": "websocket.connect"})
+            return await com.receive_output(1)
+        self.assertEqual(async_to_sync(run)()["type"], "websocket.close")
+
+    def test_cookie_solo_mismo_origen(self):
+        cookie = (b"cookie", f"access_token={self._token(self.cliente)}".encode())
+
+        async def conectar(origin):
+            com = ApplicationCommunicator(ws.chat_websocket, {
+                "type": "websocket", "path": ws.PATH, "query_string": b"",
+                "headers": [cookie, (b"host", b"localhost:8000"), (b"origin", origin)],
+            })
+            await com.send_input({"type": "websocket.connect"})
+            out = await com.receive_output(1)
+            await com.send_input({"type": "websocket.disconnect", "code": 1000})
+            await com.wait(1)
+            return out["type"]
+
+        self.assertEqual(async_to_sync(conectar)(b"http://localhost:3000"), "websocket.accept")
+        self.assertEqual(async_to_sync(conectar)(b"https://evil.example"), "websocket.close")
+
+    def test_ping_pong(self):
+        async def run():
+            com = socket(self._token(self.cliente))
+            await com.send_input({"type": "websocket.connect"})
+            await com.receive_output(1)
+            await com.send_input({"type": "websocket.receive", "text": json.dumps({"type": "ping"})})
+            out = await com.receive_output(1)
+            await com.send_input({"type": "websocket.disconnect", "code": 1000})
+            await com.wait(1)
+            return json.loads(out["text"])
+        self.assertEqual(async_to_sync(run)(), {"type": "pong"})
+
+    def test_mensaje_llega_a_ambos_participantes(self):
+        api = APIClient()
+        api.force_authenticate(self.cliente)
+
+        async def run():
+            coms = [socket(self._token(u)) for u in (self.cliente, self.cuidador)]
+            for com in coms:
+                await com.send_input({"type": "websocket.connect"})
+                self.assertEqual((await com.receive_output(1))["type"], "websocket.accept")
+
+            def enviar():
+                with self.captureOnCommitCallbacks(execute=True):
+                    r = api.post(f"/api/conversaciones/{self.conv.id}/mensajes/", {"content": "hola"}, format="json")
+                self.assertEqual(r.status_code, 201)
+
+            await sync_to_async(enviar)()  # mismo hilo/conexión que el test (como una vista bajo ASGI)
+            eventos = []
+            for com in coms:
+                recibidos = [json.loads((await com.receive_output(1))["text"])]
+                while not await com.receive_nothing(0.05):
+                    recibidos.append(json.loads((await com.receive_output(1))["text"]))
+                eventos.append(recibidos)
+                await com.send_input({"type": "websocket.disconnect", "code": 1000})
+                await com.wait(1)
+            return eventos
+
+        del_cliente, del_cuidador = async_to_sync(run)()
+        # el cliente conectó primero: también ve llegar al cuidador
+        self.assertEqual(del_cliente[0], {"type": "presencia", "usuario": self.cuidador.id, "en_linea": True})
+        del_cliente = del_cliente[1:]
+        self.assertEqual([e["type"] for e in del_cliente], ["mensaje"])
+        self.assertTrue(del_cliente[0]["mensaje"]["isOwn"])
+        # y el cuidador, que cerró después, ve salir al cliente
+        self.assertEqual(del_cuidador[-1], {"type": "presencia", "usuario": self.cliente.id, "en_linea": False})
+        self.assertEqual([e["type"] for e in del_cuidador[:-1]], ["mensaje", "unread"])
+        self.assertEqual(del_cuidador[0]["mensaje"]["content"], "hola")
+        self.assertFalse(del_cuidador[0]["mensaje"]["isOwn"])
+        self.assertEqual(del_cuidador[1]["count"], 1)
+
+    def test_desconexion_libera_suscripcion(self):
+        broker = get_broker()
+        antes = broker.conexiones()
+
+        async def run():
+            com = socket(self._token(self.cliente))
+            await com.send_input({"type": "websocket.connect"})
+            await com.receive_output(1)
+            durante = broker.conexiones()
+            await com.send_input({"type": "websocket.disconnect", "code": 1000})
+            await com.wait(1)
+            return durante
+
+        self.assertEqual(async_to_sync(run)(), antes + 1)
+        self.assertEqual(broker.conexiones(), antes)
+
+
+class LecturaConversacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conv = crear_conversacion()
+        cls.cliente, cls.cuidador = cls.conv.cliente, cls.conv.cuidador
+
+    def _mensaje(self, emisor, texto="hola"):
+        msg = Mensaje.objects.create(conversacion=self.conv, emisor=emisor, contenido=texto)
+        self.conv.registrar_mensaje(msg)
+        return msg
+
+    def test_no_cuenta_propios(self):
+        self._mensaje(self.cliente)
+        self._mensaje(self.cuidador)
+        self.assertEqual(contar_no_leidos(self.cliente), 1)
+        self.assertEqual(contar_no_leidos(self.cuidador), 1)
+
+    def test_abrir_marca_leido_y_lo_nuevo_vuelve_a_contar(self):
+        api = APIClient()
+        api.force_authenticate(self.cuidador)
+        for _ in range(5):
+            self._mensaje(self.cliente)
+        r = api.get(f"/api/conversaciones/{self.conv.id}/")
+        self.assertEqual(r.json()["noLeidos"], 5)
+        self.assertEqual(len(api.get(f"/api/conversaciones/{self.conv.id}/mensajes/").json()["results"]), 5)
+        self.assertEqual(api.get("/api/conversaciones/unread/").json(), {"has_unread": False, "count": 0})
+        self._mensaje(self.cliente)
+        self.assertEqual(api.get("/api/conversaciones/unread/").json()["count"], 1)
+
+    def _queries_marcar_leido(self, pendientes):
+        for _ in range(pendientes):
+            self._mensaje(self.cliente)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(marcar_leido(self.conv, self.cuidador))
+        return len(ctx.captured_queries)
+
+    def test_marcar_leido_no_depende_de_cuantos_mensajes(self):
+        self._queries_marcar_leido(1)  # crea la marca y la bandeja
+        self.assertEqual(self._queries_marcar_leido(2), self._queries_marcar_leido(40))
+        self.assertEqual(contar_no_leidos(self.cuidador), 0)
+
+    def test_la_marca_no_retrocede(self):
+        primero, segundo = self._mensaje(self.cliente), self._mensaje(self.cliente)
+        marcar_leido(self.conv, self.cuidador, hasta_id=segundo.id)
+        self.assertFalse(marcar_leido(self.conv, self.cuidador, hasta_id=primero.id))
+        self.assertEqual(LecturaConversacion.objects.get(usuario=self.cuidador).ultimo_leido_id, segundo.id)
+
+    def test_contadores_por_conversacion_y_total(self):
+        otra = Conversacion.objects.create(
+            cliente=Usuario.objects.create_user(username="otro"), cuidador=self.cuidador,
+        )
+        for _ in range(3):
+            self._mensaje(self.cliente)
+        otra.registrar_mensaje(Mensaje.objects.create(conversacion=otra, emisor=otra.cliente, contenido="x"))
+        self.assertEqual(contar_no_leidos(self.cuidador), 4)
+        self.assertEqual(no_leidos_por_conversacion(self.cuidador, [self.conv.id, otra.id]), {self.conv.id: 3, otra.id: 1})
+        # leer hasta el segundo deja uno pendiente
+        segundo = self.conv.mensajes.order_by("id")[1]
+        marcar_leido(self.conv, self.cuidador, hasta_id=segundo.id)
+        self.assertEqual(contar_no_leidos(self.cuidador), 2)
+        self.assertEqual(no_leidos_por_conversacion(self.cuidador, [self.conv.id]), {self.conv.id: 1})
+
+    def test_unread_lee_una_fila(self):
+        self._mensaje(self.cliente)
+        api = APIClient()
+        api.force_authenticate(self.cuidador)
+        with self.assertNumQueries(1):
+            self.assertEqual(api.get("/api/conversaciones/unread/").json(), {"has_unread": True, "count": 1})
+
+    def test_unread_etag_304(self):
+        api = APIClient()
+        api.force_authenticate(self.cuidador)
+        r = api.get("/api/conversaciones/unread/")
+        etag = r["ETag"]
+        self.assertEqual(api.get("/api/conversaciones/unread/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # un mensaje nuevo cambia la versión
+        self._mensaje(self.cliente)
+        r = api.get("/api/conversaciones/unread/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+        self.assertEqual(r.json()["count"], 1)
+
+    def test_rebuild_chat_counters(self):
+        for _ in range(3):
+            self._mensaje(self.cliente)
+        LecturaConversacion.objects.update(no_leidos=0)
+        BandejaChat.objects.update(no_leidos=99)
+        call_command("rebuild_chat_counters", stdout=StringIO())
+        self.assertEqual(contar_no_leidos(self.cuidador), 3)
+        self.assertEqual(contar_no_leidos(self.cliente), 0)
+        self.assertEqual(no_leidos_por_conversacion(self.cuidador, [self.conv.id]), {self.conv.id: 3})
+
+
+class LeidoPorMigrationTests(TransactionTestCase):
+    antes = [("chat", "0001_initial")]
+    despues = [("chat", "0002_lectura_conversacion")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_convierte_leido_por_en_marcas(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.antes)
+        apps = executor.loader.project_state(self.antes).apps
+        User = apps.get_model("users", "Usuario")
+        Conv = apps.get_model("chat", "Conversacion")
+        Msg = apps.get_model("chat", "Mensaje")
+        cliente = User.objects.create(username="c")
+        cuidador = User.objects.create(username="d")
+        conv = Conv.objects.create(cliente=cliente, cuidador=cuidador)
+        leidos = [Msg.objects.create(conversacion=conv, emisor=cliente, contenido=str(i)) for i in range(3)]
+        Msg.objects.create(conversacion=conv, emisor=cliente, contenido="sin leer")
+        for m in leidos:
+            m.leido_por.add(cuidador)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.despues)
+        apps = executor.loader.project_state(self.despues).apps
+        Lectura = apps.get_model("chat", "LecturaConversacion")
+        self.assertEqual(
+            list(Lectura.objects.values_list("conversacion_id", "usuario_id", "ultimo_leido_id")),
+            [(conv.id, cuidador.id, leidos[-1].id)],
+        )
+
+
+class ContadoresMigrationTests(TransactionTestCase):
+    antes = [("chat", "0004_mensaje_conv_creado_idx")]
+    despues = [("chat", "0005_contadores_no_leidos")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_llena_contadores_desde_las_marcas(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.antes)
+        apps = executor.loader.project_state(self.antes).apps
+        User = apps.get_model("users", "Usuario")
+        Conv = apps.get_model("chat", "Conversacion")
+        Msg = apps.get_model("chat", "Mensaje")
+        Lectura = apps.get_model("chat", "LecturaConversacion")
+        cliente = User.objects.create(username="c")
+        cuidador = User.objects.create(username="d")
+        conv = Conv.objects.create(cliente=cliente, cuidador=cuidador)
+        msgs = [Msg.objects.create(conversacion=conv, emisor=cliente, contenido=str(i)) for i in range(4)]
+        Msg.objects.create(conversacion=conv, emisor=cuidador, contenido="respuesta")
+        Lectura.objects.create(conversacion=conv, usuario=cuidador, ultimo_leido_id=msgs[0].id)
+        # conversación con un participante nulo: se saltea
+        sola = Conv.objects.create(cliente=cliente, cuidador=None)
+        Msg.objects.create(conversacion=sola, emisor=cliente, contenido="hola?")
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.despues)
+        apps = executor.loader.project_state(self.despues).apps
+        Lectura = apps.get_model("chat", "LecturaConversacion")
+        Bandeja = apps.get_model("chat", "BandejaChat")
+        self.assertEqual(
+            dict(Lectura.objects.filter(conversacion_id=conv.id).values_list("usuario_id", "no_leidos")),
+            {cuidador.id: 3, cliente.id: 1},
+        )
+        self.assertEqual(
+            list(Lectura.objects.filter(conversacion_id=sola.id).values_list("usuario_id", "no_leidos")),
+            [(cliente.id, 0)],
+        )
+        self.assertEqual(dict(Bandeja.objects.values_list("usuario_id", "no_leidos")), {cuidador.id: 3, cliente.id: 1})
+
+
+class ConversacionListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cuidador = Usuario.objects.create_user(username="cuidador")
+        Cuidador.objects.create(usuario=cls.cuidador, anios_experiencia=3)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.cuidador)
+
+    def _conversaciones(self, n, offset=0):
+        for i in range(offset, offset + n):
+            cliente = Usuario.objects.create_user(username=f"cliente{i}", first_name=f"C{i}")
+            Cliente.objects.create(usuario=cliente)
+            conv = Conversacion.objects.create(cliente=cliente, cuidador=self.cuidador)
+            for texto in ("hola", f"chau {i}"):
+                conv.registrar_mensaje(Mensaje.objects.create(conversacion=conv, emisor=cliente, contenido=texto))
+
+    def _listar(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.api.get("/api/conversaciones/")
+        self.assertEqual(r.status_code, 200)
+        return len(ctx.captured_queries), r.json()
+
+    def test_ultimo_mensaje_y_no_leidos(self):
+        self._conversaciones(1)
+        _, data = self._listar()
+        self.assertEqual(data[0]["ultimoMensaje"], "chau 0")
+        self.assertEqual(data[0]["noLeidos"], 2)
+        self.assertEqual(data[0]["tipo"], "Cliente")
+        self.assertNotEqual(data[0]["hora"], "")
+
+    def test_query_count_constante(self):
+        self._conversaciones(2)
+        pocas, _ = self._listar()
+        self._conversaciones(20, offset=2)
+        muchas, data = self._listar()
+        self.assertEqual(len(data), 22)
+        self.assertEqual(pocas, muchas)
+
+    def test_post_actualiza_ultimo_mensaje(self):
+        self._conversaciones(1)
+        conv = Conversacion.objects.get()
+        self.api.post(f"/api/conversaciones/{conv.id}/mensajes/", {"content": "x" * 300}, format="json")
+        conv.refresh_from_db()
+        self.assertEqual(conv.ultimo_mensaje_texto, "x" * 255)
+        self.assertEqual(conv.ultimo_mensaje_emisor_id, self.cuidador.id)
+
+    def test_post_falla_sin_dejar_mensaje_a_medias(self):
+        self._conversaciones(1)
+        conv = Conversacion.objects.get()
+        with mock.patch("chat.models.registrar_cambio", side_effect=RuntimeError), \
+                self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError):
+                self.api.post(f"/api/conversaciones/{conv.id}/mensajes/", {"content": "perdido"}, format="json")
+        self.assertFalse(Mensaje.objects.filter(contenido="perdido").exists())
+        self.assertEqual(callbacks, [])  # no se publicó nada
+        conv.refresh_from_db()
+        self.assertEqual(conv.ultimo_mensaje_texto, "chau 0")
+        self.assertEqual(contar_no_leidos(self.cuidador), 2)
+
+    def test_mensaje_viejo_no_pisa_al_nuevo(self):
+        self._conversaciones(1)
+        conv = Conversacion.objects.get()
+        conv.registrar_mensaje(Mensaje.objects.filter(conversacion=conv).order_by("id").first())
+        conv.refresh_from_db()
+        self.assertEqual(conv.ultimo_mensaje_texto, "chau 0")
+
+
+class MensajesPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conv = crear_conversacion()
+        cls.ids = [
+            Mensaje.objects.create(conversacion=cls.conv, emisor=cls.conv.cliente, contenido=str(i)).id
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.conv.cuidador)
+        self.url = f"/api/conversaciones/{self.conv.id}/mensajes/"
+
+    def _get(self, **params):
+        r = self.api.get(self.url, params)
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        return [m["id"] for m in data["results"]], data["older"], data["newer"]
+
+    def test_por_defecto_la_pagina_mas_nueva(self):
+        ids, older, newer = self._get(limit=5)
+        self.assertEqual(ids, self.ids[-5:])
+        self.assertEqual((older, newer), (self.ids[-5], None))
+
+    def test_recorrer_hacia_atras(self):
+        vistos, older = [], None
+        while True:
+            ids, older, _ = self._get(limit=5, **({"before": older} if older else {}))
+            vistos = ids + vistos
+            if older is None:
+                break
+        self.assertEqual(vistos, self.ids)
+
+    def test_after(self):
+        ids, older, newer = self._get(after=self.ids[3], limit=4)
+        self.assertEqual(ids, self.ids[4:8])
+        self.assertEqual((older, newer), (self.ids[4], self.ids[7]))
+        ids, _, newer = self._get(after=self.ids[7], limit=10)
+        self.assertEqual((ids, newer), (self.ids[8:], None))
+
+    def test_ancla_de_otra_conversacion(self):
+        otra = Conversacion.objects.create(cliente=self.conv.cuidador, cuidador=None)
+        ajeno = Mensaje.objects.create(conversacion=otra, emisor=self.conv.cuidador, contenido="x")
+        self.assertEqual(self.api.get(self.url, {"before": ajeno.id}).status_code, 404)
+        self.assertEqual(self.api.get(self.url, {"before": "abc"}).status_code, 400)
+
+    def _agregar(self, n):
+        Mensaje.objects.bulk_create(
+            [Mensaje(conversacion=self.conv, emisor=self.conv.cliente, contenido="x") for _ in range(n)]
+        )
+
+    def test_query_count_no_depende_del_historial(self):
+        self._get(limit=5)  # crea la marca de lectura
+        self._agregar(1)
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(limit=5)
+        pocas = len(ctx.captured_queries)
+        self._agregar(200)
+        with CaptureQueriesContext(connection) as ctx:
+            ids, _, _ = self._get(limit=5)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(pocas, len(ctx.captured_queries))
+
+
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conv = crear_conversacion()
+        cls.cliente, cls.cuidador = cls.conv.cliente, cls.conv.cuidador
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.cuidador)
+
+    def _mensaje(self, conv, texto="hola"):
+        msg = Mensaje.objects.create(conversacion=conv, emisor=conv.cliente, contenido=texto)
+        conv.registrar_mensaje(msg)
+        return msg
+
+    def _sync(self, since):
+        r = self.api.get("/api/conversaciones/sync/", {"since": since})
+        self.assertEqual(r.status_code, 200)
+        return r.json()
+
+    def test_sin_since_devuelve_el_token_actual(self):
+        self.assertEqual(self.api.get("/api/conversaciones/sync/").json(), {"token": "0"})
+        self._mensaje(self.conv)
+        token = self.api.get("/api/conversaciones/sync/").json()["token"]
+        self.assertEqual(self._sync(token)["mensajes"], [])
+
+    def test_mensajes_conversaciones_y_lecturas(self):
+        token = self.api.get("/api/conversaciones/sync/").json()["token"]
+        a, b = self._mensaje(self.conv, "uno"), self._mensaje(self.conv, "dos")
+        data = self._sync(token)
+        self.assertEqual([m["mensaje"]["id"] for m in data["mensajes"]], [a.id, b.id])
+        self.assertEqual(data["mensajes"][0]["conversacion"], self.conv.id)
+        self.assertEqual(data["conversaciones"][0]["ultimoMensaje"], "dos")
+        self.assertEqual(data["conversaciones"][0]["noLeidos"], 2)
+        self.assertEqual(data["unread"]["count"], 2)
+
+        # leer en otro dispositivo llega como cambio de lectura
+        token = data["token"]
+        marcar_leido(self.conv, self.cuidador)
+        data = self._sync(token)
+        self.assertEqual(data["mensajes"], [])
+        self.assertEqual(data["lecturas"], [{"conversacion": self.conv.id, "ultimo_leido": b.id, "no_leidos": 0}])
+        self.assertEqual(data["unread"]["count"], 0)
+        self.assertEqual(self._sync(data["token"])["lecturas"], [])
+
+    def test_conversacion_nueva(self):
+        otro = Usuario.objects.create_user(username="otro")
+        Cliente.objects.create(usuario=otro)
+        token = self.api.get("/api/conversaciones/sync/").json()["token"]
+        conv_id = self.api.post("/api/conversaciones/ensure/", {"user_id": otro.id}).json()["id"]
+        self.assertEqual([c["id"] for c in self._sync(token)["conversaciones"]], [conv_id])
+
+    def test_no_ve_cambios_ajenos(self):
+        otra = Conversacion.objects.create(
+            cliente=Usuario.objects.create_user(username="x"), cuidador=Usuario.objects.create_user(username="y"),
+        )
+        self._mensaje(otra)
+        data = self._sync(0)
+        self.assertEqual((data["mensajes"], data["conversaciones"]), ([], []))
+
+    def test_secuencia_bloqueada_antes_de_insertar_cambios(self):
+        # sin bandejas: la primera escritura las crea para poder bloquearlas
+        BandejaChat.objects.all().delete()
+        with CaptureQueriesContext(connection) as ctx:
+            self._mensaje(self.conv)
+        sqls = [q["sql"] for q in ctx.captured_queries]
+        primera_bandeja = next(n for n, sql in enumerate(sqls) if "chat_bandejachat" in sql)
+        insert_cambio = next(n for n, sql in enumerate(sqls) if sql.startswith('INSERT INTO "chat_cambiochat"'))
+        primera_lectura = next(n for n, sql in enumerate(sqls) if "chat_lecturaconversacion" in sql)
+        self.assertLess(primera_bandeja, min(insert_cambio, primera_lectura))
+        self.assertEqual(
+            set(BandejaChat.objects.values_list("usuario_id", flat=True)), {self.cliente.id, self.cuidador.id},
+        )
+        self.assertEqual(contar_no_leidos(self.cuidador), 1)
+
+    def test_token_invalido(self):
+        self.assertEqual(self.api.get("/api/conversaciones/sync/", {"since": "abc"}).status_code, 400)
+
+    def test_has_more(self):
+        from chat import sync
+        original, sync.LIMITE = sync.LIMITE, 2
+        self.addCleanup(setattr, sync, "LIMITE", original)
+        ids = [self._mensaje(self.conv).id for _ in range(3)]
+        data = self._sync(0)
+        self.assertTrue(data["has_more"])
+        self.assertEqual([m["mensaje"]["id"] for m in data["mensajes"]], ids[:2])
+        data = self._sync(data["token"])
+        self.assertFalse(data["has_more"])
+        self.assertEqual([m["mensaje"]["id"] for m in data["mensajes"]], ids[2:])
+
+    def test_query_count_no_depende_del_historial(self):
+        for _ in range(40):
+            self._mensaje(self.conv)
+        token = self.api.get("/api/conversaciones/sync/").json()["token"]
+        self._mensaje(self.conv)
+        with CaptureQueriesContext(connection) as pocos:
+            self._sync(token)
+        otra = Conversacion.objects.create(cliente=Usuario.objects.create_user(username="z"), cuidador=self.cuidador)
+        token = self.api.get("/api/conversaciones/sync/").json()["token"]
+        for _ in range(5):
+            self._mensaje(self.conv)
+            self._mensaje(otra)
+        with CaptureQueriesContext(connection) as muchos:
+            data = self._sync(token)
+        self.assertEqual(len(data["mensajes"]), 10)
+        self.assertEqual(len(pocos.captured_queries), len(muchos.captured_queries))
+
+
+class BusquedaMensajesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conv = crear_conversacion()
+        cls.cliente, cls.cuidador = cls.conv.cliente, cls.conv.cuidador
+        textos = ["hola, ¿cómo está?", "la medicación es a las 8", "gracias", "cambió el horario de la medicación",
+                  "nos vemos mañana"]
+        cls.mensajes = [
+            Mensaje.objects.create(conversacion=cls.conv, emisor=cls.cliente, contenido=t) for t in textos
+        ]
+        ajena = Conversacion.objects.create(
+            cliente=Usuario.objects.create_user(username="x"), cuidador=Usuario.objects.create_user(username="y"),
+        )
+        Mensaje.objects.create(conversacion=ajena, emisor=ajena.cliente, contenido="medicación ajena")
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.cuidador)
+
+    def _buscar(self, texto, **params):
+        r = self.api.get("/api/mensajes/", {"search": texto, **params})
+        self.assertEqual(r.status_code, 200)
+        return r.json()["results"]
+
+    def test_solo_conversaciones_propias_y_con_fragmento(self):
+        resultados = self._buscar("medicacion")  # sin tilde igual encuentra
+        self.assertEqual({r["id"] for r in resultados}, {self.mensajes[1].id, self.mensajes[3].id})
+        self.assertTrue(all("[[medicación]]" in r["snippet"] for r in resultados))
+        self.assertEqual(resultados[0]["conversacion"], self.conv.id)
+        self.assertEqual(resultados[0]["cursor"], {"around": resultados[0]["id"]})
+
+    def test_prefijo_y_todos_los_terminos(self):
+        self.assertEqual([r["id"] for r in self._buscar("horar medic")], [self.mensajes[3].id])
+        self.assertEqual(self._buscar("!!"), [])
+
+    def test_edicion_y_borrado_actualizan_el_indice(self):
+        msg = self.mensajes[2]
+        msg.contenido = "gracias por la receta"
+        msg.save()
+        self.assertEqual([r["id"] for r in self._buscar("receta")], [msg.id])
+        msg.delete()
+        self.assertEqual(self._buscar("receta"), [])
+
+    def test_cursor_abre_la_ventana_alrededor(self):
+        objetivo = self.mensajes[2]
+        r = self.api.get(f"/api/conversaciones/{self.conv.id}/mensajes/", {"around": objetivo.id, "limit": 3})
+        data = r.json()
+        self.assertEqual([m["id"] for m in data["results"]], [m.id for m in self.mensajes[1:4]])
+        self.assertEqual((data["older"], data["newer"]), (self.mensajes[1].id, self.mensajes[3].id))
+
+    def test_rebuild_chat_search_index(self):
+        from chat import search_index
+        with connection.cursor() as cur:
+            cur.execute(f"DELETE FROM {search_index.TABLA}")
+        self.assertEqual(self._buscar("medicación"), [])
+        call_command("rebuild_chat_search_index", stdout=StringIO())
+        self.assertEqual(len(self._buscar("medicación")), 2)
+
+
+class ArchivoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conv = crear_conversacion()
+        cls.cliente, cls.cuidador = cls.conv.cliente, cls.conv.cuidador
+        viejo = timezone.now() - timedelta(days=400)
+        cls.ids = []
+        for i in range(12):
+            emisor = cls.cliente if i % 2 else cls.cuidador
+            msg = Mensaje.objects.create(conversacion=cls.conv, emisor=emisor, contenido=f"mensaje {i}")
+            if i < 8:  # los primeros 8 son viejos
+                Mensaje.objects.filter(pk=msg.pk).update(creado_en=viejo + timedelta(minutes=i))
+            cls.ids.append(msg.id)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(CHAT_ARCHIVO_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.root = tmp.name
+        self.api = APIClient()
+        self.api.force_authenticate(self.cuidador)
+
+    def _archivar(self, **opts):
+        out = StringIO()
+        call_command("archivar_mensajes", "--dias", "30", "--por-segmento", "3", stdout=out, **opts)
+        return out.getvalue()
+
+    def _pagina(self, **params):
+        r = self.api.get(f"/api/conversaciones/{self.conv.id}/mensajes/", params)
+        self.assertEqual(r.status_code, 200)
+        return r.json()
+
+    def test_mueve_a_segmentos_y_reporta(self):
+        salida = self._archivar()
+        self.assertIn("8 mensajes de 1 conversaciones en 3 segmentos", salida)
+        self.assertIn("Throughput", salida)
+        self.assertEqual(list(self.conv.mensajes.values_list("id", flat=True)), self.ids[8:])
+        segmentos = list(SegmentoArchivo.objects.order_by("desde_id"))
+        self.assertEqual([s.cantidad for s in segmentos], [3, 3, 2])
+        self.assertEqual((segmentos[0].desde_id, segmentos[-1].hasta_id), (self.ids[0], self.ids[7]))
+        self.assertTrue(all(os.path.exists(os.path.join(self.root, s.archivo)) for s in segmentos))
+        # ya no están en el índice full-text
+        self.assertEqual(len(self.api.get("/api/mensajes/", {"search": "mensaje"}).json()["results"]), 4)
+
+    def test_descuenta_los_no_leidos_archivados(self):
+        reconstruir_contadores()
+        marcar_leido(self.conv, self.cuidador, hasta_id=self.ids[3])
+        versiones = {u.id: bandeja(u)[1] for u in (self.cliente, self.cuidador)}
+        self.assertEqual((contar_no_leidos(self.cliente), contar_no_leidos(self.cuidador)), (6, 4))
+        self._archivar()
+        for usuario in (self.cliente, self.cuidador):
+            self.assertEqual(contar_no_leidos(usuario), 2)
+            self.assertEqual(no_leidos(usuario).count(), 2)
+            self.assertEqual(no_leidos_por_conversacion(usuario, [self.conv.id]), {self.conv.id: 2})
+            self.assertGreater(bandeja(usuario)[1], versiones[usuario.id])
+
+    def test_dry_run_no_toca_nada(self):
+        self.assertIn("Se archivarían 8 mensajes", self._archivar(dry_run=True))
+        self.assertEqual(self.conv.mensajes.count(), 12)
+
+    def test_paginacion_sigue_por_el_archivo(self):
+        self._archivar()
+        data = self._pagina(limit=5)
+        self.assertEqual([m["id"] for m in data["results"]], self.ids[7:])
+        vistos = [m["id"] for m in data["results"]]
+        while data["older"]:
+            data = self._pagina(limit=5, before=data["older"])
+            vistos = [m["id"] for m in data["results"]] + vistos
+        self.assertEqual(vistos, self.ids)
+        self.assertEqual(data["results"][0]["content"], "mensaje 0")
+        self.assertEqual([m["isOwn"] for m in data["results"][:2]], [True, False])
+
+    def test_after_y_around_desde_un_archivado(self):
+        self._archivar()
+        data = self._pagina(limit=4, after=self.ids[5])
+        self.assertEqual([m["id"] for m in data["results"]], self.ids[6:10])
+        self.assertEqual(data["newer"], self.ids[9])
+        data = self._pagina(limit=4, around=self.ids[3])
+        self.assertEqual([m["id"] for m in data["results"]], self.ids[1:5])
+        self.assertEqual((data["older"], data["newer"]), (self.ids[1], self.ids[4]))
+
+    def test_borrar_conversacion_borra_archivos(self):
+        self._archivar()
+        archivos = list(SegmentoArchivo.objects.values_list("archivo", flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            Conversacion.objects.filter(pk=self.conv.pk).delete()
+        self.assertFalse(any(os.path.exists(os.path.join(self.root, a)) for a in archivos))
+
+
+class LeerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conv = crear_conversacion()
+        cls.cliente, cls.cuidador = cls.conv.cliente, cls.conv.cuidador
+        cls.otra = Conversacion.objects.create(cliente=Usuario.objects.create_user(username="otro"), cuidador=cls.cuidador)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.cuidador)
+
+    def _mensajes(self, conv, n):
+        msgs = [Mensaje.objects.create(conversacion=conv, emisor=conv.cliente, contenido=str(i)) for i in range(n)]
+        for m in msgs:
+            conv.registrar_mensaje(m)
+        return msgs
+
+    def test_leer_conversacion(self):
+        msgs = self._mensajes(self.conv, 4)
+        self._mensajes(self.otra, 2)
+        r = self.api.post(f"/api/conversaciones/{self.conv.id}/leer/", {"hasta": msgs[1].id}, format="json")
+        self.assertEqual(r.json(), {"conversacion": self.conv.id, "no_leidos": 2, "count": 4, "has_unread": True})
+        r = self.api.post(f"/api/conversaciones/{self.conv.id}/leer/")
+        self.assertEqual(r.json(), {"conversacion": self.conv.id, "no_leidos": 0, "count": 2, "has_unread": True})
+        self.assertEqual(
+            self.api.post(f"/api/conversaciones/{self.conv.id}/leer/", {"hasta": "x"}, format="json").status_code, 400,
+        )
+
+    def test_leer_conversacion_ajena(self):
+        ajena = Conversacion.objects.create(
+            cliente=Usuario.objects.create_user(username="x"), cuidador=Usuario.objects.create_user(username="y"),
+        )
+        self.assertEqual(self.api.post(f"/api/conversaciones/{ajena.id}/leer/").status_code, 404)
+
+    def test_leer_todo(self):
+        self._mensajes(self.conv, 3)
+        ultimo = self._mensajes(self.otra, 2)[-1]
+        r = self.api.post("/api/conversaciones/leer-todo/")
+        self.assertEqual(r.json()["count"], 0)
+        self.assertEqual(sorted(r.json()["conversaciones"]), sorted([self.conv.id, self.otra.id]))
+        lectura = LecturaConversacion.objects.get(usuario=self.cuidador, conversacion=self.otra)
+        self.assertEqual(lectura.ultimo_leido_id, ultimo.id)
+        self.assertEqual(
+            self.api.post("/api/conversaciones/leer-todo/").json(),
+            {"conversaciones": [], "count": 0, "has_unread": False},
+        )
+        # lo nuevo vuelve a contar
+        self._mensajes(self.conv, 1)
+        self.assertEqual(contar_no_leidos(self.cuidador), 1)
+
+    def _queries(self, url, n):
+        self._mensajes(self.conv, n)
+        self._mensajes(self.otra, n)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.api.post(url).status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_no_depende_de_los_no_leidos(self):
+        url = f"/api/conversaciones/{self.conv.id}/leer/"
+        self.assertEqual(self._queries(url, 2), self._queries(url, 30))
+        url = "/api/conversaciones/leer-todo/"
+        self.assertEqual(self._queries(url, 2), self._queries(url, 30))
+
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+class _PresenciaContada(InMemoryPresencia):
+    def __init__(self):
+        super().__init__()
+        self.llamadas = 0
+
+    def en_linea(self, usuario_ids):
+        self.llamadas += 1
+        return super().en_linea(usuario_ids)
+
+    def escribiendo_en(self, pares):
+        self.llamadas += 1
+        return super().escribiendo_en(pares)
+
+
+@override_settings(CHAT_PRESENCIA_TTL=60, CHAT_ESCRIBIENDO_TTL=8)
+class PresenciaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conv = crear_conversacion()
+        cls.cliente, cls.cuidador = cls.conv.cliente, cls.conv.cuidador
+
+    def setUp(self):
+        self.presencia = _PresenciaContada()
+        self.addCleanup(setattr, presencia, "_presencia", presencia._presencia)
+        presencia._presencia = self.presencia
+
+    def test_memoria_vence_y_purga(self):
+        reloj = _Reloj()
+        registro = InMemoryPresencia(reloj=reloj)
+        registro.latido(1)
+        registro.escribiendo(10, 1)
+        self.assertEqual(registro.en_linea([1, 2]), {1})
+        self.assertEqual(registro.escribiendo_en([(10, 1), (10, 2)]), {(10, 1)})
+        reloj.ahora += 9
+        self.assertEqual(registro.escribiendo_en([(10, 1)]), set())
+        self.assertEqual(registro.en_linea([1]), {1})
+        reloj.ahora += 60
+        self.assertEqual(registro.en_linea([1]), set())
+        registro.latido(2)  # dispara el barrido
+        self.assertEqual(registro.tamanio(), 1)
+        registro.salir(2)
+        self.assertEqual(registro.en_linea([2]), set())
+
+    def test_cache(self):
+        registro = CachePresencia()
+        registro.latido(1)
+        registro.escribiendo(10, 1)
+        self.assertEqual(registro.en_linea([1, 2]), {1})
+        self.assertEqual(registro.escribiendo_en([(10, 1), (10, 2)]), {(10, 1)})
+        registro.escribiendo(10, 1, activo=False)
+        registro.salir(1)
+        self.assertEqual((registro.en_linea([1]), registro.escribiendo_en([(10, 1)])), (set(), set()))
+
+    def test_cache_cuenta_sockets_entre_workers(self):
+        caches["default"].clear()
+        worker_a, worker_b = CachePresencia(), CachePresencia()
+        self.assertTrue(worker_a.conectar(1))
+        self.assertFalse(worker_b.conectar(1))
+        self.assertFalse(worker_a.desconectar(1))
+        self.assertEqual(worker_b.en_linea([1]), {1})
+        self.assertTrue(worker_b.desconectar(1))
+        self.assertEqual(worker_a.en_linea([1]), set())
+
+    def test_dos_sockets_del_mismo_usuario(self):
+        caches["default"].clear()
+        presencia._presencia = CachePresencia()
+        token = {u.id: str(AccessToken.for_user(u)) for u in (self.cliente, self.cuidador)}
+
+        async def run():
+            cuidador = socket(token[self.cuidador.id])
+            await cuidador.send_input({"type": "websocket.connect"})
+            await cuidador.receive_output(1)
+            pestanias = [socket(token[self.cliente.id]) for _ in range(2)]
+            for com in pestanias:
+                await com.send_input({"type": "websocket.connect"})
+                await com.receive_output(1)
+            llegadas = [json.loads((await cuidador.receive_output(1))["text"])]
+            llegadas.append(await cuidador.receive_nothing(0.1))
+            await pestanias[0].send_input({"type": "websocket.disconnect", "code": 1000})
+            await pestanias[0].wait(1)
+            sin_aviso = await cuidador.receive_nothing(0.1)
+            sigue = presencia._presencia.en_linea([self.cliente.id])
+            await pestanias[1].send_input({"type": "websocket.disconnect", "code": 1000})
+            await pestanias[1].wait(1)
+            salida = json.loads((await cuidador.receive_output(1))["text"])
+            await cuidador.send_input({"type": "websocket.disconnect", "code": 1000})
+            await cuidador.wait(1)
+            return llegadas, sin_aviso, sigue, salida
+
+        llegadas, sin_aviso, sigue, salida = async_to_sync(run)()
+        self.assertEqual(llegadas, [{"type": "presencia", "usuario": self.cliente.id, "en_linea": True}, True])
+        self.assertTrue(sin_aviso)
+        self.assertEqual(sigue, {self.cliente.id})
+        self.assertEqual(salida, {"type": "presencia", "usuario": self.cliente.id, "en_linea": False})
+        self.assertEqual(presencia._presencia.en_linea([self.cliente.id]), set())
+
+    def test_listado_consulta_por_lote(self):
+        for i in range(5):
+            otro = Usuario.objects.create_user(username=f"c{i}")
+            Conversacion.objects.create(cliente=otro, cuidador=self.cuidador)
+            if i % 2:
+                self.presencia.latido(otro.id)
+        self.presencia.latido(self.cliente.id)
+        self.presencia.escribiendo(self.conv.id, self.cliente.id)
+        api = APIClient()
+        api.force_authenticate(self.cuidador)
+        data = {c["id"]: c for c in api.get("/api/conversaciones/").json()}
+        self.assertEqual(self.presencia.llamadas, 2)
+        self.assertEqual(sum(c["enLinea"] for c in data.values()), 3)
+        self.assertTrue(data[self.conv.id]["enLinea"])
+        self.assertEqual([i for i, c in data.items() if c["escribiendo"]], [self.conv.id])
+
+    def test_socket_alimenta_presencia_y_escribiendo(self):
+        token = {u.id: str(AccessToken.for_user(u)) for u in (self.cliente, self.cuidador)}
+
+        async def run():
+            cliente, cuidador = socket(token[self.cliente.id]), socket(token[self.cuidador.id])
+            await cuidador.send_input({"type": "websocket.connect"})
+            await cuidador.receive_output(1)
+            await cliente.send_input({"type": "websocket.connect"})
+            await cliente.receive_output(1)
+            llegada = json.loads((await cuidador.receive_output(1))["text"])
+            en_linea = self.presencia.en_linea([self.cliente.id])
+            await cliente.send_input({"type": "websocket.receive", "text": json.dumps(
+                {"type": "escribiendo", "conversacion": self.conv.id}
+            )})
+            escribiendo = json.loads((await cuidador.receive_output(1))["text"])
+            # a una conversación ajena no se avisa
+            await cliente.send_input({"type": "websocket.receive", "text": json.dumps(
+                {"type": "escribiendo", "conversacion": self.conv.id + 999}
+            )})
+            ajena = await cuidador.receive_nothing(0.1)
+            await cliente.send_input({"type": "websocket.disconnect", "code": 1000})
+            await cliente.wait(1)
+            salida = json.loads((await cuidador.receive_output(1))["text"])
+            await cuidador.send_input({"type": "websocket.disconnect", "code": 1000})
+            await cuidador.wait(1)
+            return llegada, en_linea, escribiendo, ajena, salida
+
+        llegada, en_linea, escribiendo, ajena, salida = async_to_sync(run)()
+        self.assertEqual(llegada, {"type": "presencia", "usuario": self.cliente.id, "en_linea": True})
+        self.assertEqual(en_linea, {self.cliente.id})
+        self.assertEqual(escribiendo, {
+            "type": "escribiendo", "conversacion": self.conv.id, "usuario": self.cliente.id, "activo": True,
+        })
+        self.assertTrue(ajena)
+        self.assertEqual(salida, {"type": "presencia", "usuario": self.cliente.id, "en_linea": False})
+        self.assertEqual(self.presencia.en_linea([self.cliente.id, self.cuidador.id]), set())
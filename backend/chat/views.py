@@ -2,12 +2,18 @@ from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied, NotFound
+from django.db import transaction
 from django.db.models import Q
 from django.db.models import Count
 from django.contrib.auth import get_user_model
 
-from .models import Conversacion, Mensaje
-from .serializer import ConversacionListSerializer, MensajeSerializer
+from . import realtime, search_index, sync
+from .models import (
+    CambioChat, Conversacion, Mensaje, bandeja, marcar_leido, marcar_todo_leido, no_leidos_por_conversacion,
+    registrar_cambio,
+)
+from .pagination import MensajeCursorPagination
+from .serializer import ConversacionListSerializer, MensajeBusquedaSerializer, MensajeSerializer, contexto_listado
 
 class IsParticipant(permissions.BasePermission):
     def has_object_permission(self, request, view, obj: Conversacion):
@@ -19,7 +25,19 @@ class ConversacionViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return Conversacion.objects.filter(Q(cliente=user) | Q(cuidador=user)).order_by("-actualizado_en")
+        return (
+            Conversacion.objects
+            .filter(Q(cliente=user) | Q(cuidador=user))
+            # contraparte y sus perfiles (para "tipo") en el mismo SELECT
+            .select_related("cliente__cliente", "cliente__cuidador", "cuidador__cliente", "cuidador__cuidador")
+            .order_by("-actualizado_en")
+        )
+
+    def list(self, request, *args, **kwargs):
+        conversaciones = list(self.filter_queryset(self.get_queryset()))
+        contexto = {**self.get_serializer_context(), **contexto_listado(request.user, conversaciones)}
+        ser = self.get_serializer(conversaciones, many=True, context=contexto)
+        return Response(ser.data)
 
     @action(detail=False, methods=["post"], url_path="ensure")
     def ensure(self, request):
@@ -29,7 +47,7 @@ class ConversacionViewSet(viewsets.ReadOnlyModelViewSet):
 
         User = get_user_model()
         try:
-            other = User.objects.get(pk=other_id)
+            other = User.objects.select_related("cliente", "cuidador").get(pk=other_id)
         except User.DoesNotExist:
             raise NotFound("Usuario no encontrado")
 
@@ -54,19 +72,58 @@ class ConversacionViewSet(viewsets.ReadOnlyModelViewSet):
             else:
                 return Response({"detail": "No se pudo determinar roles cliente/cuidador"}, status=400)
 
-        conv, _ = Conversacion.objects.get_or_create(cliente=cliente_user, cuidador=cuidador_user)
+        with transaction.atomic():
+            conv, creada = Conversacion.objects.get_or_create(cliente=cliente_user, cuidador=cuidador_user)
+            if creada:
+                registrar_cambio(conv, CambioChat.CONVERSACION, (conv.cliente_id, conv.cuidador_id))
         return Response({"id": conv.id})
 
+    @action(detail=False, methods=["get"], url_path="sync")
+    def sync(self, request):
+        # deltas desde el token del cliente; sin token, sólo el token actual
+        if "since" not in request.query_params:
+            return Response({"token": sync.token_actual(request.user)})
+        since = sync.parse_token(request.query_params["since"])
+        return Response(sync.cambios_desde(request, since))
+
     @action(detail=False, methods=["get"], url_path="unread")
     def unread(self, request):
-        user = request.user
-        # count of messages not sent by user and not marked read by user
-        total = Mensaje.objects.filter(
-            Q(conversacion__cliente=user) | Q(conversacion__cuidador=user)
-        ).exclude(emisor=user).exclude(leido_por=user).count()
-        print("total")
-        print(total)
-        return Response({"has_unread": total > 0, "count": total})
+        # contador mantenido (BandejaChat): una lectura por PK; la versión es el ETag
+        total, version = bandeja(request.user)
+        etag = f'"{request.user.id}-{version}"'
+        if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+            response = Response(status=304)
+        else:
+            response = Response({"has_unread": total > 0, "count": total})
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def _totales(self, usuario, **extra):
+        total, _ = bandeja(usuario)
+        return Response({**extra, "count": total, "has_unread": total > 0})
+
+    @action(detail=True, methods=["post"], url_path="leer")
+    def leer(self, request, pk=None):
+        # marca leída la conversación (hasta `hasta` si viene): UPDATE de la marca, no por mensaje
+        conv = self.get_object()
+        hasta = request.data.get("hasta")
+        if hasta is not None:
+            try:
+                hasta = int(hasta)
+            except (TypeError, ValueError):
+                return Response({"hasta": "Tiene que ser un id de mensaje."}, status=400)
+        if marcar_leido(conv, request.user, hasta_id=hasta):
+            realtime.publicar_unread(request.user)
+        no_leidos = no_leidos_por_conversacion(request.user, [conv.id]).get(conv.id, 0)
+        return self._totales(request.user, conversacion=conv.id, no_leidos=no_leidos)
+
+    @action(detail=False, methods=["post"], url_path="leer-todo")
+    def leer_todo(self, request):
+        ids = marcar_todo_leido(request.user)
+        if ids:
+            realtime.publicar_unread(request.user)
+        return self._totales(request.user, conversaciones=ids)
 
     @action(detail=True, methods=["get", "post"], url_path="mensajes")
     def mensajes(self, request, pk=None):
@@ -75,20 +132,24 @@ class ConversacionViewSet(viewsets.ReadOnlyModelViewSet):
             raise PermissionDenied("No participás en esta conversación.")
 
         if request.method.lower() == "get":
-            qs = conv.mensajes.select_related("emisor").all()
-            # marcar como leídos los no propios
-            no_propios = qs.exclude(emisor=request.user)
-            for m in no_propios:
-                m.leido_por.add(request.user)
-            ser = MensajeSerializer(qs, many=True, context={"request": request})
-            return Response(ser.data)
+            # una ventana del historial (?before= / ?after= / la más nueva), no todo
+            paginator = MensajeCursorPagination(conversacion=conv)
+            mensajes = paginator.paginate_queryset(conv.mensajes.select_related("emisor"), request, view=self)
+            # marcar como leído hasta lo que se mostró: un solo UPDATE, nunca retrocede
+            if mensajes and marcar_leido(conv, request.user, hasta_id=max(m.id for m in mensajes)):
+                realtime.publicar_unread(request.user)  # badge de las otras pestañas
+            ser = MensajeSerializer(mensajes, many=True, context={"request": request})
+            return paginator.get_paginated_response(ser.data)
 
         # POST
         contenido = (request.data.get("content") or request.data.get("contenido") or "").strip()
         if not contenido:
             return Response({"detail": "content es requerido"}, status=400)
-        msg = Mensaje.objects.create(conversacion=conv, emisor=request.user, contenido=contenido)
-        conv.save(update_fields=["actualizado_en"])
+        # mensaje, último mensaje, contadores y CambioChat juntos; el evento sale en el commit
+        with transaction.atomic():
+            msg = Mensaje.objects.create(conversacion=conv, emisor=request.user, contenido=contenido)
+            conv.registrar_mensaje(msg)
+            realtime.publicar_mensaje(msg)
         ser = MensajeSerializer(msg, context={"request": request})
         return Response(ser.data, status=201)
 
@@ -103,3 +164,23 @@ class MensajeViewSet(viewsets.ReadOnlyModelViewSet):
             Q(conversacion__cliente=user) | Q(conversacion__cuidador=user)
         ).select_related("emisor", "conversacion")
 
+    BUSQUEDA_LIMITE = 20
+    BUSQUEDA_LIMITE_MAX = 50
+
+    def list(self, request, *args, **kwargs):
+        texto = request.query_params.get("search", "").strip()
+        if not texto:
+            return super().list(request, *args, **kwargs)
+        # ?search=: índice full-text (chat/search_index.py), sólo conversaciones propias
+        try:
+            limit = int(request.query_params.get("limit", self.BUSQUEDA_LIMITE))
+        except ValueError:
+            limit = self.BUSQUEDA_LIMITE
+        limit = max(1, min(limit, self.BUSQUEDA_LIMITE_MAX))
+        resultados = search_index.buscar(request.user, texto)
+        if resultados is None:
+            return Response({"results": []})
+        resultados = resultados.select_related("emisor")[:limit]
+        ser = MensajeBusquedaSerializer(resultados, many=True, context={"request": request})
+        return Response({"results": ser.data})
+
@@ -0,0 +1,162 @@
+# chat/ws.py
+"""
+WebSocket de chat (`/ws/chat/`) como app ASGI pura, montada en config/asgi.py.
+
+Autenticación con el access token JWT: `?token=<jwt>` o, si el Origin es del
+mismo host (o está en CSRF_TRUSTED_ORIGINS), la cookie `CHAT_WS_TOKEN_COOKIE`.
+Cada socket se suscribe al canal de su usuario en el broker (chat/broker.py)
+y recibe los eventos de chat/realtime.py como texto JSON.
+
+El socket alimenta el registro de presencia (chat/presencia.py):
+- conectar y cada {"type": "ping"} (responde {"type": "pong"}) renuevan el
+  latido; al cerrarse el último socket del usuario (en cualquier worker),
+  sale.
+- {"type": "escribiendo", "conversacion": id, "activo": bool} marca que el
+  usuario escribe en esa conversación.
+Los cambios se avisan a las contrapartes con {"type": "presencia", "usuario",
+"en_linea"} y {"type": "escribiendo", "conversacion", "usuario", "activo"}.
+
+Un socket ocioso sólo cuesta dos tareas y una cola chica en el event loop.
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.broker import entregar, get_broker
+from chat.models import Conversacion
+from chat.presencia import get_presencia
+from chat.realtime import canal_usuario
+
+PATH = "/ws/chat/"
+TAMANIO_COLA = 100
+CIERRE_NO_AUTORIZADO = 4401
+
+def _headers(scope):
+    return {k.decode("latin1").lower(): v.decode("latin1") for k, v in scope.get("headers", [])}
+
+
+def _mismo_origen(headers):
+    origin = headers.get("origin")
+    if not origin:
+        return True  # clientes no-navegador
+    if origin in getattr(settings, "CSRF_TRUSTED_ORIGINS", []):
+        return True
+    host = headers.get("host", "").rsplit(":", 1)[0]
+    return urlsplit(origin).hostname == host
+
+
+def token_de(scope):
+    query = parse_qs(scope.get("query_string", b"").decode("latin1"))
+    if query.get("token"):
+        return query["token"][0]
+    headers = _headers(scope)
+    if "cookie" in headers and _mismo_origen(headers):
+        cookie = SimpleCookie()
+        cookie.load(headers["cookie"])
+        nombre = getattr(settings, "CHAT_WS_TOKEN_COOKIE", "access_token")
+        if nombre in cookie:
+            return cookie[nombre].value
+    return None
+
+
+@sync_to_async
+def _usuario_activo(usuario_id):
+    return get_user_model().objects.filter(pk=usuario_id, is_active=True).exists()
+
+
+async def autenticar(scope):
+    token = token_de(scope)
+    if not token:
+        return None
+    try:
+        usuario_id = AccessToken(token)[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+    return usuario_id if await _usuario_activo(usuario_id) else None
+
+
+async def _escribir(cola, send):
+    while True:
+        evento = await cola.get()
+        await send({"type": "websocket.send", "text": json.dumps(evento)})
+
+
+@sync_to_async
+def _contrapartes(usuario_id):
+    """{conversacion_id: id de la contraparte} de las conversaciones del usuario."""
+    filas = Conversacion.objects.filter(Q(cliente_id=usuario_id) | Q(cuidador_id=usuario_id)).values_list(
+        "id", "cliente_id", "cuidador_id",
+    )
+    return {c: (cu if cl == usuario_id else cl) for c, cl, cu in filas if cl is not None and cu is not None}
+
+
+def _avisar(broker, contrapartes, evento):
+    for otro in set(contrapartes.values()):
+        broker.publish(canal_usuario(otro), evento)
+
+
+async def _recibir(evento, cola, usuario_id, contrapartes):
+    try:
+        data = json.loads(evento.get("text") or "{}")
+    except ValueError:
+        return
+    if not isinstance(data, dict):
+        return
+    if data.get("type") == "ping":
+        get_presencia().latido(usuario_id)
+        entregar(cola, {"type": "pong"})
+    elif data.get("type") == "escribiendo":
+        conversacion = data.get("conversacion")
+        if not isinstance(conversacion, int):
+            return
+        if conversacion not in contrapartes:  # conversación creada después de conectar
+            contrapartes.update(await _contrapartes(usuario_id))
+            if conversacion not in contrapartes:
+                return
+        activo = bool(data.get("activo", True))
+        get_presencia().escribiendo(conversacion, usuario_id, activo)
+        get_broker().publish(canal_usuario(contrapartes[conversacion]), {
+            "type": "escribiendo", "conversacion": conversacion, "usuario": usuario_id, "activo": activo,
+        })
+
+
+async def chat_websocket(scope, receive, send):
+    evento = await receive()
+    if evento["type"] != "websocket.connect":
+        return
+    usuario_id = await autenticar(scope)
+    if usuario_id is None:
+        await send({"type": "websocket.close", "code": CIERRE_NO_AUTORIZADO})
+        return
+    await send({"type": "websocket.accept"})
+
+    broker = get_broker()
+    canal = canal_usuario(usuario_id)
+    cola = asyncio.Queue(maxsize=TAMANIO_COLA)
+    broker.subscribe(canal, cola, asyncio.get_running_loop())
+    escritor = asyncio.create_task(_escribir(cola, send))
+    presencia = get_presencia()
+    contrapartes = await _contrapartes(usuario_id)
+    if presencia.conectar(usuario_id):
+        _avisar(broker, contrapartes, {"type": "presencia", "usuario": usuario_id, "en_linea": True})
+    try:
+        while True:
+            evento = await receive()
+            if evento["type"] == "websocket.disconnect":
+                break
+            if evento["type"] == "websocket.receive":
+                await _recibir(evento, cola, usuario_id, contrapartes)
+    finally:
+        broker.unsubscribe(canal, cola)
+        escritor.cancel()
+        if presencia.desconectar(usuario_id):
+            _avisar(broker, contrapartes, {"type": "presencia", "usuario": usuario_id, "en_linea": False})
@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; the chat WebSocket (``/ws/chat/``, see chat/ws.py) is
+served by a plain ASGI app on the same entry point.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from chat.ws import PATH as CHAT_WS_PATH, chat_websocket  # noqa: E402  (necesita las apps cargadas)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        if scope["path"] == CHAT_WS_PATH:
+            return await chat_websocket(scope, receive, send)
+        await receive()
+        await send({"type": "websocket.close", "code": 4404})
+        return
+    return await django_application(scope, receive, send)
@@ -170,3 +170,33 @@ SIMPLE_JWT = {
 }
 
 APPEND_SLASH = False
+
+# Índice columnar en memoria para /api/search/ (requiere numpy; ver users/cuidador_index.py)
+SEARCH_INMEMORY_INDEX = False
+SEARCH_INMEMORY_INDEX_MAX_AGE = 300  # segundos hasta reconstruirlo completo
+
+# Cache de respuestas de /api/search/ (ver users/search_cache.py); 0 lo desactiva.
+# Con varios workers usar un cache compartido (Redis/Memcached) para que la
+# invalidación llegue a todos.
+SEARCH_CACHE_TTL = 60
+
+# Cache por receptor de /api/servicios/stats/cuidador/ (ver services/estadisticas.py); 0 lo desactiva.
+# Se invalida con cada cambio de sus servicios o calificaciones; el TTL cubre el paso del tiempo.
+STATS_CUIDADOR_TTL = 60
+
+# WebSocket de chat (config/asgi.py -> chat/ws.py). Con varios procesos usar un
+# broker compartido en lugar del de memoria.
+CHAT_BROKER = "chat.broker.InMemoryBroker"
+CHAT_WS_TOKEN_COOKIE = "access_token"
+
+# Archivo en frío de mensajes de chat (chat/archivo.py, comando archivar_mensajes):
+# los mensajes más viejos que CHAT_ARCHIVO_DIAS pasan a segmentos JSONL gzip
+# por conversación en CHAT_ARCHIVO_ROOT (fuera de MEDIA_ROOT: no son públicos).
+CHAT_ARCHIVO_DIAS = 365
+CHAT_ARCHIVO_ROOT = os.path.join(BASE_DIR, 'chat_archivo')
+
+# Presencia y "escribiendo..." (chat/presencia.py), alimentados por el WebSocket.
+# Con varios workers usar "chat.presencia.CachePresencia" sobre un cache compartido.
+CHAT_PRESENCIA = "chat.presencia.InMemoryPresencia"
+CHAT_PRESENCIA_TTL = 60  # segundos sin ping hasta figurar desconectado
+CHAT_ESCRIBIENDO_TTL = 8
@@ -34,7 +34,8 @@ from services.views import (
     ExperienciaViewSet,
     CertificacionViewSet,
     DiaSemanalViewSet,
-    HorarioDiarioViewSet
+    HorarioDiarioViewSet,
+    calendario_ics,
 )
 
 router = DefaultRouter()
@@ -67,6 +68,7 @@ urlpatterns = [
     path("api/cuidador/perfil/", CuidadorPerfilView.as_view(), name="cuidador_perfil"),
     path("api/cliente/perfil/", ClientePerfilView.as_view(), name="cliente_perfil"),
     path("api/search/", CuidadorSearchView.as_view(), name="cuidadores_search"),
+    path("api/calendario/<str:token>.ics", calendario_ics, name="servicios_calendario_ics"),
     
     # Admin endpoints
     path("api/admin/stats/", AdminStatsView.as_view(), name="admin_stats"),
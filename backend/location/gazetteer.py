@@ -0,0 +1,49 @@
+# location/gazetteer.py
+"""
+Nomenclátor offline de ciudades (location/data/gazetteer_ar.csv) y cálculo de distancias.
+Sin red ni PostGIS: las coordenadas salen del CSV y la distancia es haversine.
+"""
+import csv
+import math
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+RADIO_TIERRA_KM = 6371.0088
+ARCHIVO = Path(__file__).resolve().parent / "data" / "gazetteer_ar.csv"
+
+
+def normalizar(nombre):
+    sin_acentos = unicodedata.normalize("NFKD", nombre or "").encode("ascii", "ignore").decode()
+    return " ".join(sin_acentos.casefold().split())
+
+
+def filas():
+    """[(provincia, ciudad, lat, lng)] tal cual el CSV."""
+    with open(ARCHIVO, encoding="utf-8") as f:
+        return [(r["provincia"], r["ciudad"], float(r["latitud"]), float(r["longitud"])) for r in csv.DictReader(f)]
+
+
+@lru_cache(maxsize=1)
+def cargar():
+    """{(provincia, ciudad) normalizados: (lat, lng)}"""
+    return {(normalizar(p), normalizar(c)): (lat, lng) for p, c, lat, lng in filas()}
+
+
+def buscar(provincia, ciudad):
+    return cargar().get((normalizar(provincia), normalizar(ciudad)))
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat, dlng = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlng / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radio_km):
+    """(lat_min, lat_max, lng_min, lng_max) que contiene el círculo de radio_km."""
+    dlat = math.degrees(radio_km / RADIO_TIERRA_KM)
+    cos_lat = math.cos(math.radians(lat))
+    dlng = 180.0 if cos_lat < 1e-6 else min(180.0, math.degrees(radio_km / (RADIO_TIERRA_KM * cos_lat)))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from location import gazetteer
+from location.models import Provincia, Ciudad
+
+
+class Command(BaseCommand):
+    help = "Completa latitud/longitud de las ciudades desde el nomenclátor offline (location/data/gazetteer_ar.csv)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--crear", action="store_true", help="Crear provincias/ciudades del nomenclátor que no existan.")
+        parser.add_argument("--pisar", action="store_true", help="Reemplazar coordenadas ya cargadas.")
+
+    def handle(self, *args, **opts):
+        actualizadas = 0
+        for ciudad in Ciudad.objects.select_related("provincia"):
+            if ciudad.latitud is not None and not opts["pisar"]:
+                continue
+            coords = gazetteer.buscar(ciudad.provincia.nombre, ciudad.nombre)
+            if coords:
+                ciudad.latitud, ciudad.longitud = coords
+                ciudad.save(update_fields=["latitud", "longitud"])
+                actualizadas += 1
+
+        creadas = 0
+        if opts["crear"]:
+            existentes = {
+                (gazetteer.normalizar(p), gazetteer.normalizar(c))
+                for p, c in Ciudad.objects.values_list("provincia__nombre", "nombre")
+            }
+            provincias = {gazetteer.normalizar(p.nombre): p for p in Provincia.objects.all()}
+            for nombre_prov, nombre_ciudad, lat, lng in gazetteer.filas():
+                clave = (gazetteer.normalizar(nombre_prov), gazetteer.normalizar(nombre_ciudad))
+                if clave in existentes:
+                    continue
+                prov = provincias.get(clave[0])
+                if prov is None:
+                    prov = provincias[clave[0]] = Provincia.objects.create(nombre=nombre_prov)
+                Ciudad.objects.create(nombre=nombre_ciudad, provincia=prov, latitud=lat, longitud=lng)
+                existentes.add(clave)
+                creadas += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Coordenadas actualizadas: {actualizadas}. Ciudades creadas: {creadas}."))
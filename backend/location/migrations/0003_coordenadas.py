@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+from location import gazetteer
+
+
+def completar_coordenadas(apps, schema_editor):
+    Ciudad = apps.get_model('location', 'Ciudad')
+    for ciudad in Ciudad.objects.select_related('provincia').filter(latitud__isnull=True):
+        coords = gazetteer.buscar(ciudad.provincia.nombre, ciudad.nombre)
+        if coords:
+            ciudad.latitud, ciudad.longitud = coords
+            ciudad.save(update_fields=['latitud', 'longitud'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location', '0002_alter_ciudad_nombre_alter_ciudad_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ciudad',
+            name='latitud',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ciudad',
+            name='longitud',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='direccion',
+            name='latitud',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='direccion',
+            name='longitud',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ciudad',
+            index=models.Index(fields=['latitud', 'longitud'], name='ciudad_lat_lng_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='direccion',
+            index=models.Index(fields=['latitud', 'longitud'], name='direccion_lat_lng_idx'),
+        ),
+        migrations.RunPython(completar_coordenadas, migrations.RunPython.noop),
+    ]
@@ -8,11 +8,29 @@ class Provincia(models.Model):
 class Ciudad(models.Model):
     nombre = models.CharField(max_length=100)
     provincia = models.ForeignKey(Provincia, related_name='ciudades', on_delete=models.CASCADE)
+    # del nomenclátor offline (location/gazetteer.py); se completan al guardar si se conocen
+    latitud = models.FloatField(null=True, blank=True)
+    longitud = models.FloatField(null=True, blank=True)
     class Meta:
         unique_together = ('nombre', 'provincia')
+        indexes = [models.Index(fields=['latitud', 'longitud'], name='ciudad_lat_lng_idx')]
     def __str__(self):
         return f"{self.nombre}, {self.provincia.nombre}"
 
+    def save(self, *args, **kwargs):
+        if self.latitud is None and self.longitud is None:
+            from location import gazetteer
+            coords = gazetteer.buscar(self.provincia.nombre, self.nombre)
+            if coords:
+                self.latitud, self.longitud = coords
+        super().save(*args, **kwargs)
+
 class Direccion(models.Model):
     direccion = models.CharField(max_length=255)
-    ciudad = models.ForeignKey(Ciudad, related_name='direcciones', on_delete=models.CASCADE)
\ No newline at end of file
+    ciudad = models.ForeignKey(Ciudad, related_name='direcciones', on_delete=models.CASCADE)
+    # opcionales: si faltan se usa la ubicación de la ciudad
+    latitud = models.FloatField(null=True, blank=True)
+    longitud = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['latitud', 'longitud'], name='direccion_lat_lng_idx')]
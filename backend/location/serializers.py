@@ -15,7 +15,7 @@ class CiudadSerializer(serializers.ModelSerializer):
     )
     class Meta:
         model = Ciudad
-        fields = ['id', 'nombre', 'provincia', 'provincia_id']
+        fields = ['id', 'nombre', 'provincia', 'provincia_id', 'latitud', 'longitud']
 
 class DireccionSerializer(serializers.ModelSerializer):
     ciudad = CiudadSerializer(read_only=True)
@@ -24,4 +24,4 @@ class DireccionSerializer(serializers.ModelSerializer):
     )
     class Meta:
         model = Direccion
-        fields = ['id', 'direccion', 'ciudad', 'ciudad_id']
\ No newline at end of file
+        fields = ['id', 'direccion', 'ciudad', 'ciudad_id', 'latitud', 'longitud']
\ No newline at end of file
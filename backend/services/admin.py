@@ -6,4 +6,5 @@ admin.site.register(Calificacion)
 admin.site.register(Experiencia)
 admin.site.register(Certificacion)
 admin.site.register(DiaSemanal)
-admin.site.register(HorarioDiario)
\ No newline at end of file
+admin.site.register(HorarioDiario)
+admin.site.register(RatingStats)
\ No newline at end of file
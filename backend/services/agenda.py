@@ -0,0 +1,189 @@
+# services/agenda.py
+"""
+Horario estructurado de un Servicio y detección de choques.
+
+Un servicio se repite entre fecha_inicio y fecha_fin (semiabierto) los días
+de `dias_mask` (bit 0 = lunes ... bit 6 = domingo), de `minuto_inicio` a
+`minuto_fin` (minutos desde la medianoche, semiabierto, fin <= 1440).
+
+Dos servicios del mismo cuidador chocan si se superponen sus fechas, sus
+franjas horarias y algún día de la semana dentro del tramo común. La consulta
+(`conflictos`) filtra en la base por receptor + aceptado + rango de fechas
+(índice `servicio_agenda_idx`, que arranca por fecha_fin y así saltea el
+historial ya terminado) y por máscara/franja; sólo el chequeo fino de qué
+días caen en un tramo común de menos de una semana se hace en Python.
+
+`horas_dia` queda como etiqueta libre: de ahí se deriva la franja cuando no
+viene explícita (`franja`).
+
+`ocurrencias` expande servicios en visitas concretas dentro de una ventana.
+Por cada día de la máscara se calcula la primera fecha del tramo y se avanza
+de a 7 días: el costo es proporcional a las visitas devueltas, no a los días
+del rango, y todo es perezoso (heapq.merge) para poder ir escribiendo.
+"""
+import heapq
+import re
+import unicodedata
+from datetime import datetime, time, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+DIAS = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
+TODOS = (1 << len(DIAS)) - 1
+MINUTOS_DIA = 24 * 60
+
+# franjas de HorarioDiario (semiabiertas: mañana y tarde no chocan entre sí)
+FRANJAS = {
+    "manana": (8 * 60, 12 * 60),
+    "tarde": (12 * 60, 18 * 60),
+    "noche": (18 * 60, MINUTOS_DIA),
+}
+
+_RANGO = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*(?:-|–|a)\s*(\d{1,2})(?::(\d{2}))?$")
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFD", (texto or "").strip().lower())
+    return "".join(c for c in texto if unicodedata.category(c) != "Mn")
+
+
+def mascara(nombres):
+    """Máscara de días a partir de nombres de DiaSemanal. Sin días reconocidos = todos."""
+    mask = 0
+    for nombre in nombres:
+        nombre = _normalizar(nombre)
+        if nombre in DIAS:
+            mask |= 1 << DIAS.index(nombre)
+    return mask or TODOS
+
+
+def franja(horas_dia):
+    """
+    (minuto_inicio, minuto_fin) a partir del texto de horas_dia: "Mañana" /
+    "Tarde" / "Noche", o un rango "08:00-12:30" / "8 a 12". Cualquier otra cosa
+    (p.ej. una cantidad de horas sin hora de inicio) ocupa el día completo.
+    """
+    texto = _normalizar(horas_dia)
+    if texto in FRANJAS:
+        return FRANJAS[texto]
+    m = _RANGO.match(texto)
+    if m:
+        inicio = int(m.group(1)) * 60 + int(m.group(2) or 0)
+        fin = int(m.group(3)) * 60 + int(m.group(4) or 0)
+        if 0 <= inicio < fin <= MINUTOS_DIA:
+            return inicio, fin
+    return 0, MINUTOS_DIA
+
+
+def _fecha_local(dt):
+    return (timezone.localtime(dt) if timezone.is_aware(dt) else dt).date()
+
+
+def tramo(servicio):
+    """(primer_dia, ultimo_dia) locales que cubre el servicio (fecha_fin es excluyente)."""
+    return _fecha_local(servicio.fecha_inicio), _fecha_local(servicio.fecha_fin - timedelta(microseconds=1))
+
+
+def cantidad_visitas(dias_mask, primero, ultimo):
+    """Cuántas fechas de [primero, ultimo] caen en la máscara (aritmética, sin recorrer días)."""
+    total = 0
+    for dia in range(len(DIAS)):
+        if dias_mask & (1 << dia):
+            inicio = primero + timedelta(days=(dia - primero.weekday()) % 7)
+            if inicio <= ultimo:
+                total += (ultimo - inicio).days // 7 + 1
+    return total
+
+
+def minutos_totales(servicio):
+    """Minutos de todas las visitas del servicio (se guarda en Servicio.minutos_totales)."""
+    return cantidad_visitas(servicio.dias_mask, *tramo(servicio)) * max(servicio.minuto_fin - servicio.minuto_inicio, 0)
+
+
+def _serie(primero, cantidad):
+    for k in range(cantidad):
+        yield primero + timedelta(weeks=k)
+
+
+def fechas(dias_mask, primero, ultimo):
+    """Fechas de [primero, ultimo] cuyo día de la semana está en la máscara, en orden."""
+    series = []
+    for dia in range(len(DIAS)):
+        if dias_mask & (1 << dia):
+            inicio = primero + timedelta(days=(dia - primero.weekday()) % 7)
+            if inicio <= ultimo:
+                series.append(_serie(inicio, (ultimo - inicio).days // 7 + 1))
+    return heapq.merge(*series)
+
+
+def visita(servicio, fecha):
+    """(inicio, fin) aware de la visita de `servicio` en `fecha`."""
+    base = timezone.make_aware(datetime.combine(fecha, time.min))
+    return base + timedelta(minutes=servicio.minuto_inicio), base + timedelta(minutes=servicio.minuto_fin)
+
+
+def _visitas(servicio, desde, hasta):
+    primero, ultimo = tramo(servicio)
+    primero, ultimo = max(primero, desde), min(ultimo, hasta - timedelta(days=1))
+    for fecha in fechas(servicio.dias_mask, primero, ultimo):
+        inicio, fin = visita(servicio, fecha)
+        yield inicio, servicio.pk, fin, servicio
+
+
+def ocurrencias(servicios, desde, hasta):
+    """
+    Visitas de `servicios` con fecha en [desde, hasta) (fechas locales), en
+    orden cronológico: iterador de (inicio, fin, servicio).
+    """
+    for inicio, _, fin, servicio in heapq.merge(*(_visitas(s, desde, hasta) for s in servicios)):
+        yield inicio, fin, servicio
+
+
+def _comparten_dia(a, b, mask):
+    """¿Algún día con bit en `mask` cae en el tramo común de los servicios `a` y `b`?"""
+    desde = max(a[0], b[0])
+    hasta = min(a[1], b[1])
+    if desde >= hasta:
+        return False
+    dia = timezone.localtime(desde).date()
+    ultimo = timezone.localtime(hasta - timedelta(microseconds=1)).date()
+    if (ultimo - dia).days >= len(DIAS) - 1:
+        return True
+    while dia <= ultimo:
+        if mask & (1 << dia.weekday()):
+            return True
+        dia += timedelta(days=1)
+    return False
+
+
+def conflictos(receptor_id, fecha_inicio, fecha_fin, dias_mask, minuto_inicio, minuto_fin, excluir=None):
+    """Servicios aceptados de `receptor_id` que chocan con el horario dado, por fecha_inicio."""
+    from .models import Servicio
+
+    candidatos = (
+        Servicio.objects
+        .filter(
+            # `aceptado__in` y no `aceptado=True`: en SQLite éste sale como "WHERE aceptado" y no usa el índice
+            receptor_id=receptor_id, aceptado__in=[True],
+            fecha_fin__gt=fecha_inicio, fecha_inicio__lt=fecha_fin,
+            minuto_inicio__lt=minuto_fin, minuto_fin__gt=minuto_inicio,
+        )
+        .annotate(dias_comunes=F("dias_mask").bitand(dias_mask))
+        .exclude(dias_comunes=0)
+        .only("id", "fecha_inicio", "fecha_fin", "dias_mask")
+        .order_by("fecha_inicio", "id")
+    )
+    if excluir is not None:
+        candidatos = candidatos.exclude(pk=excluir)
+    return [
+        s for s in candidatos
+        if _comparten_dia((fecha_inicio, fecha_fin), (s.fecha_inicio, s.fecha_fin), s.dias_comunes)
+    ]
+
+
+def conflictos_de(servicio):
+    return conflictos(
+        servicio.receptor_id, servicio.fecha_inicio, servicio.fecha_fin,
+        servicio.dias_mask, servicio.minuto_inicio, servicio.minuto_fin, excluir=servicio.pk,
+    )
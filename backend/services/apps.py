@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services'
+
+    def ready(self):
+        from services import signals  # noqa: F401
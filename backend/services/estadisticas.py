@@ -0,0 +1,123 @@
+# services/estadisticas.py
+"""
+Estadísticas del tablero del cuidador (`/servicios/stats/cuidador/`).
+
+`calcular` es una sola consulta: agregación condicional sobre los servicios
+del receptor por estado (pendientes, completados, en curso, horas, tendencia
+a 30 días; services/estados.py:q_estado, así no depende del barrido)
+con LEFT JOIN a RatingStats y un subquery para el promedio de los últimos 30
+días. Las horas salen de Servicio.minutos_totales, así que no se expande la
+agenda.
+
+`obtener` la cachea por receptor con los contadores de users/generaciones.py
+(el mismo esquema que users/search_cache.py): cada cambio en servicios o
+calificaciones del receptor incrementa su generación al confirmar la
+transacción (`invalidar`) y la clave vieja deja de leerse. El TTL (STATS_CUIDADOR_TTL) cubre lo que
+cambia sólo por el paso del tiempo (un servicio que termina).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Subquery, Sum
+from django.utils import timezone
+
+from users import generaciones
+
+from .estados import E, q_estado
+from .models import Calificacion
+
+PREFIJO = "servicios:stats"
+DIAS_TENDENCIA = 30
+
+
+def _horas(minutos):
+    return round((minutos or 0) / 60, 1)
+
+
+def calcular(receptor_id, ahora=None):
+    ahora = ahora or timezone.now()
+    corte = ahora - timedelta(days=DIAS_TENDENCIA)
+    corte_previo = corte - timedelta(days=DIAS_TENDENCIA)
+
+    terminado = q_estado(E.COMPLETADO, ahora, "servicios__")
+    ultimos = terminado & Q(servicios__fecha_fin__gte=corte)
+    previos = terminado & Q(servicios__fecha_fin__gte=corte_previo, servicios__fecha_fin__lt=corte)
+    promedio_reciente = (
+        Calificacion.objects
+        .filter(receptor_id=receptor_id, creado_en__gte=corte)
+        .order_by()
+        .values("receptor_id")
+        .annotate(promedio=Avg("puntuacion"))
+        .values("promedio")
+    )
+    fila = (
+        get_user_model().objects
+        .filter(pk=receptor_id)
+        .annotate(
+            pendientes=Count("servicios", filter=q_estado(E.PENDIENTE, ahora, "servicios__")),
+            completados=Count("servicios", filter=terminado),
+            en_curso=Count("servicios", filter=q_estado(E.EN_CURSO, ahora, "servicios__")),
+            minutos=Sum("servicios__minutos_totales", filter=terminado),
+            completados_30d=Count("servicios", filter=ultimos),
+            completados_30d_previos=Count("servicios", filter=previos),
+            minutos_30d=Sum("servicios__minutos_totales", filter=ultimos),
+            minutos_30d_previos=Sum("servicios__minutos_totales", filter=previos),
+            promedio_30d=Subquery(promedio_reciente),
+        )
+        .values(
+            "pendientes", "completados", "en_curso", "minutos", "completados_30d", "completados_30d_previos",
+            "minutos_30d", "minutos_30d_previos", "promedio_30d", "rating_stats__suma", "rating_stats__cantidad",
+        )
+        .first()
+    ) or {}
+
+    cantidad = fila.get("rating_stats__cantidad") or 0
+    promedio = (fila["rating_stats__suma"] / cantidad) if cantidad else 0
+    return {
+        "pendientes": fila.get("pendientes", 0),
+        "completados": fila.get("completados", 0),
+        "calificacion_promedio": round(float(promedio), 2),
+        "calificaciones": cantidad,
+        "en_curso": fila.get("en_curso", 0),
+        "horas_servidas": _horas(fila.get("minutos")),
+        "tendencia": {
+            "dias": DIAS_TENDENCIA,
+            "completados": fila.get("completados_30d", 0),
+            "completados_previos": fila.get("completados_30d_previos", 0),
+            "horas": _horas(fila.get("minutos_30d")),
+            "horas_previas": _horas(fila.get("minutos_30d_previos")),
+            "calificacion_promedio": (
+                round(float(fila["promedio_30d"]), 2) if fila.get("promedio_30d") is not None else None
+            ),
+        },
+    }
+
+
+# --------------------------
+# Cache por receptor
+# --------------------------
+
+def _gen_key(receptor_id):
+    return f"{PREFIJO}:gen:{receptor_id}"
+
+
+def obtener(receptor_id):
+    """Devuelve (data, hit)."""
+    ttl = getattr(settings, "STATS_CUIDADOR_TTL", 0)
+    if ttl <= 0:
+        return calcular(receptor_id), False
+    gen, = generaciones.leer([_gen_key(receptor_id)])
+    k = f"{PREFIJO}:{receptor_id}:{gen}"
+    data = cache.get(k)
+    if data is not None:
+        return data, True
+    data = calcular(receptor_id)
+    cache.set(k, data, timeout=ttl)
+    return data, False
+
+
+def invalidar(*receptor_ids):
+    """Incrementa la generación de cada receptor al confirmar la transacción en curso."""
+    generaciones.incrementar(_gen_key(r) for r in {r for r in receptor_ids if r is not None})
@@ -0,0 +1,130 @@
+# services/estados.py
+"""
+Ciclo de vida de un Servicio (columna `estado`, indexada).
+
+    pendiente ──aceptar──> aceptado ──(inicio)──> en_curso ──(fin)──> completado
+        │  └──(inicio sin aceptar)──> vencido        │                    ^
+        └──────────cancelar──────> cancelado <───────┴────(fin)───────────┘
+
+Las transiciones de usuario (aceptar, cancelar) pasan por `transicionar`, que
+bloquea la fila y valida contra TRANSICIONES. Las que dependen del tiempo las
+hace `avanzar` (comando avanzar_servicios, pensado para correr periódicamente):
+UPDATE por lotes de ids usando el índice (estado, fecha_inicio). Entre
+barridos, `Servicio.estado_actual()` (y `q_estado` en consultas) dan el
+estado correcto sin tocar la base.
+
+`aceptado` queda sincronizado (True en aceptado/en_curso/completado): la
+agenda y el filtro de disponibilidad siguen usando su índice.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Servicio
+
+E = Servicio.Estado
+
+TRANSICIONES = {
+    E.PENDIENTE: {E.ACEPTADO, E.CANCELADO, E.VENCIDO},
+    E.ACEPTADO: {E.EN_CURSO, E.COMPLETADO, E.CANCELADO},
+    E.EN_CURSO: {E.COMPLETADO, E.CANCELADO},
+    E.COMPLETADO: set(),
+    E.CANCELADO: set(),
+    E.VENCIDO: set(),
+}
+
+
+class TransicionInvalida(Exception):
+    def __init__(self, actual, nuevo):
+        self.actual, self.nuevo = actual, nuevo
+        super().__init__(f"No se puede pasar de {actual} a {nuevo}")
+
+
+def por_fecha(estado, fecha_inicio, fecha_fin, ahora):
+    """Estado al que lleva el paso del tiempo (sin cambios manuales)."""
+    if estado in (E.ACEPTADO, E.EN_CURSO):
+        if fecha_fin <= ahora:
+            return E.COMPLETADO
+        if fecha_inicio <= ahora:
+            return E.EN_CURSO
+        return E.ACEPTADO
+    if estado == E.PENDIENTE and fecha_inicio <= ahora:
+        return E.VENCIDO
+    return estado
+
+
+def q_estado(estado, ahora, prefijo=""):
+    """
+    Q de los servicios cuyo estado_actual() es `estado` a `ahora`: lo mismo
+    que por_fecha pero en la base, para filtrar sin esperar al barrido.
+    `prefijo` permite usarlo desde otra tabla (p.ej. "servicios__").
+    """
+    def q(**kw):
+        return Q(**{prefijo + k: v for k, v in kw.items()})
+
+    vigentes = q(estado__in=[E.ACEPTADO, E.EN_CURSO])
+    if estado == E.PENDIENTE:
+        return q(estado=E.PENDIENTE, fecha_inicio__gt=ahora)
+    if estado == E.VENCIDO:
+        return q(estado=E.VENCIDO) | q(estado=E.PENDIENTE, fecha_inicio__lte=ahora)
+    if estado == E.ACEPTADO:
+        return q(estado=E.ACEPTADO, fecha_inicio__gt=ahora)
+    if estado == E.EN_CURSO:
+        return vigentes & q(fecha_inicio__lte=ahora, fecha_fin__gt=ahora)
+    if estado == E.COMPLETADO:
+        return q(estado=E.COMPLETADO) | (vigentes & q(fecha_fin__lte=ahora))
+    return q(estado=estado)
+
+
+@transaction.atomic
+def transicionar(servicio_id, nuevo):
+    """
+    Pasa el servicio a `nuevo` si la transición es válida desde su estado
+    actual (con la fila bloqueada); si no, TransicionInvalida. Devuelve el Servicio.
+    """
+    servicio = Servicio.objects.select_for_update().get(pk=servicio_id)
+    actual = servicio.estado_actual()
+    if nuevo not in TRANSICIONES[actual]:
+        raise TransicionInvalida(actual, nuevo)
+    servicio.estado = nuevo
+    if nuevo == E.ACEPTADO:
+        servicio.estado = servicio.estado_actual()  # aceptar algo ya empezado lo deja en curso
+    servicio.save(update_fields=["estado"])
+    return servicio
+
+
+# --------------------------
+# Barrido por tiempo
+# --------------------------
+
+# (estado actual, nuevo estado, condición de tiempo)
+PASOS = [
+    (E.PENDIENTE, E.VENCIDO, "fecha_inicio__lte"),
+    (E.ACEPTADO, E.COMPLETADO, "fecha_fin__lte"),
+    (E.ACEPTADO, E.EN_CURSO, "fecha_inicio__lte"),
+    (E.EN_CURSO, E.COMPLETADO, "fecha_fin__lte"),
+]
+
+
+def avanzar(ahora=None, lote=1000):
+    """Aplica las transiciones vencidas por lotes. Devuelve {(de, a): cantidad}."""
+    from . import estadisticas
+
+    ahora = ahora or timezone.now()
+    totales = {}
+    for de, a, condicion in PASOS:
+        while True:
+            with transaction.atomic():
+                filas = list(
+                    Servicio.objects
+                    .filter(estado=de, **{condicion: ahora})
+                    .order_by()
+                    .values_list("id", "receptor_id")[:lote]
+                )
+                if not filas:
+                    break
+                Servicio.objects.filter(id__in=[f[0] for f in filas], estado=de).update(estado=a)
+                # update() no dispara señales: se invalida a mano el cache de los receptores
+                estadisticas.invalidar(*{f[1] for f in filas})
+            totales[(de, a)] = totales.get((de, a), 0) + len(filas)
+    return totales
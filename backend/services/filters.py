@@ -1,7 +1,9 @@
 # services/filters.py
 import django_filters as df
 from django.db.models import Q
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from .estados import q_estado
 from .models import Servicio
 from .models import DiaSemanal  # si necesitás exponerlo como filtro múltiple
 
@@ -22,6 +24,9 @@ class ServicioFilter(df.FilterSet):
     # Boolean
     aceptado = df.BooleanFilter(field_name="aceptado")
 
+    # Estado del ciclo de vida (?estado=pendiente&estado=aceptado), según las fechas a ahora
+    estado = df.MultipleChoiceFilter(choices=Servicio.Estado.choices, method="filter_estado")
+
     # Texto
     descripcion = df.CharFilter(field_name="descripcion", lookup_expr="icontains")
     horas_dia   = df.CharFilter(field_name="horas_dia", lookup_expr="icontains")
@@ -45,6 +50,15 @@ class ServicioFilter(df.FilterSet):
             # Los de texto los definimos arriba con icontains
         }
 
+    def filter_estado(self, qs, name, value):
+        if not value:
+            return qs
+        ahora = timezone.now()
+        cond = Q()
+        for estado in value:
+            cond |= q_estado(estado, ahora)
+        return qs.filter(cond)
+
     def filter_usuario_id(self, qs, name, value):
         # participa como cliente o como cuidador
         return qs.filter(Q(cliente_id=value) | Q(receptor_id=value))
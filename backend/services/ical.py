@@ -0,0 +1,135 @@
+# services/ical.py
+"""
+Exportación iCalendar (RFC 5545) de los servicios de un usuario.
+
+Cada servicio aceptado es un VEVENT con RRULE semanal (BYDAY según
+dias_mask, UNTIL = última visita): la aplicación de calendario expande las
+visitas, así que el archivo crece con la cantidad de servicios y no con los
+años que cubren. `calendario()` es un generador que se manda con
+StreamingHttpResponse recorriendo el queryset con iterator().
+
+Las horas van en UTC ("Z"), así no hace falta un VTIMEZONE. Como la serie se
+repite en UTC, si TIME_ZONE cambia de horario (verano) dentro del servicio se
+parte en un VEVENT por tramo con el mismo desfase; BYDAY se corre cuando la
+visita cae en otro día en UTC que en hora local.
+
+Las apps de calendario no mandan el JWT, así que la URL de suscripción lleva
+un token firmado con el id del usuario y su `calendario_version`
+(`token_para` / `usuario_de`): incrementar la versión revoca las URLs viejas.
+"""
+from datetime import timezone as dt_timezone
+
+from django.core import signing
+from django.utils import timezone
+
+from . import agenda
+
+SALT = "services.calendario"
+BYDAY = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+PRODID = "-//FindCare//Servicios//ES"
+
+
+def token_para(usuario):
+    return signing.Signer(salt=SALT).sign(f"{usuario.pk}.{usuario.calendario_version}")
+
+
+def usuario_de(token):
+    """(id de usuario, versión) del token, o None si la firma no es válida."""
+    try:
+        pk, version = signing.Signer(salt=SALT).unsign(token).split(".")
+        return int(pk), int(version)
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+# --------------------------
+# Formato
+# --------------------------
+
+def _escapar(texto):
+    return (
+        (texto or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _plegar(linea):
+    """Corta en líneas de a lo sumo 75 octetos (continuación con espacio), sin partir caracteres UTF-8."""
+    partes, actual, largo = [], [], 0
+    for c in linea:
+        n = len(c.encode())
+        if largo + n > 75:
+            partes.append("".join(actual))
+            actual, largo = [" "], 1
+        actual.append(c)
+        largo += n
+    partes.append("".join(actual))
+    return "\r\n".join(partes) + "\r\n"
+
+
+def _utc(dt):
+    return dt.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _nombre(u):
+    return " ".join(p for p in (u.first_name, u.last_name) if p).strip() or u.username
+
+
+def _correr_dias(dias_mask, dias):
+    """Rota la máscara `dias` días (la visita cae al día siguiente/anterior en UTC)."""
+    dias %= len(BYDAY)
+    return ((dias_mask << dias) | (dias_mask >> (len(BYDAY) - dias))) & agenda.TODOS
+
+
+def _tramos(servicio, primero, ultimo):
+    """
+    Visitas agrupadas por desfase UTC constante: [(primera, ultima, dias_utc)]
+    con las fechas locales de la primera y la última visita del tramo.
+    """
+    tramos = []
+    for fecha in agenda.fechas(servicio.dias_mask, primero, ultimo):
+        inicio = agenda.visita(servicio, fecha)[0]
+        desfase = inicio.utcoffset()
+        if tramos and tramos[-1][3] == desfase:
+            tramos[-1][1] = fecha
+        else:
+            corrimiento = (inicio.astimezone(dt_timezone.utc).date() - fecha).days
+            tramos.append([fecha, fecha, _correr_dias(servicio.dias_mask, corrimiento), desfase])
+    return [(a, b, mask) for a, b, mask, _ in tramos]
+
+
+def evento(servicio, usuario, dtstamp):
+    """Texto de los VEVENT del servicio (uno por tramo de desfase UTC), o "" si no tiene visitas."""
+    contraparte = servicio.receptor if usuario.pk == servicio.cliente_id else servicio.cliente
+    textos = []
+    for n, (inicial, final, dias_mask) in enumerate(_tramos(servicio, *agenda.tramo(servicio))):
+        inicio, fin = agenda.visita(servicio, inicial)
+        dias = ",".join(BYDAY[d] for d in range(len(BYDAY)) if dias_mask & (1 << d))
+        lineas = [
+            "BEGIN:VEVENT",
+            f"UID:servicio-{servicio.pk}{f'-{n}' if n else ''}@findcare",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART:{_utc(inicio)}",
+            f"DTEND:{_utc(fin)}",
+            f"RRULE:FREQ=WEEKLY;BYDAY={dias};UNTIL={_utc(agenda.visita(servicio, final)[0])}",
+            f"SUMMARY:{_escapar('Servicio con ' + _nombre(contraparte))}",
+            f"DESCRIPTION:{_escapar(servicio.descripcion)}",
+            "STATUS:CONFIRMED",
+            "END:VEVENT",
+        ]
+        textos.append("".join(_plegar(l) for l in lineas))
+    return "".join(textos)
+
+
+def calendario(usuario, servicios):
+    """Genera el .ics por partes: cabecera, un VEVENT por servicio, cierre."""
+    yield "".join(_plegar(l) for l in (
+        "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escapar('FindCare - ' + _nombre(usuario))}",
+    ))
+    dtstamp = _utc(timezone.now())
+    for servicio in servicios:
+        texto = evento(servicio, usuario, dtstamp)
+        if texto:
+            yield texto
+    yield _plegar("END:VCALENDAR")
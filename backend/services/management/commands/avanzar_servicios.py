@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from services import estados
+
+
+class Command(BaseCommand):
+    help = "Avanza los servicios cuyo estado cambió con el tiempo (vencido, en curso, completado). Correr periódicamente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Filas por UPDATE (default 1000).")
+
+    def handle(self, *args, **options):
+        totales = estados.avanzar(lote=options["lote"])
+        for (de, a), n in totales.items():
+            self.stdout.write(f"{de} -> {a}: {n}")
+        self.stdout.write(self.style.SUCCESS(f"{sum(totales.values())} servicios actualizados."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from services import estadisticas
+from services.models import RatingStats
+from services.ratings import reconstruir_rating_stats
+from users import search_cache
+
+
+class Command(BaseCommand):
+    help = "Recalcula RatingStats desde cero a partir de Calificacion (reparación)."
+
+    def handle(self, *args, **options):
+        total = reconstruir_rating_stats()
+        search_cache.invalidar("global")  # los ratings de las tarjetas pueden haber cambiado
+        estadisticas.invalidar(*RatingStats.objects.values_list("receptor_id", flat=True))
+        self.stdout.write(self.style.SUCCESS(f"RatingStats reconstruido para {total} receptores."))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def poblar_rating_stats(apps, schema_editor):
+    Calificacion = apps.get_model('services', 'Calificacion')
+    RatingStats = apps.get_model('services', 'RatingStats')
+    stats = {}
+    filas = (
+        Calificacion.objects.order_by()
+        .values('receptor_id', 'puntuacion')
+        .annotate(n=Count('id'), s=Sum('puntuacion'))
+    )
+    for f in filas:
+        st = stats.setdefault(f['receptor_id'], RatingStats(receptor_id=f['receptor_id']))
+        st.suma += f['s']
+        st.cantidad += f['n']
+        if 1 <= f['puntuacion'] <= 5:
+            bucket = f"c{f['puntuacion']}"
+            setattr(st, bucket, getattr(st, bucket) + f['n'])
+    RatingStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0008_add_motivo_reporte_to_calificacion'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingStats',
+            fields=[
+                ('receptor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('suma', models.PositiveIntegerField(default=0)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('c1', models.PositiveIntegerField(default=0)),
+                ('c2', models.PositiveIntegerField(default=0)),
+                ('c3', models.PositiveIntegerField(default=0)),
+                ('c4', models.PositiveIntegerField(default=0)),
+                ('c5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(poblar_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_rating_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['receptor', 'aceptado', 'fecha_inicio', 'fecha_fin'], name='servicio_agenda_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+from services import agenda
+
+
+def llenar_horarios(apps, schema_editor):
+    Servicio = apps.get_model("services", "Servicio")
+    Dias = Servicio.dias_semanales.through
+    nombres = {}
+    for servicio_id, nombre in Dias.objects.values_list("servicio_id", "diasemanal__nombre"):
+        nombres.setdefault(servicio_id, []).append(nombre)
+    cambiados = []
+    for servicio in Servicio.objects.only("id", "horas_dia").iterator():
+        servicio.dias_mask = agenda.mascara(nombres.get(servicio.id, []))
+        servicio.minuto_inicio, servicio.minuto_fin = agenda.franja(servicio.horas_dia)
+        cambiados.append(servicio)
+    Servicio.objects.bulk_update(cambiados, ["dias_mask", "minuto_inicio", "minuto_fin"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_servicio_agenda_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='servicio',
+            name='servicio_agenda_idx',
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='dias_mask',
+            field=models.PositiveSmallIntegerField(default=127),
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='minuto_fin',
+            field=models.PositiveSmallIntegerField(default=1440),
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='minuto_inicio',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(llenar_horarios, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['receptor', 'aceptado', 'fecha_fin', 'fecha_inicio'], name='servicio_agenda_idx'),
+        ),
+    ]
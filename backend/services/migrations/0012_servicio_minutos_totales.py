@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+from services import agenda
+
+
+def llenar_minutos(apps, schema_editor):
+    Servicio = apps.get_model("services", "Servicio")
+    cambiados = []
+    for servicio in Servicio.objects.only(
+        "id", "fecha_inicio", "fecha_fin", "dias_mask", "minuto_inicio", "minuto_fin",
+    ).iterator():
+        servicio.minutos_totales = agenda.minutos_totales(servicio)
+        cambiados.append(servicio)
+    Servicio.objects.bulk_update(cambiados, ["minutos_totales"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0011_horario_estructurado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicio',
+            name='minutos_totales',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(llenar_minutos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def llenar_estado(apps, schema_editor):
+    Servicio = apps.get_model("services", "Servicio")
+    ahora = timezone.now()
+    aceptados = Servicio.objects.filter(aceptado=True)
+    aceptados.filter(fecha_fin__lte=ahora).update(estado="completado")
+    aceptados.filter(fecha_inicio__lte=ahora, fecha_fin__gt=ahora).update(estado="en_curso")
+    aceptados.filter(fecha_inicio__gt=ahora).update(estado="aceptado")
+    Servicio.objects.filter(aceptado=False, fecha_inicio__lte=ahora).update(estado="vencido")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0012_servicio_minutos_totales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicio',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('aceptado', 'Aceptado'), ('en_curso', 'En Curso'), ('completado', 'Completado'), ('cancelado', 'Cancelado'), ('vencido', 'Vencido')], default='pendiente', max_length=12),
+        ),
+        migrations.RunPython(llenar_estado, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['receptor', 'estado'], name='servicio_receptor_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['cliente', 'estado'], name='servicio_cliente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['estado', 'fecha_inicio'], name='servicio_barrido_idx'),
+        ),
+    ]
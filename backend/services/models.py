@@ -1,7 +1,19 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 User = get_user_model()
 class Servicio(models.Model):
+    class Estado(models.TextChoices):
+        PENDIENTE = "pendiente"
+        ACEPTADO = "aceptado"
+        EN_CURSO = "en_curso"
+        COMPLETADO = "completado"
+        CANCELADO = "cancelado"
+        VENCIDO = "vencido"  # nunca se aceptó y ya pasó la fecha de inicio
+
+    # estados que ocupan la agenda del cuidador (aceptado=True)
+    ACEPTADOS = {Estado.ACEPTADO, Estado.EN_CURSO, Estado.COMPLETADO}
+
     cliente = models.ForeignKey(get_user_model(), related_name='servicios_recibidos', on_delete=models.DO_NOTHING)
     receptor = models.ForeignKey(get_user_model(), related_name='servicios', on_delete=models.DO_NOTHING)
     fecha_inicio = models.DateTimeField()
@@ -9,7 +21,57 @@ class Servicio(models.Model):
     descripcion = models.TextField()
     horas_dia = models.TextField()
     dias_semanales = models.ManyToManyField('DiaSemanal', related_name='servicios')
+    # `aceptado` se deriva de `estado` al guardar (services/estados.py maneja las transiciones)
     aceptado = models.BooleanField(default=False)
+    estado = models.CharField(max_length=12, choices=Estado.choices, default=Estado.PENDIENTE)
+    # horario estructurado (services/agenda.py): bit 0 = lunes ... bit 6 = domingo,
+    # franja diaria en minutos desde la medianoche [inicio, fin)
+    dias_mask = models.PositiveSmallIntegerField(default=127)
+    minuto_inicio = models.PositiveSmallIntegerField(default=0)
+    minuto_fin = models.PositiveSmallIntegerField(default=1440)
+    # duración total (visitas x franja), para sumar horas sin expandir la agenda
+    minutos_totales = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # choques de agenda: servicios aceptados de un receptor que se superponen con un rango.
+            # Arranca por fecha_fin: "termina después del inicio pedido" deja afuera el historial.
+            models.Index(fields=["receptor", "aceptado", "fecha_fin", "fecha_inicio"], name="servicio_agenda_idx"),
+            # tableros de cuidador y cliente por estado
+            models.Index(fields=["receptor", "estado"], name="servicio_receptor_estado_idx"),
+            models.Index(fields=["cliente", "estado"], name="servicio_cliente_estado_idx"),
+            # barrido de transiciones por tiempo (comando avanzar_servicios)
+            models.Index(fields=["estado", "fecha_inicio"], name="servicio_barrido_idx"),
+        ]
+
+    CAMPOS_HORARIO = {"fecha_inicio", "fecha_fin", "dias_mask", "minuto_inicio", "minuto_fin"}
+
+    def estado_actual(self, ahora=None):
+        """El estado a `ahora` aunque el barrido todavía no lo haya avanzado."""
+        from services import estados
+
+        return estados.por_fecha(self.estado, self.fecha_inicio, self.fecha_fin, ahora or timezone.now())
+
+    def save(self, *args, **kwargs):
+        from services import agenda
+
+        update_fields = kwargs.get("update_fields")
+        campos = set(update_fields) if update_fields is not None else None
+        if campos is None or self.CAMPOS_HORARIO & campos:
+            self.minutos_totales = agenda.minutos_totales(self)
+            if campos is not None:
+                campos.add("minutos_totales")
+        if campos is None or campos & {"aceptado", "estado"}:
+            if self.aceptado and self.estado == self.Estado.PENDIENTE:
+                # quien sólo marca aceptado=True (código previo, scripts): el estado sale de las fechas
+                self.estado = self.Estado.ACEPTADO
+                self.estado = self.estado_actual()
+            self.aceptado = self.estado in self.ACEPTADOS
+            if campos is not None:
+                campos |= {"aceptado", "estado"}
+        if campos is not None:
+            kwargs["update_fields"] = campos
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.cliente} - {self.receptor} - {self.fecha_inicio} - {self.fecha_fin}"
@@ -51,3 +113,32 @@ class Certificacion(models.Model):
 
 
 
+
+
+class RatingStats(models.Model):
+    """
+    Agregado de calificaciones recibidas por un usuario (suma, cantidad e histograma 1..5).
+    Se mantiene por señales en la misma transacción que crea/edita/borra la
+    Calificacion (ver services/ratings.py); `rebuild_rating_stats` lo recalcula desde cero.
+    """
+    receptor = models.OneToOneField(
+        get_user_model(), on_delete=models.CASCADE, primary_key=True, related_name="rating_stats"
+    )
+    suma = models.PositiveIntegerField(default=0)
+    cantidad = models.PositiveIntegerField(default=0)
+    c1 = models.PositiveIntegerField(default=0)
+    c2 = models.PositiveIntegerField(default=0)
+    c3 = models.PositiveIntegerField(default=0)
+    c4 = models.PositiveIntegerField(default=0)
+    c5 = models.PositiveIntegerField(default=0)
+
+    @property
+    def promedio(self):
+        return self.suma / self.cantidad if self.cantidad else None
+
+    @property
+    def histograma(self):
+        return {i: getattr(self, f"c{i}") for i in range(1, 6)}
+
+    def __str__(self):
+        return f"RatingStats {self.receptor_id}: {self.suma}/{self.cantidad}"
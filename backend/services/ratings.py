@@ -0,0 +1,98 @@
+# services/ratings.py
+"""
+Mantenimiento incremental de RatingStats.
+
+Las señales de Calificacion (services/signals.py) llaman a `al_guardar` /
+`al_borrar` en cada save() y delete(), así el agregado se ajusta en la misma
+transacción sin importar el camino: API, admin de Django, o borrados en
+cascada de un Servicio o un Usuario. Lo único que no pasa por acá son los
+UPDATE/DELETE masivos por queryset (`.update()`, `_raw_delete`): después de
+algo así hay que correr `rebuild_rating_stats`.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Calificacion, RatingStats
+
+
+def _aplicar(receptor_id, puntuacion, signo):
+    puntuacion = int(puntuacion)  # save() no convierte: puede llegar "4"
+    if signo > 0:
+        RatingStats.objects.get_or_create(receptor_id=receptor_id)
+    # al restar no se crea la fila: en un borrado en cascada del receptor ya no existe
+    cambios = {"suma": F("suma") + signo * puntuacion, "cantidad": F("cantidad") + signo}
+    if 1 <= puntuacion <= 5:
+        bucket = f"c{puntuacion}"
+        cambios[bucket] = F(bucket) + signo
+    RatingStats.objects.filter(receptor_id=receptor_id).update(**cambios)
+
+
+def recordar(calif):
+    """Guarda (receptor_id, puntuacion) tal como están en la base; None si no se conocen."""
+    d = calif.__dict__
+    if calif.pk is None or "receptor_id" not in d or "puntuacion" not in d:
+        calif._rating_original = None
+    else:
+        calif._rating_original = (d["receptor_id"], d["puntuacion"])
+
+
+def antes_de_guardar(calif):
+    # instancia con campos diferidos: se lee lo que hay en la base antes de pisarlo
+    if not calif._state.adding and calif._rating_original is None:
+        calif._rating_original = (
+            Calificacion.objects.filter(pk=calif.pk).values_list("receptor_id", "puntuacion").first()
+        )
+
+
+def al_guardar(calif, created):
+    previa = None if created else calif._rating_original
+    actual = (calif.receptor_id, int(calif.puntuacion))
+    if previa != actual:
+        if previa is not None:
+            _aplicar(*previa, -1)
+        _aplicar(*actual, +1)
+    calif._rating_original = actual
+
+
+def al_borrar(calif):
+    _aplicar(*(calif._rating_original or (calif.receptor_id, calif.puntuacion)), -1)
+
+
+@transaction.atomic
+def registrar_calificacion(servicio, autor, receptor_id, puntuacion, comentario):
+    """
+    Crea o actualiza la calificación de `autor` sobre `servicio` (re-calificar
+    pisa la anterior; el agregado lo ajustan las señales).
+    Devuelve (calificacion, created) como update_or_create.
+    """
+    return Calificacion.objects.update_or_create(
+        servicio=servicio,
+        autor=autor,
+        defaults={
+            "receptor_id": receptor_id,
+            "puntuacion": puntuacion,
+            "comentario": comentario,
+        },
+    )
+
+
+@transaction.atomic
+def reconstruir_rating_stats():
+    """Recalcula todos los agregados desde Calificacion. Devuelve cuántos quedaron."""
+    RatingStats.objects.all().delete()
+    filas = (
+        Calificacion.objects
+        .order_by()
+        .values("receptor_id", "puntuacion")
+        .annotate(n=Count("id"), s=Sum("puntuacion"))
+    )
+    stats = {}
+    for f in filas:
+        st = stats.setdefault(f["receptor_id"], RatingStats(receptor_id=f["receptor_id"]))
+        st.suma += f["s"]
+        st.cantidad += f["n"]
+        if 1 <= f["puntuacion"] <= 5:
+            bucket = f"c{f['puntuacion']}"
+            setattr(st, bucket, getattr(st, bucket) + f["n"])
+    RatingStats.objects.bulk_create(stats.values(), batch_size=1000)
+    return len(stats)
@@ -1,6 +1,6 @@
-from django.utils import timezone
 from rest_framework import serializers
 from .models import Calificacion, Servicio, Experiencia, Certificacion, DiaSemanal, HorarioDiario
+from . import agenda
 from django.contrib.auth import get_user_model
 
 Usuario = get_user_model()
@@ -57,6 +57,8 @@ class ServicioSerializer(serializers.ModelSerializer):
         source="dias_semanales", write_only=True
     )
 
+    # estado a hoy (estado_actual): no espera al barrido de avanzar_servicios
+    estado = serializers.SerializerMethodField()
     en_curso = serializers.SerializerMethodField()
     # calificaciones por rol
     calificacion_cliente = serializers.SerializerMethodField()
@@ -74,23 +76,58 @@ class ServicioSerializer(serializers.ModelSerializer):
             "descripcion", "horas_dia",
             "dias_semanales",                 # read-only
             "dias_semanales_ids",             # write-only
-            "aceptado","en_curso",
+            "dias_mask",                      # read-only (sale de dias_semanales)
+            "minuto_inicio", "minuto_fin",    # opcionales: si faltan salen de horas_dia
+            "estado", "aceptado","en_curso",
             "calificacion_cliente", "calificacion_cuidador",
             "puede_calificar",
             
         ]
-        read_only_fields = ["id", "cliente", "receptor", "dias_semanales"]
+        # aceptado se mueve con estado: por /aceptar/ y /cancelar/
+        read_only_fields = ["id", "cliente", "receptor", "dias_semanales", "dias_mask", "aceptado"]
+        extra_kwargs = {
+            "minuto_inicio": {"required": False, "max_value": agenda.MINUTOS_DIA},
+            "minuto_fin": {"required": False, "max_value": agenda.MINUTOS_DIA},
+        }
+
+    def validate(self, attrs):
+        """Completa el horario estructurado y rechaza choques con la agenda aceptada del cuidador."""
+        inst = self.instance
+        if "dias_semanales" in attrs:
+            attrs["dias_mask"] = agenda.mascara(d.nombre for d in attrs["dias_semanales"])
+        if "horas_dia" in attrs and "minuto_inicio" not in attrs and "minuto_fin" not in attrs:
+            attrs["minuto_inicio"], attrs["minuto_fin"] = agenda.franja(attrs["horas_dia"])
+
+        def valor(campo, default=None):
+            return attrs.get(campo, getattr(inst, campo, default))
+
+        inicio, fin = valor("minuto_inicio", 0), valor("minuto_fin", agenda.MINUTOS_DIA)
+        if inicio >= fin:
+            raise serializers.ValidationError({"minuto_fin": "Tiene que ser posterior a minuto_inicio."})
+
+        receptor = valor("receptor")
+        fecha_inicio, fecha_fin = valor("fecha_inicio"), valor("fecha_fin")
+        if receptor is None or fecha_inicio is None or fecha_fin is None:
+            return attrs
+        choques = agenda.conflictos(
+            receptor.pk, fecha_inicio, fecha_fin, valor("dias_mask", agenda.TODOS), inicio, fin,
+            excluir=inst.pk if inst else None,
+        )
+        if choques:
+            raise serializers.ValidationError({
+                "horario": "El cuidador ya tiene servicios aceptados en ese horario: "
+                + ", ".join(str(c.id) for c in choques),
+            })
+        return attrs
 
     def create(self, validated_data):
         return super().create(validated_data)
     
+    def get_estado(self, obj):
+        return obj.estado_actual()
+
     def get_en_curso(self, obj):
-        now = timezone.now()
-        en_curso = obj.aceptado and (obj.fecha_inicio <= now <= obj.fecha_fin)
-        
-        print("en_curso");
-        print(en_curso);
-        return en_curso;
+        return obj.estado_actual() == Servicio.Estado.EN_CURSO
 
     def _get_calif(self, obj, who):
         if who == "cliente":
@@ -115,7 +152,7 @@ class ServicioSerializer(serializers.ModelSerializer):
         """
         El usuario actual puede calificar si:
         - Es cliente o receptor del servicio,
-        - El servicio está aceptado y ya finalizó (fecha_fin < now),
+        - El servicio está completado (aceptado y ya finalizó),
         - Aún no emitió su calificación (autor=obj.user).
         """
         req = self.context.get("request")
@@ -124,8 +161,7 @@ class ServicioSerializer(serializers.ModelSerializer):
         if req.user.id not in (obj.cliente_id, obj.receptor_id):
             return False
 
-        now = timezone.now()
-        if not obj.aceptado or not (obj.fecha_fin < now):
+        if obj.estado_actual() != Servicio.Estado.COMPLETADO:
             return False
 
         ya = any(c.autor_id == req.user.id for c in obj.calificaciones.all())
@@ -0,0 +1,84 @@
+# services/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from services import agenda, estadisticas, ratings
+from services.models import Calificacion, Servicio
+
+
+def actualizar_mascara(servicio_ids):
+    """
+    Recalcula Servicio.dias_mask (y minutos_totales) desde dias_semanales: los
+    .set()/.add() no pasan por el serializer ni por save().
+    """
+    nombres = {sid: [] for sid in servicio_ids}
+    for sid, nombre in Servicio.dias_semanales.through.objects.filter(servicio_id__in=servicio_ids).values_list(
+        "servicio_id", "diasemanal__nombre"
+    ):
+        nombres[sid].append(nombre)
+    mascaras = {sid: agenda.mascara(dias) for sid, dias in nombres.items()}
+    for servicio in Servicio.objects.filter(pk__in=servicio_ids).only(*Servicio.CAMPOS_HORARIO):
+        servicio.dias_mask = mascaras[servicio.pk]
+        Servicio.objects.filter(pk=servicio.pk).update(
+            dias_mask=servicio.dias_mask, minutos_totales=agenda.minutos_totales(servicio),
+        )
+    return mascaras
+
+
+@receiver(m2m_changed, sender=Servicio.dias_semanales.through)
+def dias_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        instance.dias_mask = actualizar_mascara([instance.pk])[instance.pk]
+        instance.minutos_totales = agenda.minutos_totales(instance)
+        estadisticas.invalidar(instance.receptor_id)
+    elif pk_set:
+        actualizar_mascara(list(pk_set))
+        estadisticas.invalidar(*Servicio.objects.filter(pk__in=pk_set).values_list("receptor_id", flat=True))
+
+
+# --- cache de estadísticas del cuidador (services/estadisticas.py) ---
+
+@receiver(post_init, sender=Servicio)
+def recordar_receptor(sender, instance, **kwargs):
+    instance._receptor_id_original = instance.__dict__.get("receptor_id")
+
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+def servicio_cambiado_stats(sender, instance, raw=False, **kwargs):
+    if not raw:
+        estadisticas.invalidar(instance.receptor_id, instance._receptor_id_original)
+        instance._receptor_id_original = instance.receptor_id
+
+
+@receiver(post_save, sender=Calificacion)
+@receiver(post_delete, sender=Calificacion)
+def calificacion_cambiada_stats(sender, instance, raw=False, **kwargs):
+    if not raw:
+        estadisticas.invalidar(instance.receptor_id)
+
+
+# --- RatingStats (services/ratings.py): todo save/delete, también admin y cascadas ---
+
+@receiver(post_init, sender=Calificacion)
+def recordar_calificacion(sender, instance, **kwargs):
+    ratings.recordar(instance)
+
+
+@receiver(pre_save, sender=Calificacion)
+def calificacion_por_guardar(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ratings.antes_de_guardar(instance)
+
+
+@receiver(post_save, sender=Calificacion)
+def calificacion_guardada(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        ratings.al_guardar(instance, created)
+
+
+@receiver(post_delete, sender=Calificacion)
+def calificacion_borrada(sender, instance, **kwargs):
+    ratings.al_borrar(instance)
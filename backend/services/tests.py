@@ -1,3 +1,647 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from location.models import Ciudad, Direccion, Provincia
+from services import agenda, estados, ical
+from services.models import Servicio, Calificacion, DiaSemanal, RatingStats
+from users.models import Usuario
+
+
+class RatingStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+        cls.cuidador = Usuario.objects.create_user(username="cuidador")
+        cls.admin = Usuario.objects.create_user(username="admin", is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        self.servicio = Servicio.objects.create(
+            cliente=self.cliente, receptor=self.cuidador,
+            fecha_inicio=now - timedelta(days=10), fecha_fin=now - timedelta(days=1),
+            descripcion="", horas_dia="4", aceptado=True,
+        )
+
+    def _calificar(self, puntuacion):
+        self.client.force_authenticate(self.cliente)
+        r = self.client.post(f"/api/servicios/{self.servicio.id}/calificar/", {"puntuacion": puntuacion}, format="json")
+        self.assertEqual(r.status_code, 200)
+
+    def _stats(self):
+        return RatingStats.objects.get(receptor=self.cuidador)
+
+    def test_calificar_y_recalificar(self):
+        self._calificar(4)
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c4), (4, 1, 1))
+
+        self._calificar(2)
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c4, st.c2), (2, 1, 0, 1))
+
+    def test_borrado_admin(self):
+        self._calificar(5)
+        cal = Calificacion.objects.get()
+        cal.reportada = True
+        cal.save()
+        self.client.force_authenticate(self.admin)
+        r = self.client.post("/api/admin/rating-action/", {"rating_id": cal.id, "action": "delete"}, format="json")
+        self.assertEqual(r.status_code, 200)
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c5), (0, 0, 0))
+
+    def test_edicion_y_borrados_fuera_de_la_api(self):
+        # admin de Django: save()/delete() directos
+        self._calificar(4)
+        cal = Calificacion.objects.get()
+        cal.puntuacion = 1
+        cal.save()
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c4, st.c1), (1, 1, 0, 1))
+        # instancia con campos diferidos
+        cal = Calificacion.objects.only("id").get()
+        cal.puntuacion = 2
+        cal.save(update_fields=["puntuacion"])
+        self.assertEqual((self._stats().suma, self._stats().c1, self._stats().c2), (2, 0, 1))
+
+        # borrado en cascada del Servicio
+        self.servicio.delete()
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c2), (0, 0, 0))
+
+    def test_puntuacion_como_texto(self):
+        # un save() directo (admin, shell) no convierte el valor del campo
+        cal = Calificacion.objects.create(servicio=self.servicio, autor=self.cliente, receptor=self.cuidador,
+                                          puntuacion="4")
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c4), (4, 1, 1))
+        cal.puntuacion = "2"
+        cal.save()
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c4, st.c2), (2, 1, 0, 1))
+        cal.delete()
+        self.assertEqual(self._stats().cantidad, 0)
+
+    def test_borrado_en_cascada_del_usuario(self):
+        otro = Servicio.objects.create(
+            cliente=self.admin, receptor=self.admin, fecha_inicio=timezone.now() - timedelta(days=2),
+            fecha_fin=timezone.now() - timedelta(days=1), descripcion="", horas_dia="4", aceptado=True,
+        )
+        Calificacion.objects.create(servicio=otro, autor=self.cliente, receptor=self.cuidador, puntuacion=5)
+        Calificacion.objects.create(servicio=otro, autor=self.cuidador, receptor=self.cliente, puntuacion=3)
+        self.assertEqual(self._stats().cantidad, 1)
+        self.servicio.delete()  # Servicio.cliente es DO_NOTHING
+        # sus calificaciones (como autor y como receptor) y su RatingStats se van en la cascada
+        self.cliente.delete()
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c5), (0, 0, 0))
+        self.assertFalse(RatingStats.objects.filter(receptor_id=self.cliente.id).exists())
+
+    def test_rebuild(self):
+        self._calificar(3)
+        RatingStats.objects.all().delete()
+        call_command("rebuild_rating_stats", stdout=StringIO())
+        st = self._stats()
+        self.assertEqual((st.suma, st.cantidad, st.c3), (3, 1, 1))
+        self.assertEqual(st.promedio, 3)
+
+
+class ServicioListadoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ciudad = Ciudad.objects.create(nombre="Córdoba", provincia=Provincia.objects.create(nombre="Córdoba"))
+        direccion = Direccion.objects.create(direccion="Calle 1", ciudad=ciudad)
+        cls.cliente = Usuario.objects.create_user(username="cliente", direccion=direccion)
+        cls.cuidador = Usuario.objects.create_user(username="cuidador", direccion=direccion)
+        cls.dias = [DiaSemanal.objects.create(nombre=n) for n in ("Lunes", "Martes")]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.cliente)
+
+    def _crear(self, n):
+        now = timezone.now()
+        for i in range(n):
+            s = Servicio.objects.create(
+                cliente=self.cliente, receptor=self.cuidador,
+                fecha_inicio=now - timedelta(days=30 + i), fecha_fin=now - timedelta(days=1 + i),
+                descripcion="", horas_dia="4", aceptado=True,
+            )
+            s.dias_semanales.set(self.dias)
+            Calificacion.objects.create(servicio=s, autor=self.cliente, receptor=self.cuidador, puntuacion=4)
+            Calificacion.objects.create(servicio=s, autor=self.cuidador, receptor=self.cliente, puntuacion=5)
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        return len(ctx.captured_queries), r.json()
+
+    def test_listado_paginado(self):
+        self._crear(3)
+        _, data = self._queries("/api/servicios/?page_size=2")
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIsNotNone(data["next"])
+        _, resto = self._queries(data["next"])
+        self.assertEqual(len(resto["results"]), 1)
+        self.assertIsNone(resto["next"])
+        fila = data["results"][0]
+        self.assertEqual(fila["calificacion_cliente"]["puntuacion"], 4)
+        self.assertEqual(fila["calificacion_cuidador"]["puntuacion"], 5)
+        self.assertFalse(fila["puede_calificar"])
+        self.assertEqual(fila["cliente"]["provincia"], "Córdoba")
+
+    def test_cursor_por_campo_booleano(self):
+        self._crear(2)
+        Servicio.objects.filter(pk=Servicio.objects.order_by("id").first().pk).update(aceptado=False)
+        ids, url = [], "/api/servicios/?ordering=aceptado&page_size=1"
+        while url:
+            _, data = self._queries(url)
+            ids += [s["id"] for s in data["results"]]
+            url = data["next"]
+        self.assertEqual(ids, list(Servicio.objects.order_by("aceptado", "id").values_list("id", flat=True)))
+
+    def test_queries_constantes(self):
+        self._crear(2)
+        pocos, _ = self._queries("/api/servicios/?page_size=100")
+        self._crear(20)
+        muchos, data = self._queries("/api/servicios/?page_size=100")
+        self.assertEqual(len(data["results"]), 22)
+        self.assertEqual(pocos, muchos)
+        # servicios (con partes y direcciones por JOIN) + días + calificaciones
+        self.assertEqual(muchos, 3)
+
+    def test_detalle_queries_fijas(self):
+        self._crear(1)
+        servicio = Servicio.objects.get()
+        n, data = self._queries(f"/api/servicios/{servicio.id}/")
+        self.assertEqual(data["calificacion_cliente"]["puntuacion"], 4)
+        self.assertEqual(n, 3)
+
+
+def _fecha(iso):
+    return timezone.datetime.fromisoformat(iso).replace(tzinfo=timezone.get_current_timezone())
+
+
+class AgendaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+        cls.cuidador = Usuario.objects.create_user(username="cuidador")
+        cls.dias = {n: DiaSemanal.objects.create(nombre=n) for n in ("Lunes", "Martes", "Miércoles", "Sábado")}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.cliente)
+
+    def _servicio(self, inicio, fin, dias, horas_dia="Mañana", aceptado=True):
+        s = Servicio.objects.create(
+            cliente=self.cliente, receptor=self.cuidador, descripcion="", horas_dia=horas_dia, aceptado=aceptado,
+            fecha_inicio=_fecha(inicio), fecha_fin=_fecha(fin),
+            minuto_inicio=agenda.franja(horas_dia)[0], minuto_fin=agenda.franja(horas_dia)[1],
+        )
+        s.dias_semanales.set([self.dias[d] for d in dias])
+        return s
+
+    def _solicitar(self, inicio, fin, dias, horas_dia="Mañana"):
+        return self.client.post("/api/servicios/", {
+            "receptor_id": self.cuidador.id, "fecha_inicio": inicio, "fecha_fin": fin, "descripcion": "x",
+            "horas_dia": horas_dia, "dias_semanales_ids": [self.dias[d].id for d in dias],
+        }, format="json")
+
+    def test_mascara_y_franja(self):
+        self.assertEqual(agenda.mascara(["Lunes", "miercoles", "Sábado"]), 0b0100101)
+        self.assertEqual(agenda.mascara([]), agenda.TODOS)
+        self.assertEqual(agenda.franja("Mañana"), (480, 720))
+        self.assertEqual(agenda.franja("08:30-12"), (510, 720))
+        self.assertEqual(agenda.franja("9 a 13"), (540, 780))
+        self.assertEqual(agenda.franja("4"), (0, 1440))
+        self.assertEqual(agenda.franja("20-8"), (0, 1440))
+
+    def test_mascara_sigue_a_dias_semanales(self):
+        s = self._servicio("2030-03-04", "2030-03-31", ["Lunes"])
+        self.assertEqual(Servicio.objects.get(pk=s.pk).dias_mask, 0b1)
+        s.dias_semanales.add(self.dias["Sábado"])
+        self.assertEqual(Servicio.objects.get(pk=s.pk).dias_mask, 0b0100001)
+
+    def test_crear_rechaza_choque(self):
+        self._servicio("2030-03-04", "2030-03-31", ["Lunes", "Martes"])
+        r = self._solicitar("2030-03-10", "2030-04-10", ["Martes"])
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("horario", r.json())
+
+    def test_crear_sin_choque(self):
+        self._servicio("2030-03-04", "2030-03-31", ["Lunes"])
+        # otro día, otra franja, o después de que termina
+        self.assertEqual(self._solicitar("2030-03-10", "2030-04-10", ["Martes"]).status_code, 201)
+        self.assertEqual(self._solicitar("2030-03-10", "2030-04-10", ["Lunes"], "Tarde").status_code, 201)
+        self.assertEqual(self._solicitar("2030-03-31", "2030-04-30", ["Lunes"]).status_code, 201)
+        r = self._solicitar("2030-03-10", "2030-04-10", ["Lunes"], "")
+        self.assertEqual(r.status_code, 400)
+        creado = Servicio.objects.get(pk=self._solicitar("2030-05-01", "2030-05-31", ["Lunes"], "10:00-11:30").json()["id"])
+        self.assertEqual((creado.dias_mask, creado.minuto_inicio, creado.minuto_fin), (0b1, 600, 690))
+
+    def test_tramo_comun_corto_sin_dias_en_comun(self):
+        # el tramo común es sábado 9 a lunes 11 (excluido): sólo cae sábado y domingo
+        self._servicio("2030-03-01", "2030-03-11", ["Lunes"])
+        self.assertEqual(self._solicitar("2030-03-09", "2030-03-20", ["Lunes"]).status_code, 201)
+        self.assertEqual(self._solicitar("2030-03-09", "2030-03-20", ["Sábado"]).status_code, 201)
+        s = self._servicio("2030-03-01", "2030-03-11", ["Sábado"], aceptado=False)
+        s2 = self._servicio("2030-03-09", "2030-03-20", ["Sábado"], aceptado=False)
+        self.assertEqual(agenda.conflictos_de(s2), [])
+        s.aceptado = True
+        s.save()
+        self.assertEqual(agenda.conflictos_de(s2), [s])
+
+    def test_aceptar_con_choque(self):
+        self._servicio("2030-03-04", "2030-03-31", ["Lunes"])
+        pendiente = self._servicio("2030-03-01", "2030-03-20", ["Lunes", "Martes"], "07:00-09:00", aceptado=False)
+        self.client.force_authenticate(self.cuidador)
+        r = self.client.post(f"/api/servicios/{pendiente.id}/aceptar/")
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(len(r.json()["conflictos"]), 1)
+        pendiente.refresh_from_db()
+        self.assertFalse(pendiente.aceptado)
+
+    def test_historial_no_suma_queries(self):
+        for i in range(200):
+            inicio = timezone.datetime(2020, 1, 1, tzinfo=timezone.get_current_timezone()) + timedelta(days=7 * i)
+            Servicio.objects.create(
+                cliente=self.cliente, receptor=self.cuidador, descripcion="", horas_dia="", aceptado=True,
+                fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=5),
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            choques = agenda.conflictos(self.cuidador.id, _fecha("2030-03-01"), _fecha("2030-04-01"), agenda.TODOS, 0, 1440)
+        self.assertEqual(choques, [])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cur:
+                cur.execute("EXPLAIN QUERY PLAN " + ctx.captured_queries[0]["sql"])
+                plan = " ".join(str(fila[-1]) for fila in cur.fetchall())
+            self.assertIn("servicio_agenda_idx", plan)
+
+
+class HorarioMigrationTests(TransactionTestCase):
+    antes = [("services", "0010_servicio_agenda_idx")]
+    despues = [("services", "0011_horario_estructurado")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_llena_horario_desde_texto_y_dias(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.antes)
+        apps = executor.loader.project_state(self.antes).apps
+        User = apps.get_model("users", "Usuario")
+        Serv = apps.get_model("services", "Servicio")
+        Dia = apps.get_model("services", "DiaSemanal")
+        u = User.objects.create(username="u")
+        ahora = timezone.now()
+        con_dias = Serv.objects.create(cliente=u, receptor=u, fecha_inicio=ahora, fecha_fin=ahora, descripcion="", horas_dia="Tarde")
+        con_dias.dias_semanales.set([Dia.objects.create(nombre="Martes"), Dia.objects.create(nombre="Viernes")])
+        sin_dias = Serv.objects.create(cliente=u, receptor=u, fecha_inicio=ahora, fecha_fin=ahora, descripcion="", horas_dia="4")
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.despues)
+        Serv = executor.loader.project_state(self.despues).apps.get_model("services", "Servicio")
+        self.assertEqual(
+            Serv.objects.filter(pk=con_dias.pk).values_list("dias_mask", "minuto_inicio", "minuto_fin").get(),
+            (0b10010, 720, 1080),
+        )
+        self.assertEqual(
+            Serv.objects.filter(pk=sin_dias.pk).values_list("dias_mask", "minuto_inicio", "minuto_fin").get(),
+            (agenda.TODOS, 0, 1440),
+        )
+
+
+class CalendarioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(username="cliente", first_name="Ana", last_name="Paz")
+        cls.cuidador = Usuario.objects.create_user(username="cuidador", first_name="Luis")
+        cls.dias = {n: DiaSemanal.objects.create(nombre=n) for n in ("Lunes", "Miércoles", "Viernes")}
+        # lunes 4 de marzo a lunes 1 de abril de 2030 (excluido), lunes y miércoles de 8 a 12
+        cls.servicio = Servicio.objects.create(
+            cliente=cls.cliente, receptor=cls.cuidador, descripcion="Acompañamiento, tarde; ok", horas_dia="Mañana",
+            aceptado=True, fecha_inicio=_fecha("2030-03-04"), fecha_fin=_fecha("2030-04-01"),
+            minuto_inicio=480, minuto_fin=720,
+        )
+        cls.servicio.dias_semanales.set([cls.dias["Lunes"], cls.dias["Miércoles"]])
+        otro = Servicio.objects.create(
+            cliente=cls.cliente, receptor=cls.cuidador, descripcion="Cuidado de ñandúes " * 8, horas_dia="Tarde",
+            aceptado=True, fecha_inicio=_fecha("2030-03-08"), fecha_fin=_fecha("2030-03-16"),
+            minuto_inicio=720, minuto_fin=1080,
+        )
+        otro.dias_semanales.set([cls.dias["Viernes"]])
+        pendiente = Servicio.objects.create(
+            cliente=cls.cliente, receptor=cls.cuidador, descripcion="", horas_dia="",
+            fecha_inicio=_fecha("2030-03-01"), fecha_fin=_fecha("2030-04-01"),
+        )
+        pendiente.dias_semanales.set([cls.dias["Viernes"]])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_ocurrencias_de_la_ventana(self):
+        self.client.force_authenticate(self.cuidador)
+        r = self.client.get("/api/servicios/calendario/", {"desde": "2030-03-01", "hasta": "2030-03-15"})
+        self.assertEqual(r.status_code, 200)
+        ocurrencias = r.json()["ocurrencias"]
+        self.assertEqual(
+            [(o["fecha"], o["servicio"]) for o in ocurrencias],
+            [("2030-03-04", self.servicio.id), ("2030-03-06", self.servicio.id), ("2030-03-08", ocurrencias[2]["servicio"]),
+             ("2030-03-11", self.servicio.id), ("2030-03-13", self.servicio.id)],
+        )
+        self.assertEqual(ocurrencias[0]["contraparte"], {"id": self.cliente.id, "nombre": "Ana Paz"})
+        self.assertEqual(ocurrencias[0]["rol"], "cuidador")
+        self.assertEqual(ocurrencias[2]["inicio"][11:16], "12:00")
+
+    def test_fin_excluyente_y_ventana_maxima(self):
+        self.client.force_authenticate(self.cliente)
+        r = self.client.get("/api/servicios/calendario/", {"desde": "2030-03-25", "hasta": "2030-04-10"})
+        # el lunes 1 de abril ya queda afuera (fecha_fin excluyente)
+        self.assertEqual([o["fecha"] for o in r.json()["ocurrencias"]], ["2030-03-25", "2030-03-27"])
+        self.assertEqual(self.client.get("/api/servicios/calendario/", {"desde": "2030-01-01", "hasta": "2031-06-01"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/servicios/calendario/", {"desde": "marzo"}).status_code, 400)
+
+    def test_expansion_sin_recorrer_dias(self):
+        # diez años de lunes a viernes: una serie por día de la semana, sin iterar el rango
+        s = Servicio(fecha_inicio=_fecha("2030-01-01"), fecha_fin=_fecha("2040-01-01"), dias_mask=0b11111,
+                     minuto_inicio=0, minuto_fin=60, pk=1)
+        visitas = list(agenda.ocurrencias([s], agenda.tramo(s)[0], agenda.tramo(s)[1] + timedelta(days=1)))
+        self.assertEqual(len(visitas), 2609)
+        self.assertEqual([v[0] for v in visitas], sorted(v[0] for v in visitas))
+        self.assertTrue(all(v[0].weekday() < 5 for v in visitas))
+
+    def test_ics_por_suscripcion(self):
+        self.client.force_authenticate(self.cliente)
+        url = self.client.get("/api/servicios/calendario/suscripcion/").json()["url"]
+        self.client.force_authenticate(None)
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        self.assertEqual(r["Content-Type"], "text/calendar; charset=utf-8")
+        texto = b"".join(r.streaming_content).decode()
+        self.assertTrue(texto.startswith("BEGIN:VCALENDAR\r\n") and texto.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(texto.count("BEGIN:VEVENT"), 2)
+        self.assertIn("DTSTART:20300304T080000Z\r\n", texto)
+        self.assertIn("RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20300327T080000Z\r\n", texto)
+        self.assertIn("SUMMARY:Servicio con Luis\r\n", texto)
+        self.assertIn(r"DESCRIPTION:Acompañamiento\, tarde\; ok", texto)
+        self.assertTrue(all(len(l.encode()) <= 75 for l in texto.split("\r\n")))
+
+    def test_ics_token_invalido(self):
+        token = ical.token_para(self.cliente)
+        self.assertEqual(self.client.get(f"/api/calendario/{token}x.ics").status_code, 404)
+        self.assertEqual(ical.usuario_de(token), (self.cliente.id, 0))
+
+    def test_ics_rotar_suscripcion(self):
+        self.client.force_authenticate(self.cliente)
+        vieja = self.client.get("/api/servicios/calendario/suscripcion/").json()["url"]
+        nueva = self.client.post("/api/servicios/calendario/suscripcion/").json()["url"]
+        self.assertNotEqual(vieja, nueva)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(vieja).status_code, 404)
+        self.assertEqual(self.client.get(nueva).status_code, 200)
+
+    @override_settings(TIME_ZONE="America/New_York")
+    def test_ics_en_utc_con_cambio_de_horario(self):
+        # el horario de verano empieza el domingo 10 de marzo de 2030: 8 hs pasa de 13:00Z a 12:00Z
+        s = Servicio(
+            pk=99, cliente=self.cliente, receptor=self.cuidador, descripcion="", fecha_inicio=_fecha("2030-03-04"),
+            fecha_fin=_fecha("2030-04-01"), dias_mask=0b101, minuto_inicio=480, minuto_fin=720,
+        )
+        texto = ical.evento(s, self.cliente, "20300101T000000Z")
+        self.assertNotIn("TZID", texto)
+        self.assertEqual(texto.count("BEGIN:VEVENT"), 2)
+        self.assertIn("UID:servicio-99@findcare\r\nDTSTAMP:20300101T000000Z\r\nDTSTART:20300304T130000Z\r\n", texto)
+        self.assertIn("RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20300306T130000Z\r\n", texto)
+        self.assertIn("UID:servicio-99-1@findcare", texto)
+        self.assertIn("DTSTART:20300311T120000Z\r\nDTEND:20300311T160000Z\r\n", texto)
+        self.assertIn("RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20300327T120000Z\r\n", texto)
+
+        # lunes y miércoles a las 22 hs locales son martes y jueves en UTC
+        s.fecha_inicio, s.minuto_inicio, s.minuto_fin = _fecha("2030-03-18"), 1320, 1380
+        texto = ical.evento(s, self.cliente, "20300101T000000Z")
+        self.assertIn("DTSTART:20300319T020000Z\r\n", texto)
+        self.assertIn("RRULE:FREQ=WEEKLY;BYDAY=TU,TH;UNTIL=20300328T020000Z\r\n", texto)
+
+
+@override_settings(STATS_CUIDADOR_TTL=60)
+class StatsCuidadorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+        cls.cuidador = Usuario.objects.create_user(username="cuidador")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.cuidador)
+
+    def _servicio(self, dias_inicio, dias_fin, aceptado=True):
+        ahora = timezone.now()
+        s = Servicio.objects.create(
+            cliente=self.cliente, receptor=self.cuidador, descripcion="", horas_dia="Mañana", aceptado=aceptado,
+            fecha_inicio=ahora + timedelta(days=dias_inicio), fecha_fin=ahora + timedelta(days=dias_fin),
+            minuto_inicio=480, minuto_fin=720,
+        )
+        return s  # sin días cargados: todos los días, así las horas no dependen de qué día es hoy
+
+    def _stats(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get("/api/servicios/stats/cuidador/", {"receptor_id": self.cuidador.id})
+        self.assertEqual(r.status_code, 200)
+        return r.json(), r["X-Cache"], len(ctx.captured_queries)
+
+    def test_una_consulta(self):
+        # fechas del día -70 al -42 inclusive: 29 visitas x 4 horas, fuera de los últimos 30 días
+        completado = self._servicio(-70, -42)
+        self.assertEqual(completado.minutos_totales, 29 * 240)
+        self._servicio(-20, -6)
+        self._servicio(-3, 10)
+        self._servicio(5, 20, aceptado=False)
+        Calificacion.objects.create(servicio=completado, autor=self.cliente, receptor=self.cuidador, puntuacion=4)
+
+        data, cache_estado, queries = self._stats()
+        self.assertEqual(queries, 1)
+        self.assertEqual(cache_estado, "MISS")
+        self.assertEqual(
+            {k: data[k] for k in ("pendientes", "completados", "en_curso", "calificacion_promedio", "calificaciones")},
+            {"pendientes": 1, "completados": 2, "en_curso": 1, "calificacion_promedio": 4.0, "calificaciones": 1},
+        )
+        self.assertEqual(data["horas_servidas"], (29 + 15) * 4)
+        tendencia = data["tendencia"]
+        self.assertEqual((tendencia["completados"], tendencia["completados_previos"]), (1, 1))
+        self.assertEqual((tendencia["horas"], tendencia["horas_previas"]), (15 * 4, 29 * 4))
+        self.assertEqual(tendencia["calificacion_promedio"], 4.0)
+
+    def test_sin_datos(self):
+        data, _, _ = self._stats()
+        self.assertEqual((data["pendientes"], data["calificacion_promedio"], data["horas_servidas"]), (0, 0, 0))
+        self.assertIsNone(data["tendencia"]["calificacion_promedio"])
+
+    def test_cache_e_invalidacion(self):
+        self._servicio(-20, -6)
+        self.assertEqual(self._stats()[1], "MISS")
+        data, estado, queries = self._stats()
+        self.assertEqual((estado, queries, data["completados"]), ("HIT", 0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pendiente = self._servicio(5, 20, aceptado=False)
+        data, estado, _ = self._stats()
+        self.assertEqual((estado, data["pendientes"]), ("MISS", 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pendiente.aceptado = True
+            pendiente.save(update_fields=["aceptado"])
+        self.assertEqual(self._stats()[0]["pendientes"], 0)
+
+        servicio = Servicio.objects.filter(fecha_fin__lt=timezone.now()).get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Calificacion.objects.create(servicio=servicio, autor=self.cliente, receptor=self.cuidador, puntuacion=5)
+        self.assertEqual(self._stats()[1], "MISS")
+        # otro receptor no invalida
+        otro = Usuario.objects.create_user(username="otro")
+        with self.captureOnCommitCallbacks(execute=True):
+            Servicio.objects.create(
+                cliente=self.cliente, receptor=otro, descripcion="", horas_dia="", fecha_inicio=timezone.now(),
+                fecha_fin=timezone.now() + timedelta(days=1),
+            )
+        self.assertEqual(self._stats()[1], "HIT")
+
+
+class EstadoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+        cls.cuidador = Usuario.objects.create_user(username="cuidador")
+        cls.otro = Usuario.objects.create_user(username="otro")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.cuidador)
+
+    def _servicio(self, dias_inicio, dias_fin, estado=Servicio.Estado.PENDIENTE):
+        ahora = timezone.now()
+        return Servicio.objects.create(
+            cliente=self.cliente, receptor=self.cuidador, descripcion="", horas_dia="", estado=estado,
+            fecha_inicio=ahora + timedelta(days=dias_inicio), fecha_fin=ahora + timedelta(days=dias_fin),
+        )
+
+    def _post(self, servicio, accion):
+        return self.client.post(f"/api/servicios/{servicio.id}/{accion}/")
+
+    def test_aceptar(self):
+        futuro, empezado = self._servicio(2, 5), self._servicio(-1, 1)
+        r = self._post(futuro, "aceptar")
+        self.assertEqual((r.status_code, r.json()["estado"]), (200, "aceptado"))
+        futuro.refresh_from_db()
+        self.assertTrue(futuro.aceptado)
+        # ya aceptado, o sin aceptar cuando ya empezó: conflicto de estado
+        self.assertEqual(self._post(futuro, "aceptar").json()["estado"], "aceptado")
+        r = self._post(empezado, "aceptar")
+        self.assertEqual((r.status_code, r.json()["estado"]), (409, "vencido"))
+
+    def test_cancelar(self):
+        aceptado = self._servicio(2, 5, Servicio.Estado.ACEPTADO)
+        self.assertTrue(aceptado.aceptado)
+        self.client.force_authenticate(self.otro)
+        self.assertEqual(self._post(aceptado, "cancelar").status_code, 403)
+
+        self.client.force_authenticate(self.cliente)
+        self.assertEqual(self._post(aceptado, "cancelar").status_code, 200)
+        aceptado.refresh_from_db()
+        self.assertEqual((aceptado.estado, aceptado.aceptado), ("cancelado", False))
+        # deja libre la agenda y no se puede volver atrás
+        self.assertEqual(agenda.conflictos_de(self._servicio(3, 4)), [])
+        self.assertEqual(self._post(aceptado, "cancelar").status_code, 409)
+        self.assertEqual(self._post(self._servicio(-10, -5, Servicio.Estado.ACEPTADO), "cancelar").status_code, 409)
+
+    def test_filtro_y_estado_actual_sin_barrido(self):
+        pendiente, vencido = self._servicio(2, 5), self._servicio(-2, 5)
+        en_curso = self._servicio(-2, 5, Servicio.Estado.ACEPTADO)
+        r = self.client.get("/api/servicios/", {"receptor_id": self.cuidador.id, "estado": "pendiente"})
+        self.assertEqual([s["id"] for s in r.json()["results"]], [pendiente.id])
+        r = self.client.get("/api/servicios/", {"receptor_id": self.cuidador.id, "estado": ["vencido", "en_curso"]})
+        self.assertEqual(
+            {s["id"]: (s["estado"], s["en_curso"]) for s in r.json()["results"]},
+            {vencido.id: ("vencido", False), en_curso.id: ("en_curso", True)},
+        )
+
+    def test_avanzar_por_lotes(self):
+        self._servicio(-3, 5)
+        self._servicio(-3, 5)
+        self._servicio(-3, 5, Servicio.Estado.ACEPTADO)
+        self._servicio(-10, -5, Servicio.Estado.ACEPTADO)
+        self._servicio(-10, -5, Servicio.Estado.EN_CURSO)
+        self._servicio(2, 5, Servicio.Estado.ACEPTADO)
+        with self.captureOnCommitCallbacks(execute=True):
+            totales = estados.avanzar(lote=1)
+        self.assertEqual(totales, {
+            ("pendiente", "vencido"): 2, ("aceptado", "completado"): 1,
+            ("aceptado", "en_curso"): 1, ("en_curso", "completado"): 1,
+        })
+        self.assertEqual(
+            dict(Servicio.objects.values_list("estado").annotate(n=Count("id"))),
+            {"vencido": 2, "completado": 2, "en_curso": 1, "aceptado": 1},
+        )
+        out = StringIO()
+        call_command("avanzar_servicios", stdout=out)
+        self.assertIn("0 servicios actualizados", out.getvalue())
+
+    def test_guardar_aceptado_deriva_estado(self):
+        s = self._servicio(-1, 5)
+        s.aceptado = True
+        s.save(update_fields=["aceptado"])
+        s.refresh_from_db()
+        self.assertEqual(s.estado, "en_curso")
+
+
+class EstadoMigrationTests(TransactionTestCase):
+    antes = [("services", "0012_servicio_minutos_totales")]
+    despues = [("services", "0013_servicio_estado")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_llena_estado_desde_aceptado_y_fechas(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.antes)
+        apps = executor.loader.project_state(self.antes).apps
+        u = apps.get_model("users", "Usuario").objects.create(username="u")
+        Serv = apps.get_model("services", "Servicio")
+        ahora, dia = timezone.now(), timedelta(days=1)
+        casos = {
+            (True, -3, -1): "completado", (True, -1, 1): "en_curso", (True, 1, 3): "aceptado",
+            (False, -1, 1): "vencido", (False, 1, 3): "pendiente",
+        }
+        ids = {
+            Serv.objects.create(
+                cliente=u, receptor=u, descripcion="", horas_dia="", aceptado=aceptado,
+                fecha_inicio=ahora + ini * dia, fecha_fin=ahora + fin * dia,
+            ).pk: esperado
+            for (aceptado, ini, fin), esperado in casos.items()
+        }
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.despues)
+        Serv = executor.loader.project_state(self.despues).apps.get_model("services", "Servicio")
+        self.assertEqual(dict(Serv.objects.values_list("pk", "estado")), ids)
@@ -1,9 +1,11 @@
 # services/views.py
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.db import transaction
-from django.db.models import Avg
+from django.db.models import F, Q
+from django.http import Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import viewsets, status
@@ -14,6 +16,7 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from django.urls import reverse
 from django.utils.text import slugify
 import json
 from django.contrib.auth import get_user_model
@@ -41,20 +44,50 @@ from .serializers import (
     ExpMiniSerializer,
 )
 from .filters import ServicioFilter
+from . import agenda, estadisticas, estados, ical
+from .ratings import registrar_calificacion
 
 from location.models import Provincia, Ciudad, Direccion
 from users.models import Cuidador, Cliente, TipoCliente, FotoCliente
+from users.pagination import KeysetPagination
 
 
 # --------------------------
 # Helpers
 # --------------------------
 
+CALENDARIO_MAX_DIAS = 366
+
 def _make_aware(dt: datetime) -> datetime:
     if timezone.is_naive(dt):
         return timezone.make_aware(dt, timezone.get_current_timezone())
     return dt
 
+def _servicios_agendados(usuario):
+    """Servicios aceptados donde participa `usuario` (como cliente o cuidador)."""
+    return (
+        Servicio.objects
+        .filter(Q(cliente=usuario) | Q(receptor=usuario), aceptado__in=[True])
+        .select_related("cliente", "receptor")
+        .only(
+            "id", "fecha_inicio", "fecha_fin", "descripcion", "dias_mask", "minuto_inicio", "minuto_fin",
+            "cliente__id", "cliente__username", "cliente__first_name", "cliente__last_name",
+            "receptor__id", "receptor__username", "receptor__first_name", "receptor__last_name",
+        )
+    )
+
+def _parse_fecha(val):
+    """'YYYY-MM-DD' -> date (None si no vino)."""
+    if not val:
+        return None
+    try:
+        d = parse_date(val)
+    except ValueError:
+        d = None
+    if d is None:
+        raise ValueError(f"Formato de fecha inválido: {val}")
+    return d
+
 def _parse_dt(val: str) -> datetime:
     """
     Acepta 'YYYY-MM-DD' o ISO con hora y devuelve datetime aware.
@@ -80,10 +113,12 @@ class ServicioViewSet(viewsets.ModelViewSet):
         Servicio.objects
         .select_related("cliente", "receptor")
         .select_related("cliente__direccion__ciudad__provincia", "receptor__direccion__ciudad__provincia")
-        .prefetch_related("dias_semanales")
+        .prefetch_related("dias_semanales", "calificaciones")
         .all()
     )
     serializer_class = ServicioSerializer
+    # listado: {"next": url|null, "results": [...]}, ?page_size= hasta 100
+    pagination_class = KeysetPagination
 
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = ServicioFilter
@@ -92,7 +127,7 @@ class ServicioViewSet(viewsets.ModelViewSet):
         "cliente__username", "cliente__first_name", "cliente__last_name", "cliente__email",
         "receptor__username", "receptor__first_name", "receptor__last_name", "receptor__email",
     ]
-    ordering_fields = ["fecha_inicio", "fecha_fin", "id", "aceptado"]
+    ordering_fields = ["fecha_inicio", "fecha_fin", "id", "aceptado", "estado"]
     ordering = ["-fecha_inicio"]
 
     def perform_create(self, serializer):
@@ -110,46 +145,106 @@ class ServicioViewSet(viewsets.ModelViewSet):
     def stats_cuidador(self, request):
         """
         GET /api/servicios/stats/cuidador/?receptor_id=<user_id>
-        Devuelve: { pendientes, completados, calificacion_promedio }
+        Devuelve: { pendientes, completados, calificacion_promedio, calificaciones,
+                    en_curso, horas_servidas, tendencia: {...últimos 30 días vs los 30 anteriores} }
+        Una sola consulta (services/estadisticas.py), cacheada por receptor.
         """
         try:
             rid = int(request.query_params.get("receptor_id", ""))
         except (TypeError, ValueError):
             return Response({"detail": "receptor_id requerido"}, status=400)
 
-        now = timezone.now()
-
-        pendientes = Servicio.objects.filter(
-            receptor_id=rid, aceptado=False
-        ).count()
+        data, hit = estadisticas.obtener(rid)
+        response = Response(data)
+        response["X-Cache"] = "HIT" if hit else "MISS"
+        return response
 
-        completados = Servicio.objects.filter(
-            receptor_id=rid, aceptado=True, fecha_fin__lt=now
-        ).count()
+    @action(detail=False, methods=["get"], url_path="calendario")
+    def calendario(self, request):
+        """
+        GET /api/servicios/calendario/?desde=AAAA-MM-DD&hasta=AAAA-MM-DD
+        Visitas concretas de los servicios aceptados del usuario con fecha en
+        [desde, hasta) (por defecto, el mes actual; a lo sumo 366 días).
+        """
+        try:
+            desde = _parse_fecha(request.query_params.get("desde")) or timezone.localdate().replace(day=1)
+            hasta = _parse_fecha(request.query_params.get("hasta")) or (desde.replace(day=28) + timedelta(days=4)).replace(day=1)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        if not (desde < hasta <= desde + timedelta(days=CALENDARIO_MAX_DIAS)):
+            return Response({"detail": f"hasta tiene que ser posterior a desde y a lo sumo {CALENDARIO_MAX_DIAS} días después"}, status=400)
 
-        avg = (
-            Calificacion.objects
-            .filter(receptor_id=rid)
-            .aggregate(v=Avg("puntuacion"))["v"] or 0
+        user = request.user
+        servicios = _servicios_agendados(user).filter(
+            fecha_inicio__lt=_make_aware(datetime.combine(hasta, datetime.min.time())),
+            fecha_fin__gt=_make_aware(datetime.combine(desde, datetime.min.time())),
         )
-
-        return Response({
-            "pendientes": pendientes,
-            "completados": completados,
-            "calificacion_promedio": round(float(avg), 2),
-        })
+        ocurrencias = []
+        for inicio, fin, s in agenda.ocurrencias(servicios, desde, hasta):
+            es_cliente = s.cliente_id == user.id
+            otro = s.receptor if es_cliente else s.cliente
+            ocurrencias.append({
+                "servicio": s.id,
+                "fecha": timezone.localtime(inicio).date(),
+                "inicio": inicio,
+                "fin": fin,
+                "descripcion": s.descripcion,
+                "rol": "cliente" if es_cliente else "cuidador",
+                "contraparte": {"id": otro.id, "nombre": ical._nombre(otro)},
+            })
+        return Response({"desde": desde, "hasta": hasta, "ocurrencias": ocurrencias})
+
+    @action(detail=False, methods=["get", "post"], url_path="calendario/suscripcion")
+    def calendario_suscripcion(self, request):
+        """
+        GET /api/servicios/calendario/suscripcion/
+        URL .ics con token firmado para suscribirse desde una app de calendario.
+        POST revoca las URLs entregadas hasta ahora y devuelve una nueva.
+        """
+        if request.method == "POST":
+            get_user_model().objects.filter(pk=request.user.pk).update(calendario_version=F("calendario_version") + 1)
+            request.user.refresh_from_db(fields=["calendario_version"])
+        url = request.build_absolute_uri(reverse("servicios_calendario_ics", args=[ical.token_para(request.user)]))
+        return Response({"url": url, "webcal": "webcal://" + url.split("://", 1)[1]})
 
     @action(detail=True, methods=["post"], url_path="aceptar")
     def aceptar(self, request, pk=None):
         """
         POST /api/servicios/{id}/aceptar/
-        Marca aceptado=True. (Opcional: validar que request.user sea el receptor)
+        pendiente -> aceptado (o en_curso si ya empezó). (Opcional: validar que request.user sea el receptor)
+        409 con los ids en "conflictos" si choca con otro servicio aceptado del receptor,
+        o con "estado" si ya no está pendiente.
         """
         servicio = self.get_object()
         # if request.user.id != servicio.receptor_id: return Response({"detail": "Solo el receptor puede aceptar"}, 403)
-        servicio.aceptado = True
-        servicio.save(update_fields=["aceptado"])
-        return Response({"detail": "ok"}, status=status.HTTP_200_OK)
+        with transaction.atomic():
+            # serializa las aceptaciones del mismo cuidador: dos solicitudes que chocan no entran juntas
+            list(get_user_model().objects.select_for_update().filter(pk=servicio.receptor_id).values_list("pk"))
+            choques = agenda.conflictos_de(servicio)
+            if choques:
+                return Response(
+                    {"detail": "Choca con otro servicio aceptado", "conflictos": [c.id for c in choques]},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return self._transicion(servicio, Servicio.Estado.ACEPTADO)
+
+    @action(detail=True, methods=["post"], url_path="cancelar")
+    def cancelar(self, request, pk=None):
+        """
+        POST /api/servicios/{id}/cancelar/
+        Cliente o cuidador cancelan un servicio pendiente, aceptado o en curso.
+        """
+        servicio = self.get_object()
+        if request.user.id not in (servicio.cliente_id, servicio.receptor_id):
+            return Response({"detail": "No participas en este servicio"}, status=403)
+        return self._transicion(servicio, Servicio.Estado.CANCELADO)
+
+    def _transicion(self, servicio, nuevo):
+        try:
+            servicio = estados.transicionar(servicio.pk, nuevo)
+        except estados.TransicionInvalida as e:
+            return Response({"detail": str(e), "estado": e.actual}, status=status.HTTP_409_CONFLICT)
+        return Response({"detail": "ok", "estado": servicio.estado}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], url_path="calificar")
     def calificar(self, request, pk=None):
@@ -158,7 +253,7 @@ class ServicioViewSet(viewsets.ModelViewSet):
         body: { "puntuacion": 1..5, "comentario": "..." }
 
         El autor es request.user y el receptor es la contraparte.
-        Requiere: servicio aceptado y finalizado (fecha_fin < now).
+        Requiere: servicio completado (aceptado y con fecha_fin pasada).
         """
         servicio = self.get_object()
         user = request.user
@@ -169,8 +264,7 @@ class ServicioViewSet(viewsets.ModelViewSet):
         if user.id not in (servicio.cliente_id, servicio.receptor_id):
             return Response({"detail": "No participas en este servicio"}, status=403)
 
-        now = timezone.now()
-        if not servicio.aceptado or not (servicio.fecha_fin < now):
+        if servicio.estado_actual() != Servicio.Estado.COMPLETADO:
             return Response({"detail": "El servicio debe estar finalizado"}, status=400)
 
         try:
@@ -186,21 +280,33 @@ class ServicioViewSet(viewsets.ModelViewSet):
         # receptor = el otro participante
         receptor_id = servicio.receptor_id if user.id == servicio.cliente_id else servicio.cliente_id
 
-        calif, created = Calificacion.objects.update_or_create(
-            servicio=servicio,
-            autor=user,
-            defaults={
-                "receptor_id": receptor_id,
-                "puntuacion": puntuacion,
-                "comentario": comentario,
-            },
-        )
+        calif, created = registrar_calificacion(servicio, user, receptor_id, puntuacion, comentario)
         return Response(
             {"detail": "ok", "puntuacion": calif.puntuacion, "created": created},
             status=200
         )
 
 
+def calendario_ics(request, token):
+    """
+    GET /api/calendario/<token>.ics
+    Calendario iCalendar del usuario del token (sin JWT: lo piden las apps de
+    calendario). Se escribe por partes, un VEVENT con RRULE por servicio.
+    """
+    firmado = ical.usuario_de(token)
+    if firmado is None:
+        raise Http404
+    pk, version = firmado
+    usuario = get_user_model().objects.filter(pk=pk, calendario_version=version, is_active=True).first()
+    if usuario is None:
+        raise Http404
+    servicios = _servicios_agendados(usuario).order_by("id").iterator(chunk_size=500)
+    response = StreamingHttpResponse(ical.calendario(usuario, servicios), content_type="text/calendar; charset=utf-8")
+    response["Content-Disposition"] = 'inline; filename="findcare.ics"'
+    response["Cache-Control"] = "private, max-age=900"
+    return response
+
+
 class CalificacionViewSet(viewsets.ModelViewSet):
     queryset = Calificacion.objects.select_related("autor", "receptor").all()
     serializer_class = CalificacionSerializer
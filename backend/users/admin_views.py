@@ -1,10 +1,13 @@
 from django.db.models import Count, Q
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from services.estados import q_estado
 from services.models import Calificacion, Servicio
 from users.models import Cuidador, Cliente
+from users import search_cache
 
 Usuario = get_user_model()
 
@@ -33,7 +36,9 @@ class AdminStatsView(APIView):
         calificaciones_pendientes = Calificacion.objects.filter(reportada=True).count()
         
         # Get completed services
-        servicios_completados = Servicio.objects.filter(aceptado=True).count()
+        servicios_completados = Servicio.objects.filter(
+            q_estado(Servicio.Estado.COMPLETADO, timezone.now())
+        ).count()
         
         # Calculate monthly revenue (placeholder - you might want to implement actual revenue tracking)
         ingresos_mes = "$0"  # Placeholder
@@ -45,6 +50,7 @@ class AdminStatsView(APIView):
             "calificacionesPendientes": calificaciones_pendientes,
             "serviciosCompletados": servicios_completados,
             "ingresosMes": ingresos_mes,
+            "searchCache": search_cache.stats(),
         })
 
 
@@ -118,7 +124,7 @@ class AdminRatingActionView(APIView):
             return Response({"message": "Rating approved successfully"})
         
         elif action == 'delete':
-            # Delete the rating
+            # Delete the rating (RatingStats se ajusta por señal)
             rating.delete()
             return Response({"message": "Rating deleted successfully"})
         
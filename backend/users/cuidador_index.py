@@ -0,0 +1,273 @@
+# users/cuidador_index.py
+"""
+Índice columnar en memoria para los filtros de /api/search/.
+
+Guarda por cuidador (provincia, ciudad, años de experiencia) en arrays NumPy y
+un bitset (array booleano) por TipoCliente, y resuelve combinaciones de
+provincia/ciudad/min_experiencia/especialidad con máscaras vectorizadas. Sólo
+devuelve los ids de la página pedida; la vista hidrata esos ids con el ORM.
+
+Opcional: se activa con `SEARCH_INMEMORY_INDEX = True` y requiere numpy. Los
+cambios en Cuidador, Usuario.direccion, Direccion y tipos_cliente marcan
+filas sucias al confirmar la transacción (ver users/signals.py) que se
+refrescan en la próxima consulta.
+Cada proceso tiene su propio índice; además se reconstruye completo cada
+`SEARCH_INMEMORY_INDEX_MAX_AGE` segundos por si otro worker cambió datos.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional
+    np = None
+
+# parámetros de /api/search/ que el índice sabe resolver
+# ("facets" se calcula aparte con el ORM; la página igual sale del índice)
+PARAMS_SOPORTADOS = {
+    "provincia", "ciudad", "min_experiencia", "especialidad", "cursor", "page_size", "ordering", "facets", "fields",
+}
+ORDENES_SOPORTADOS = {
+    "-anios_experiencia": ["-anios_experiencia", "-id"],
+    "anios_experiencia": ["anios_experiencia", "id"],
+}
+SIN_VALOR = -1
+
+
+def habilitado():
+    return np is not None and getattr(settings, "SEARCH_INMEMORY_INDEX", False)
+
+
+class CuidadorIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sucios = set()
+        self._usuarios_sucios = set()
+        self._construido_en = None
+        self._vaciar()
+
+    def _vaciar(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.provincia = np.empty(0, dtype=np.int64)
+        self.ciudad = np.empty(0, dtype=np.int64)
+        self.anios = np.empty(0, dtype=np.int64)
+        self.vivo = np.empty(0, dtype=bool)
+        self.bitsets = {}
+        self._pos = {}
+        self._orden = {}
+
+    # --- invalidación (llamado desde signals) ---
+
+    def marcar(self, cuidador_ids=(), usuario_ids=()):
+        with self._lock:
+            self._sucios.update(cuidador_ids)
+            self._usuarios_sucios.update(usuario_ids)
+
+    def invalidar(self):
+        with self._lock:
+            self._construido_en = None
+
+    # --- carga ---
+
+    @staticmethod
+    def _filas(queryset):
+        from users.models import Cuidador
+
+        filas = queryset.values_list(
+            "id", "usuario__direccion__ciudad__provincia_id", "usuario__direccion__ciudad_id", "anios_experiencia",
+        )
+        tipos = {}
+        through = Cuidador.tipos_cliente.through.objects.filter(cuidador_id__in=queryset.values("id"))
+        for cid, tid in through.values_list("cuidador_id", "tipocliente_id"):
+            tipos.setdefault(cid, []).append(tid)
+        return list(filas), tipos
+
+    def construir(self):
+        from users.models import Cuidador
+
+        filas, tipos = self._filas(Cuidador.objects.all())
+        n = len(filas)
+        self._vaciar()
+        if n:
+            cols = np.array(
+                [(cid, p if p is not None else SIN_VALOR, c if c is not None else SIN_VALOR, a) for cid, p, c, a in filas],
+                dtype=np.int64,
+            ).reshape(n, 4)
+            self.ids, self.provincia, self.ciudad, self.anios = (cols[:, i].copy() for i in range(4))
+        self.vivo = np.ones(n, dtype=bool)
+        self._pos = {int(cid): i for i, cid in enumerate(self.ids)}
+        for cid, tids in tipos.items():
+            for tid in tids:
+                self._bitset(tid)[self._pos[cid]] = True
+        self._sucios.clear()
+        self._usuarios_sucios.clear()
+        self._construido_en = time.monotonic()
+
+    def _bitset(self, tipo_id):
+        bs = self.bitsets.get(tipo_id)
+        if bs is None:
+            bs = self.bitsets[tipo_id] = np.zeros(len(self.ids), dtype=bool)
+        return bs
+
+    def _crecer(self, extra):
+        self.ids = np.concatenate([self.ids, np.zeros(extra, dtype=np.int64)])
+        self.provincia = np.concatenate([self.provincia, np.full(extra, SIN_VALOR, dtype=np.int64)])
+        self.ciudad = np.concatenate([self.ciudad, np.full(extra, SIN_VALOR, dtype=np.int64)])
+        self.anios = np.concatenate([self.anios, np.zeros(extra, dtype=np.int64)])
+        self.vivo = np.concatenate([self.vivo, np.zeros(extra, dtype=bool)])
+        for tid, bs in self.bitsets.items():
+            self.bitsets[tid] = np.concatenate([bs, np.zeros(extra, dtype=bool)])
+
+    def _refrescar_sucios(self):
+        """Re-lee sólo las filas marcadas y las actualiza en su lugar (o agrega / da de baja)."""
+        from users.models import Cuidador
+
+        qs = Cuidador.objects.all()
+        cids, uids = set(self._sucios), set(self._usuarios_sucios)
+        if uids:
+            cids.update(qs.filter(usuario_id__in=uids).values_list("id", flat=True))
+        filas, tipos = self._filas(qs.filter(id__in=cids))
+        nuevos = [f for f in filas if f[0] not in self._pos]
+        if nuevos:
+            base = len(self.ids)
+            self._crecer(len(nuevos))
+            for i, f in enumerate(nuevos):
+                self._pos[f[0]] = base + i
+                self.ids[base + i] = f[0]
+        existentes = {f[0] for f in filas}
+        for cid in cids:
+            i = self._pos.get(cid)
+            if i is not None and cid not in existentes:
+                self.vivo[i] = False  # borrado
+        for cid, p, c, a in filas:
+            i = self._pos[cid]
+            self.provincia[i] = p if p is not None else SIN_VALOR
+            self.ciudad[i] = c if c is not None else SIN_VALOR
+            self.anios[i] = a
+            self.vivo[i] = True
+            for bs in self.bitsets.values():
+                bs[i] = False
+            for tid in tipos.get(cid, ()):
+                self._bitset(tid)[i] = True
+        self._sucios.difference_update(cids)
+        self._usuarios_sucios.difference_update(uids)
+        self._orden = {}
+
+    def _al_dia(self):
+        max_age = getattr(settings, "SEARCH_INMEMORY_INDEX_MAX_AGE", 300)
+        if self._construido_en is None or time.monotonic() - self._construido_en > max_age:
+            self.construir()
+        elif self._sucios or self._usuarios_sucios:
+            self._refrescar_sucios()
+
+    # --- consulta ---
+
+    def _mascara(self, provincia=None, ciudad=None, min_experiencia=None, especialidad=()):
+        mask = self.vivo.copy()
+        if provincia is not None:
+            mask &= self.provincia == provincia
+        if ciudad is not None:
+            mask &= self.ciudad == ciudad
+        if min_experiencia is not None:
+            mask &= self.anios >= min_experiencia
+        if especialidad:
+            alguna = np.zeros(len(self.ids), dtype=bool)
+            for tid in especialidad:
+                bs = self.bitsets.get(tid)
+                if bs is not None:
+                    alguna |= bs
+            mask &= alguna
+        return mask
+
+    def _permutacion(self, ordering):
+        perm = self._orden.get(tuple(ordering))
+        if perm is None:
+            desc = ordering[0].startswith("-")
+            # lexsort: la última clave es la principal
+            perm = np.lexsort((self.ids, self.anios))
+            if desc:
+                perm = perm[::-1]
+            self._orden[tuple(ordering)] = perm
+        return perm
+
+    def buscar(self, filtros, ordering, cursor=None, limite=20):
+        """
+        Devuelve hasta `limite` ids de Cuidador que cumplen `filtros`, en el orden
+        `ordering` (ver ORDENES_SOPORTADOS) y posteriores a `cursor` = [anios, id].
+        """
+        with self._lock:
+            self._al_dia()
+            mask = self._mascara(**filtros)
+            if cursor is not None:
+                anios, cid = cursor
+                if ordering[0].startswith("-"):
+                    mask &= (self.anios < anios) | ((self.anios == anios) & (self.ids < cid))
+                else:
+                    mask &= (self.anios > anios) | ((self.anios == anios) & (self.ids > cid))
+            perm = self._permutacion(ordering)
+            pos = perm[np.flatnonzero(mask[perm])[:limite]]
+            return self.ids[pos].tolist()
+
+    def contar(self, filtros):
+        with self._lock:
+            self._al_dia()
+            return int(self._mascara(**filtros).sum())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CuidadorIndex()
+    return _index
+
+
+def marcar(cuidador_ids=(), usuario_ids=()):
+    """
+    Hook de signals: marca las filas al confirmar la transacción en curso (si
+    se marcaran antes, una consulta concurrente podría releer la fila vieja y
+    limpiar la marca). No hace nada si el índice nunca se usó.
+    """
+    cuidador_ids, usuario_ids = list(cuidador_ids), list(usuario_ids)
+    transaction.on_commit(lambda: _al_indice("marcar", cuidador_ids, usuario_ids))
+
+
+def invalidar():
+    transaction.on_commit(lambda: _al_indice("invalidar"))
+
+
+def _al_indice(metodo, *args):
+    if _index is not None:
+        getattr(_index, metodo)(*args)
+
+
+def filtros_desde_request(query_params):
+    """
+    Traduce los query params a filtros del índice, o None si la consulta usa
+    algo que el índice no resuelve (texto libre, otro orden, params desconocidos).
+    """
+    if set(query_params.keys()) - PARAMS_SOPORTADOS:
+        return None
+    if query_params.get("ordering", "-anios_experiencia") not in ORDENES_SOPORTADOS:
+        return None
+    try:
+        filtros = {
+            "provincia": int(query_params["provincia"]) if query_params.get("provincia") else None,
+            "ciudad": int(query_params["ciudad"]) if query_params.get("ciudad") else None,
+            "especialidad": [int(t) for t in query_params.getlist("especialidad")],
+        }
+    except ValueError:
+        return None
+    try:
+        filtros["min_experiencia"] = int(query_params["min_experiencia"]) if query_params.get("min_experiencia") else None
+    except ValueError:
+        filtros["min_experiencia"] = None  # el ORM también ignora un valor inválido
+    return filtros
@@ -0,0 +1,50 @@
+# users/fieldsets.py
+"""
+Sparse fieldsets para payloads armados a mano.
+
+`?fields=a,b` deja sólo esos campos (más los de `siempre`) y `?include=x,y`
+suma relaciones opcionales. Sin ninguno de los dos se devuelve todo, como
+antes. Las vistas preguntan `campo in fieldset` antes de armar cada parte,
+así lo que no se pidió tampoco se consulta.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+def _lista(query_params, param):
+    valores = []
+    for v in query_params.getlist(param):
+        valores.extend(p.strip() for p in v.split(",") if p.strip())
+    return valores
+
+
+class Fieldset:
+    fields_param = "fields"
+    include_param = "include"
+
+    def __init__(self, query_params, campos, incluibles=(), siempre=("id",)):
+        fields = _lista(query_params, self.fields_param)
+        include = _lista(query_params, self.include_param)
+
+        desconocidos = set(fields) - set(campos) - set(incluibles)
+        if desconocidos:
+            raise ValidationError({self.fields_param: f"Campos desconocidos: {', '.join(sorted(desconocidos))}"})
+        desconocidos = set(include) - set(incluibles)
+        if desconocidos:
+            raise ValidationError({self.include_param: f"Relaciones desconocidas: {', '.join(sorted(desconocidos))}"})
+
+        self.parcial = bool(fields or include)
+        if not self.parcial:
+            self.campos = set(campos) | set(incluibles)
+        else:
+            self.campos = (set(fields) if fields else set(campos)) | set(include) | set(siempre)
+
+    def __contains__(self, campo):
+        return campo in self.campos
+
+    def alguno(self, *campos):
+        return any(c in self.campos for c in campos)
+
+    def recortar(self, data):
+        if not self.parcial:
+            return data
+        return {k: v for k, v in data.items() if k in self.campos}
@@ -0,0 +1,179 @@
+# users/filters.py
+import math
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, ExpressionWrapper, F, FloatField, OuterRef, Q, Value
+from django.db.models.functions import ASin, Coalesce, Cos, Least, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+
+from location import gazetteer
+from services import agenda
+from services.models import DiaSemanal, Servicio
+from users import search_index
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    `?search=` contra el índice full-text de Usuario (users/search_index.py):
+    prefijo por término, resultados rankeados. Si no se pidió `?ordering=`
+    explícito, ordena por relevancia. En motores sin índice cae al
+    SearchFilter clásico (icontains sobre `search_fields`).
+
+    Va después de OrderingFilter en `filter_backends` para poder pisar
+    el orden por defecto.
+    """
+    search_param = "search"
+    usuario_prefix = "usuario__"
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, "").strip()
+        if not texto:
+            return queryset
+        if not search_index.soportado():
+            return SearchFilter().filter_queryset(request, queryset, view)
+        queryset = search_index.filtrar(queryset, texto, prefijo=self.usuario_prefix)
+        if not request.query_params.get("ordering"):
+            queryset = queryset.order_by("-relevancia")
+        return queryset
+
+
+class ProximidadFilter(BaseFilterBackend):
+    """
+    `?near=lat,lng&radius_km=N`: cuidadores a menos de N km (default 25).
+
+    Usa las coordenadas de la Direccion si las tiene, si no las de su Ciudad.
+    Primero recorta por bounding box sobre columnas indexadas, después calcula
+    haversine exacto en SQL y anota `distancia_km`. Sin `?ordering=` explícito
+    (o con `?ordering=distancia`) ordena por cercanía.
+    """
+    near_param = "near"
+    radius_param = "radius_km"
+    radio_default_km = 25.0
+    radio_max_km = 1000.0
+    usuario_prefix = "usuario__"
+
+    def parse(self, request):
+        raw = request.query_params.get(self.near_param)
+        if not raw:
+            return None
+        try:
+            lat, lng = (float(x) for x in raw.split(","))
+            radio = float(request.query_params.get(self.radius_param) or self.radio_default_km)
+        except ValueError:
+            raise ValidationError({self.near_param: "Formato esperado: near=lat,lng&radius_km=N"})
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radio <= 0:
+            raise ValidationError({self.near_param: "Coordenadas o radio fuera de rango."})
+        return lat, lng, min(radio, self.radio_max_km)
+
+    def filter_queryset(self, request, queryset, view):
+        punto = self.parse(request)
+        if punto is None:
+            return queryset
+        lat, lng, radio = punto
+        lat_min, lat_max, lng_min, lng_max = gazetteer.bounding_box(lat, lng, radio)
+
+        direccion = f"{self.usuario_prefix}direccion__"
+        ciudad = f"{direccion}ciudad__"
+        en_caja = (
+            Q(**{f"{direccion}latitud__range": (lat_min, lat_max), f"{direccion}longitud__range": (lng_min, lng_max)})
+            | Q(**{
+                f"{direccion}latitud__isnull": True,
+                f"{ciudad}latitud__range": (lat_min, lat_max),
+                f"{ciudad}longitud__range": (lng_min, lng_max),
+            })
+        )
+        queryset = (
+            queryset
+            .filter(en_caja)
+            .annotate(
+                geo_lat=Coalesce(f"{direccion}latitud", f"{ciudad}latitud"),
+                geo_lng=Coalesce(f"{direccion}longitud", f"{ciudad}longitud"),
+            )
+            .annotate(distancia_km=haversine_km(F("geo_lat"), F("geo_lng"), lat, lng))
+            .filter(distancia_km__lte=radio)
+        )
+        ordering = request.query_params.get("ordering", "")
+        if not ordering or ordering.lstrip("-") == "distancia":
+            queryset = queryset.order_by("-distancia_km" if ordering.startswith("-") else "distancia_km")
+        return queryset
+
+
+class DisponibilidadFilter(BaseFilterBackend):
+    """
+    `?disponible_desde=&disponible_hasta=` (fecha o fecha-hora ISO; con una
+    sola fecha se toma ese día): excluye cuidadores con un Servicio aceptado
+    que se superpone con el rango. `?dias=1&dias=3` (ids de DiaSemanal)
+    restringe el choque a servicios en esos días (contra Servicio.dias_mask;
+    un servicio sin días cargados tiene todos).
+
+    Es un NOT EXISTS correlacionado que resuelve el índice
+    (receptor, aceptado, fecha_fin, fecha_inicio) de Servicio: por cuidador
+    sólo se miran sus servicios aceptados que terminan después del inicio del rango.
+    """
+    desde_param = "disponible_desde"
+    hasta_param = "disponible_hasta"
+    dias_param = "dias"
+    usuario_field = "usuario_id"
+
+    def _parse(self, param, valor, fin_de_dia):
+        try:
+            d = parse_date(valor)  # antes que parse_datetime, que también acepta "AAAA-MM-DD"
+            dt = None if d else parse_datetime(valor)
+        except ValueError:
+            d = dt = None
+        if d is not None:
+            # una fecha sola cubre el día completo
+            dt = datetime.combine(d + timedelta(days=1) if fin_de_dia else d, time.min)
+        elif dt is None:
+            raise ValidationError({param: "Formato esperado: AAAA-MM-DD o fecha-hora ISO."})
+        if timezone.is_naive(dt):
+            dt = timezone.make_aware(dt)
+        return dt
+
+    def parse(self, request):
+        desde = request.query_params.get(self.desde_param)
+        hasta = request.query_params.get(self.hasta_param)
+        if not desde and not hasta:
+            return None
+        inicio = self._parse(self.desde_param, desde or hasta, fin_de_dia=False)
+        fin = self._parse(self.hasta_param, hasta or desde, fin_de_dia=True)
+        if fin <= inicio:
+            raise ValidationError({self.hasta_param: "Tiene que ser posterior a disponible_desde."})
+        try:
+            dias = [int(d) for d in request.query_params.getlist(self.dias_param)]
+        except ValueError:
+            raise ValidationError({self.dias_param: "Ids de día inválidos."})
+        return inicio, fin, dias
+
+    def filter_queryset(self, request, queryset, view):
+        rango = self.parse(request)
+        if rango is None:
+            return queryset
+        inicio, fin, dias = rango
+        ocupado = Servicio.objects.filter(
+            receptor_id=OuterRef(self.usuario_field),
+            aceptado__in=[True],  # "= 1" explícito: usa el índice en SQLite (ver services/agenda.py)
+            fecha_inicio__lt=fin,
+            fecha_fin__gt=inicio,
+        )
+        if dias:
+            mask = agenda.mascara(DiaSemanal.objects.filter(id__in=dias).values_list("nombre", flat=True))
+            ocupado = ocupado.annotate(dias_comunes=F("dias_mask").bitand(mask)).exclude(dias_comunes=0)
+        return queryset.filter(~Exists(ocupado))
+
+
+def haversine_km(lat_expr, lng_expr, lat, lng):
+    """Distancia haversine en SQL (funciones matemáticas de Django: andan en SQLite y PostgreSQL)."""
+    lat1, lng1 = Radians(lat_expr), Radians(lng_expr)
+    lat2, lng2 = math.radians(lat), math.radians(lng)
+    a = (
+        Power(Sin((Value(lat2) - lat1) / 2), 2)
+        + Cos(lat1) * Value(math.cos(lat2)) * Power(Sin((Value(lng2) - lng1) / 2), 2)
+    )
+    return ExpressionWrapper(
+        Value(2 * gazetteer.RADIO_TIERRA_KM) * ASin(Sqrt(Least(a, Value(1.0)))),
+        output_field=FloatField(),
+    )
@@ -0,0 +1,34 @@
+# users/generaciones.py
+"""
+Contadores de generación en el cache de Django, para invalidar entradas sin
+borrarlas: la clave de cada entrada incluye la generación de la que depende,
+y al incrementarla las viejas dejan de leerse (vencen por TTL). Lo usan
+users/search_cache.py (por tag) y services/estadisticas.py (por receptor).
+
+Se incrementan en el commit de la transacción, así una lectura concurrente no
+guarda en la generación nueva datos de antes del cambio.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+
+def leer(claves):
+    """Generación actual de cada clave (0 si nunca se incrementó), en orden."""
+    valores = cache.get_many(claves)
+    return [valores.get(k, 0) for k in claves]
+
+
+def incrementar(claves):
+    """Incrementa las generaciones al confirmar la transacción en curso."""
+    claves = list(claves)
+    if claves:
+        transaction.on_commit(lambda: incrementar_ya(claves))
+
+
+def incrementar_ya(claves):
+    for k in claves:
+        cache.add(k, 0, timeout=None)
+        try:
+            cache.incr(k)
+        except ValueError:  # expiró entre add e incr
+            cache.set(k, 1, timeout=None)
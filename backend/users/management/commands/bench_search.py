@@ -0,0 +1,100 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from location.models import Provincia, Ciudad, Direccion
+from users import cuidador_index
+from users.models import Usuario, Cuidador, TipoCliente
+from users.views import CuidadorSearchView
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de /api/search/: camino ORM vs índice columnar en memoria. "
+        "Genera datos sintéticos dentro de una transacción que se descarta al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cuidadores", type=int, default=20000)
+        parser.add_argument("--consultas", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        if cuidador_index.np is None:
+            raise CommandError("numpy no está instalado.")
+        try:
+            with transaction.atomic():
+                self._poblar(opts["cuidadores"], random.Random(opts["seed"]))
+                self._medir(opts["consultas"], random.Random(opts["seed"]))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _poblar(self, n, rnd):
+        provs = Provincia.objects.bulk_create([Provincia(nombre=f"bench-prov-{i}") for i in range(24)])
+        ciudades = Ciudad.objects.bulk_create(
+            [Ciudad(nombre=f"bench-ciudad-{i}", provincia=provs[i % len(provs)]) for i in range(400)]
+        )
+        dirs = Direccion.objects.bulk_create([Direccion(direccion=f"calle {i}", ciudad=c) for i, c in enumerate(ciudades)])
+        self.tipos = list(TipoCliente.objects.bulk_create([TipoCliente(nombre=f"bench-tipo-{i}") for i in range(8)]))
+        usuarios = Usuario.objects.bulk_create(
+            [Usuario(username=f"bench-{i}", direccion=rnd.choice(dirs)) for i in range(n)], batch_size=2000
+        )
+        cuidadores = Cuidador.objects.bulk_create(
+            [Cuidador(usuario=u, anios_experiencia=rnd.randint(0, 40)) for u in usuarios], batch_size=2000
+        )
+        Through = Cuidador.tipos_cliente.through
+        Through.objects.bulk_create(
+            [Through(cuidador_id=c.id, tipocliente_id=t.id) for c in cuidadores for t in rnd.sample(self.tipos, 2)],
+            batch_size=5000,
+        )
+        self.provs, self.ciudades = provs, ciudades
+        self.stdout.write(f"{n} cuidadores sintéticos creados.")
+
+    def _consultas(self, k, rnd):
+        for _ in range(k):
+            params = {}
+            if rnd.random() < 0.7:
+                params["provincia"] = rnd.choice(self.provs).id
+            if rnd.random() < 0.3:
+                params["ciudad"] = rnd.choice(self.ciudades).id
+            if rnd.random() < 0.6:
+                params["min_experiencia"] = rnd.randint(0, 30)
+            if rnd.random() < 0.6:
+                params["especialidad"] = [t.id for t in rnd.sample(self.tipos, rnd.randint(1, 3))]
+            yield params
+
+    def _medir(self, k, rnd):
+        factory = RequestFactory(HTTP_HOST="localhost")
+        view = CuidadorSearchView.as_view()
+        consultas = list(self._consultas(k, rnd))
+        resultados = {}
+        for nombre, indice in (("orm", False), ("indice", True)):
+            # sin el cache de respuestas: si no, la pasada del índice mide casi sólo hits
+            with override_settings(SEARCH_INMEMORY_INDEX=indice, SEARCH_CACHE_TTL=0):
+                if indice:
+                    t0 = time.perf_counter()
+                    cuidador_index.get_index().construir()
+                    self.stdout.write(f"construcción del índice: {(time.perf_counter() - t0) * 1000:.1f} ms")
+                tiempos = []
+                for params in consultas:
+                    t0 = time.perf_counter()
+                    r = view(factory.get("/api/search/", params))
+                    r.render()
+                    tiempos.append(time.perf_counter() - t0)
+                tiempos.sort()
+                resultados[nombre] = tiempos
+                self.stdout.write(
+                    f"{nombre:>7}: media {sum(tiempos) / len(tiempos) * 1000:.2f} ms | "
+                    f"p50 {tiempos[len(tiempos) // 2] * 1000:.2f} ms | "
+                    f"p95 {tiempos[int(len(tiempos) * 0.95)] * 1000:.2f} ms"
+                )
+        speedup = sum(resultados["orm"]) / sum(resultados["indice"])
+        self.stdout.write(self.style.SUCCESS(f"speedup índice vs ORM: x{speedup:.1f}"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users import search_index
+from users.models import Usuario
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice full-text de usuarios (nombre + descripción)."
+
+    def handle(self, *args, **options):
+        if not search_index.soportado():
+            self.stdout.write(self.style.WARNING("El motor de base de datos no tiene índice full-text."))
+            return
+        total = search_index.reconstruir(Usuario.objects.all().iterator())
+        self.stdout.write(self.style.SUCCESS(f"Índice full-text reconstruido: {total} usuarios."))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:43
+
+import django.db.models.deletion
+import users.search_index
+from django.conf import settings
+from django.db import migrations, models
+
+from users import search_index
+
+
+def crear_indice(apps, schema_editor):
+    conn = schema_editor.connection
+    if not search_index.soportado(conn):
+        return
+    search_index.crear_tabla(conn)
+    Usuario = apps.get_model('users', 'Usuario')
+    search_index.reconstruir(Usuario.objects.all().iterator(), conn)
+
+
+def borrar_indice(apps, schema_editor):
+    search_index.borrar_tabla(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsuarioFTS',
+            fields=[
+                ('usuario', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('nombre', models.TextField()),
+                ('descripcion', models.TextField()),
+                ('documento', users.search_index.FullTextField(db_column='users_usuario_fts')),
+            ],
+            options={
+                'db_table': 'users_usuario_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_usuario_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='calendario_version',
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+    ]
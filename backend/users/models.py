@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 from location.models import Direccion
+from users.search_index import FullTextField
 
 class Usuario(AbstractUser):
     fecha_nacimiento = models.DateField(null=True, blank=True)
@@ -12,6 +13,9 @@ class Usuario(AbstractUser):
     descripcion_min = models.CharField(max_length=255, blank=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
+    # va firmada en la URL .ics (services/ical.py): incrementarla revoca las suscripciones.
+    # db_default: también vale para filas que inserta código que no conoce el campo
+    calendario_version = models.PositiveIntegerField(default=0, db_default=0)
 
 class TipoCliente(models.Model):
     nombre = models.CharField(max_length=100)
@@ -36,4 +40,18 @@ class Cuidador(models.Model):
     tipos_cliente = models.ManyToManyField('TipoCliente', related_name='cuidadores')
 
     def __str__(self):
-        return f"Cuidador: {self.usuario}"
\ No newline at end of file
+        return f"Cuidador: {self.usuario}"
+
+class UsuarioFTS(models.Model):
+    """
+    Índice full-text de usuarios (tabla FTS5 / tsvector creada por migración).
+    Sólo lectura desde el ORM; se mantiene desde users/search_index.py.
+    """
+    usuario = models.OneToOneField('Usuario', on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='fts')
+    nombre = models.TextField()
+    descripcion = models.TextField()
+    documento = FullTextField(db_column='users_usuario_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'users_usuario_fts'
@@ -0,0 +1,169 @@
+# users/pagination.py
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import BooleanField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre la tupla de ordenamiento + id.
+
+    El cursor guarda los valores de la última fila entregada y la página siguiente
+    se pide con `WHERE (orden) > (valores)`, así una página profunda cuesta lo
+    mismo que la primera y nunca se re-escanean filas anteriores.
+    Se asume que los campos de ordenamiento no son NULL.
+
+    Respuesta: {"next": url|null, "results": [...]}
+    """
+    cursor_query_param = "cursor"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    invalid_cursor_message = "Cursor inválido"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+
+        valores = self.decode_cursor(request)
+        if valores is not None:
+            valores = self.validar_cursor(valores, queryset.model, queryset.query.annotations)
+            queryset = queryset.filter(self.keyset_filter(valores))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def paginate_fetch(self, fetch, request, ordering, model):
+        """
+        Igual que paginate_queryset pero para fuentes que no son un queryset
+        (p.ej. el índice en memoria): `fetch(cursor, limite)` devuelve los objetos
+        de `model` ya ordenados según `ordering` y posteriores al cursor.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = list(ordering)
+        valores = self.decode_cursor(request)
+        if valores is not None:
+            valores = self.validar_cursor(valores, model)
+
+        rows = fetch(valores, self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    # --- helpers ---
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = [str(o) for o in queryset.query.order_by] or ["-id"]
+        campos = {o.lstrip("-") for o in ordering}
+        if "id" not in campos and "pk" not in campos:
+            # desempate estable en la misma dirección que el primer campo
+            ordering.append("-id" if ordering[0].startswith("-") else "id")
+        return ordering
+
+    def keyset_filter(self, valores):
+        if len(valores) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        q = Q()
+        for i, campo in enumerate(self.ordering):
+            nombre = campo.lstrip("-")
+            lookup = "lt" if campo.startswith("-") else "gt"
+            paso = Q(**{f"{nombre}__{lookup}": valores[i]})
+            for previo, valor in zip(self.ordering[:i], valores[:i]):
+                paso &= Q(**{previo.lstrip("-"): valor})
+            q |= paso
+        return q
+
+    def _valor(self, obj, campo):
+        for parte in campo.lstrip("-").split("__"):
+            obj = getattr(obj, parte)
+        if isinstance(obj, (date, datetime)):
+            return obj.isoformat()
+        return obj
+
+    def encode_cursor(self, obj):
+        valores = [self._valor(obj, c) for c in self.ordering]
+        raw = json.dumps(valores, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(valores, list):
+            raise NotFound(self.invalid_cursor_message)
+        return valores
+
+    def _campo(self, model, nombre, annotations):
+        if nombre in annotations:
+            return annotations[nombre].output_field
+        partes = nombre.split("__")
+        for parte in partes[:-1]:
+            model = model._meta.get_field(parte).related_model
+        campo = model._meta.get_field("pk" if partes[-1] == "pk" else partes[-1])
+        return campo.target_field if campo.is_relation else campo
+
+    def validar_cursor(self, valores, model, annotations=None):
+        """
+        Convierte cada valor del cursor al tipo de su campo de ordenamiento; un
+        cursor armado a mano con otros tipos es 404, no un error de la base.
+        """
+        if len(valores) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        convertidos = []
+        for campo, valor in zip(self.ordering, valores):
+            try:
+                campo = self._campo(model, campo.lstrip("-"), annotations or {})
+            except FieldDoesNotExist:
+                raise NotFound(self.invalid_cursor_message)
+            # true/false sólo para campos booleanos (to_python de un entero acepta True como 1)
+            if not isinstance(valor, (str, int, float)) or (
+                isinstance(valor, bool) != isinstance(campo, BooleanField)
+            ):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                convertidos.append(campo.to_python(valor))
+            except (ValidationError, TypeError, ValueError, OverflowError):
+                raise NotFound(self.invalid_cursor_message)
+        return convertidos
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
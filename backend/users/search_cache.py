@@ -0,0 +1,150 @@
+# users/search_cache.py
+"""
+Cache de respuestas de /api/search/ con invalidación por tags.
+
+La clave es la query normalizada (parámetros ordenados, listas ordenadas, sin
+vacíos) + host. Cada entrada depende de contadores de generación:
+
+- "global": cambia con catálogos (TipoCliente, Ciudad, Provincia, Direccion).
+- "todos": consultas sin provincia/ciudad (incluye texto libre y `near`).
+- "prov:<id>" / "ciudad:<id>": consultas filtradas por ubicación.
+- "servicios": consultas por disponibilidad; cambia con cada Servicio.
+
+Un cambio en un cuidador incrementa "todos" y los tags de su provincia y
+ciudad (antes y después del cambio); las entradas de otras provincias siguen
+valiendo. Las generaciones (users/generaciones.py) viven en el cache de
+Django, así que con un cache compartido (Redis/Memcached) la invalidación
+alcanza a todos los workers, y se incrementan en el commit.
+
+Misses concurrentes de la misma clave dentro del proceso se resuelven con un
+solo cálculo (los demás esperan el lock y leen el resultado).
+"""
+import hashlib
+import threading
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users import generaciones
+
+PREFIJO = "search"
+_locks = weakref.WeakValueDictionary()
+_locks_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+
+def habilitado():
+    return getattr(settings, "SEARCH_CACHE_TTL", 0) > 0
+
+
+# --------------------------
+# Claves y tags
+# --------------------------
+
+def normalizar(query_params):
+    pares = []
+    for k in sorted(query_params.keys()):
+        valores = sorted(v for v in query_params.getlist(k) if v != "")
+        if valores:
+            pares.append((k, valores))
+    return pares
+
+
+def _id(valor):
+    """El id tal como se invalida ("01" y " 1" son 1), o None si no es un entero."""
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def tags_para(query_params):
+    # un valor que no es id cae en "todos", que cambia con cualquier cuidador
+    provincia, ciudad = _id(query_params.get("provincia")), _id(query_params.get("ciudad"))
+    if provincia is not None:
+        tags = ["global", f"prov:{provincia}"]
+    elif ciudad is not None:
+        tags = ["global", f"ciudad:{ciudad}"]
+    else:
+        tags = ["global", "todos"]
+    if query_params.get("disponible_desde") or query_params.get("disponible_hasta"):
+        tags.append("servicios")  # depende de la agenda (Servicio aceptados)
+    return tags
+
+
+def _tag_key(tag):
+    return f"{PREFIJO}:gen:{tag}"
+
+
+def generaciones_de(tags):
+    return generaciones.leer([_tag_key(t) for t in tags])
+
+
+def clave(request):
+    pares = normalizar(request.query_params)
+    tags = tags_para(request.query_params)
+    gens = generaciones_de(tags)
+    raw = repr((request.get_host(), request.scheme, pares, tags, gens)).encode()
+    return f"{PREFIJO}:resp:{hashlib.sha1(raw).hexdigest()}"
+
+
+def invalidar(*tags):
+    """Incrementa las generaciones de `tags` al confirmar la transacción en curso."""
+    generaciones.incrementar(_tag_key(t) for t in tags)
+
+
+def invalidar_ubicaciones(ubicaciones):
+    """`ubicaciones`: iterable de (provincia_id, ciudad_id); None si no tiene dirección."""
+    tags = {"todos"}
+    for provincia_id, ciudad_id in ubicaciones:
+        if provincia_id is not None:
+            tags.add(f"prov:{provincia_id}")
+        if ciudad_id is not None:
+            tags.add(f"ciudad:{ciudad_id}")
+    invalidar(*tags)
+
+
+# --------------------------
+# Lectura con coalescing
+# --------------------------
+
+def _contar(nombre):
+    with _stats_lock:
+        _stats[nombre] += 1
+
+
+def stats():
+    with _stats_lock:
+        s = dict(_stats)
+    total = s["hits"] + s["misses"]
+    s["hit_ratio"] = round(s["hits"] / total, 3) if total else None
+    return s
+
+
+def obtener(request, calcular):
+    """
+    Devuelve (data, hit). `calcular()` produce el payload serializable; sólo
+    se ejecuta una vez por clave aunque lleguen varios misses a la vez.
+    """
+    k = clave(request)
+    data = cache.get(k)
+    if data is not None:
+        _contar("hits")
+        return data, True
+
+    with _locks_lock:
+        lock = _locks.get(k)
+        if lock is None:
+            lock = _locks[k] = threading.Lock()
+    with lock:
+        data = cache.get(k)
+        if data is not None:
+            _contar("coalesced")
+            _contar("hits")
+            return data, True
+        _contar("misses")
+        data = calcular()
+        cache.set(k, data, timeout=settings.SEARCH_CACHE_TTL)
+        return data, False
@@ -0,0 +1,179 @@
+# users/search_index.py
+"""
+Índice full-text de usuarios sobre nombre + descripción.
+
+- SQLite: tabla virtual FTS5 (`users_usuario_fts`, rowid = usuario.id).
+- PostgreSQL: tabla con columna tsvector generada + índice GIN.
+
+En ambos motores la tabla expone las mismas columnas (rowid, nombre,
+descripcion y una columna con el nombre de la tabla que es el documento
+indexado), así el modelo no administrado `UsuarioFTS` sirve para leer con el ORM.
+Las escrituras van por SQL crudo desde acá; se disparan en el post_save de Usuario.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Func, Lookup, TextField, Value
+
+TABLA = "users_usuario_fts"
+MOTORES = ("sqlite", "postgresql")
+PG_CONFIG = "spanish"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def soportado(conn=None):
+    return (conn or connection).vendor in MOTORES
+
+
+# --------------------------
+# Lectura (ORM)
+# --------------------------
+
+class FullTextField(TextField):
+    """Columna-documento del índice; sólo se usa con el lookup `match`."""
+
+
+@FullTextField.register_lookup
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} @@ to_tsquery('{PG_CONFIG}', {rhs})", lhs_params + rhs_params
+
+
+class Relevancia(Func):
+    """Mayor = más relevante. bm25 (nombre pesa más que descripción) / ts_rank."""
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        documento, _ = self.source_expressions
+        sql, params = compiler.compile(documento)
+        return f"(-bm25({sql}, 10.0, 1.0))", params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        documento, consulta = self.source_expressions
+        doc_sql, doc_params = compiler.compile(documento)
+        q_sql, q_params = compiler.compile(consulta)
+        return f"ts_rank({doc_sql}, to_tsquery('{PG_CONFIG}', {q_sql}))", doc_params + q_params
+
+
+def tokens(texto):
+    return _TOKEN_RE.findall((texto or "").lower())
+
+
+def construir_consulta(texto, conn=None):
+    """Texto libre -> consulta con prefijo por término (todos los términos requeridos)."""
+    toks = tokens(texto)
+    if not toks:
+        return None
+    if (conn or connection).vendor == "postgresql":
+        return " & ".join(f"{t}:*" for t in toks)
+    return " ".join(f'"{t}"*' for t in toks)
+
+
+def filtrar(queryset, texto, prefijo=""):
+    """
+    Filtra `queryset` por el índice y anota `relevancia`.
+    `prefijo` es el camino hasta Usuario (p.ej. "usuario__" desde Cuidador).
+    """
+    consulta = construir_consulta(texto)
+    if consulta is None:
+        return queryset
+    campo = f"{prefijo}fts__documento"
+    return (
+        queryset
+        .filter(**{f"{campo}__match": consulta})
+        .annotate(relevancia=Relevancia(campo, Value(consulta)))
+    )
+
+
+# --------------------------
+# Escritura
+# --------------------------
+
+# campos de Usuario que forman el documento indexado
+CAMPOS = {"first_name", "last_name", "username", "descripcion"}
+
+
+def _documento(usuario):
+    nombre = f"{usuario.first_name or ''} {usuario.last_name or ''} {usuario.username or ''}".strip()
+    return nombre, usuario.descripcion or ""
+
+
+def indexar(usuario, conn=None):
+    conn = conn or connection
+    if not soportado(conn):
+        return
+    nombre, descripcion = _documento(usuario)
+    with conn.cursor() as cur:
+        if conn.vendor == "postgresql":
+            cur.execute(
+                f"INSERT INTO {TABLA} (rowid, nombre, descripcion) VALUES (%s, %s, %s) "
+                f"ON CONFLICT (rowid) DO UPDATE SET nombre = EXCLUDED.nombre, descripcion = EXCLUDED.descripcion",
+                [usuario.pk, nombre, descripcion],
+            )
+        else:
+            cur.execute(f"DELETE FROM {TABLA} WHERE rowid = %s", [usuario.pk])
+            cur.execute(
+                f"INSERT INTO {TABLA} (rowid, nombre, descripcion) VALUES (%s, %s, %s)",
+                [usuario.pk, nombre, descripcion],
+            )
+
+
+def eliminar(usuario_id, conn=None):
+    conn = conn or connection
+    if not soportado(conn):
+        return
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {TABLA} WHERE rowid = %s", [usuario_id])
+
+
+def reconstruir(usuarios, conn=None):
+    """Vacía y vuelve a llenar el índice. `usuarios` es un iterable de Usuario."""
+    conn = conn or connection
+    if not soportado(conn):
+        return 0
+    filas = [(u.pk, *_documento(u)) for u in usuarios]
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {TABLA}")
+        cur.executemany(f"INSERT INTO {TABLA} (rowid, nombre, descripcion) VALUES (%s, %s, %s)", filas)
+    return len(filas)
+
+
+# --------------------------
+# DDL (usado por la migración)
+# --------------------------
+
+def crear_tabla(conn):
+    with conn.cursor() as cur:
+        if conn.vendor == "postgresql":
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLA} ("
+                f" rowid bigint PRIMARY KEY REFERENCES users_usuario(id) ON DELETE CASCADE,"
+                f" nombre text NOT NULL DEFAULT '',"
+                f" descripcion text NOT NULL DEFAULT '',"
+                f" {TABLA} tsvector GENERATED ALWAYS AS ("
+                f"  setweight(to_tsvector('{PG_CONFIG}', nombre), 'A') ||"
+                f"  setweight(to_tsvector('{PG_CONFIG}', descripcion), 'B')"
+                f" ) STORED)"
+            )
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {TABLA}_gin ON {TABLA} USING GIN ({TABLA})")
+        elif conn.vendor == "sqlite":
+            cur.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5("
+                f"nombre, descripcion, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+
+def borrar_tabla(conn):
+    if soportado(conn):
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLA}")
@@ -0,0 +1,157 @@
+# users/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from location.models import Ciudad, Direccion, Provincia
+from services.models import Calificacion, Servicio
+from users import cuidador_index, search_cache, search_index
+from users.models import Cuidador, TipoCliente, Usuario
+
+
+@receiver(post_save, sender=Usuario)
+def indexar_usuario(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    campos = set(update_fields) if update_fields else None
+    # save(update_fields=[...]) sin campos indexados (p.ej. last_login en cada login): no se reescribe
+    if campos is None or search_index.CAMPOS & campos:
+        search_index.indexar(instance)
+    if campos is None or "direccion" in campos:
+        cuidador_index.marcar(usuario_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Usuario)
+def desindexar_usuario(sender, instance, **kwargs):
+    search_index.eliminar(instance.pk)
+
+
+# --- índice columnar de búsqueda (users/cuidador_index.py) ---
+
+@receiver(post_save, sender=Cuidador)
+@receiver(post_delete, sender=Cuidador)
+def cuidador_cambiado(sender, instance, **kwargs):
+    cuidador_index.marcar(cuidador_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Cuidador.tipos_cliente.through)
+def tipos_cliente_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        cuidador_index.marcar(cuidador_ids=[instance.pk])
+    elif pk_set:
+        cuidador_index.marcar(cuidador_ids=pk_set)
+    else:
+        cuidador_index.invalidar()  # clear() desde TipoCliente
+
+
+@receiver(post_save, sender=Direccion)
+def direccion_cambiada(sender, instance, created, **kwargs):
+    if not created:
+        cuidador_index.marcar(usuario_ids=Usuario.objects.filter(direccion=instance).values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Ciudad)
+@receiver(post_delete, sender=TipoCliente)
+def catalogo_cambiado(sender, **kwargs):
+    cuidador_index.invalidar()
+
+
+# --- cache de respuestas de búsqueda (users/search_cache.py) ---
+
+# campos de Usuario que aparecen en la tarjeta o en los filtros de búsqueda
+CAMPOS_BUSQUEDA = {
+    "first_name", "last_name", "username", "email", "telefono",
+    "foto_perfil", "descripcion", "direccion",
+}
+
+
+def _ubicaciones(usuarios):
+    return list(usuarios.values_list("direccion__ciudad__provincia_id", "direccion__ciudad_id"))
+
+
+def invalidar_cuidadores(usuario_ids):
+    """Invalida las búsquedas que pueden incluir a estos usuarios (si son cuidadores)."""
+    ubicaciones = _ubicaciones(Usuario.objects.filter(id__in=usuario_ids, cuidador__isnull=False))
+    if ubicaciones:
+        search_cache.invalidar_ubicaciones(ubicaciones)
+
+
+@receiver(post_init, sender=Usuario)
+def recordar_direccion(sender, instance, **kwargs):
+    # __dict__: no disparar una consulta si el campo vino diferido
+    instance._direccion_id_original = instance.__dict__.get("direccion_id")
+
+
+@receiver(post_save, sender=Usuario)
+def usuario_cambiado_cache(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and not CAMPOS_BUSQUEDA & set(update_fields)):
+        return  # p.ej. last_login
+    anterior = instance._direccion_id_original
+    instance._direccion_id_original = instance.direccion_id
+    if not Cuidador.objects.filter(usuario_id=instance.pk).exists():
+        return
+    # la dirección anterior también: el cuidador sale de esas búsquedas
+    direcciones = {anterior, instance.direccion_id} - {None}
+    search_cache.invalidar_ubicaciones(
+        Direccion.objects.filter(id__in=direcciones).values_list("ciudad__provincia_id", "ciudad_id")
+    )
+
+
+@receiver(post_save, sender=Cuidador)
+@receiver(post_delete, sender=Cuidador)
+def cuidador_cambiado_cache(sender, instance, **kwargs):
+    search_cache.invalidar_ubicaciones(_ubicaciones(Usuario.objects.filter(id=instance.usuario_id)))
+
+
+@receiver(m2m_changed, sender=Cuidador.tipos_cliente.through)
+def tipos_cliente_cambiados_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidar_cuidadores([instance.usuario_id])
+    elif pk_set:
+        invalidar_cuidadores(Cuidador.objects.filter(id__in=pk_set).values("usuario_id"))
+    else:
+        search_cache.invalidar("global")
+
+
+@receiver(post_save, sender=Calificacion)
+@receiver(post_delete, sender=Calificacion)
+def calificacion_cambiada_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidar_cuidadores([instance.receptor_id])  # rating y reseñas de la tarjeta
+
+
+@receiver(post_init, sender=Direccion)
+def recordar_ciudad(sender, instance, **kwargs):
+    instance._ciudad_id_original = instance.__dict__.get("ciudad_id")
+
+
+@receiver(post_save, sender=Direccion)
+def direccion_cambiada_cache(sender, instance, created, raw=False, **kwargs):
+    anterior = instance._ciudad_id_original
+    instance._ciudad_id_original = instance.ciudad_id
+    if created or raw or not Cuidador.objects.filter(usuario__direccion=instance).exists():
+        return
+    search_cache.invalidar_ubicaciones(
+        Ciudad.objects.filter(id__in={anterior, instance.ciudad_id}).values_list("provincia_id", "id")
+    )
+
+
+@receiver(post_save, sender=Provincia)
+@receiver(post_delete, sender=Provincia)
+@receiver(post_save, sender=Ciudad)
+@receiver(post_delete, sender=Ciudad)
+@receiver(post_save, sender=TipoCliente)
+@receiver(post_delete, sender=TipoCliente)
+def catalogo_cambiado_cache(sender, **kwargs):
+    search_cache.invalidar("global")
+
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+@receiver(m2m_changed, sender=Servicio.dias_semanales.through)
+def agenda_cambiada_cache(sender, raw=False, action="post_", **kwargs):
+    if not raw and action.startswith("post_"):
+        search_cache.invalidar("servicios")
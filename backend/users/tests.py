@@ -1,3 +1,603 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from location.models import Provincia, Ciudad, Direccion
+from services.models import DiaSemanal, Servicio
+from services.ratings import registrar_calificacion
+from users import cuidador_index, search_cache
+from users.models import Usuario, Cliente, Cuidador, TipoCliente
+
+
+def crear_cuidador(username, anios=3, direccion=None, tipos=()):
+    user = Usuario.objects.create_user(
+        username=username, first_name=username.title(), direccion=direccion
+    )
+    cuidador = Cuidador.objects.create(usuario=user, anios_experiencia=anios)
+    if tipos:
+        cuidador.tipos_cliente.set(tipos)
+    return cuidador
+
+
+def calificar(cliente, cuidador, puntuacion):
+    now = timezone.now()
+    servicio = Servicio.objects.create(
+        cliente=cliente, receptor=cuidador.usuario,
+        fecha_inicio=now - timedelta(days=10), fecha_fin=now - timedelta(days=1),
+        descripcion="", horas_dia="4", aceptado=True,
+    )
+    calif, _ = registrar_calificacion(servicio, cliente, cuidador.usuario.id, puntuacion, "")
+    return calif
+
+
+@override_settings(SEARCH_CACHE_TTL=0)
+class CuidadorSearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        prov = Provincia.objects.create(nombre="Córdoba")
+        ciudad = Ciudad.objects.create(nombre="Córdoba", provincia=prov)
+        cls.direccion = Direccion.objects.create(direccion="Calle 1", ciudad=ciudad)
+        cls.tipo = TipoCliente.objects.create(nombre="Adultos mayores")
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+        Cliente.objects.create(usuario=cls.cliente)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _crear(self, n, offset=0):
+        for i in range(offset, offset + n):
+            c = crear_cuidador(f"cuidador{i}", anios=i, direccion=self.direccion, tipos=[self.tipo])
+            calificar(self.cliente, c, 4)
+            calificar(self.cliente, c, 5)
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/search/")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_rating_y_reviews(self):
+        self._crear(1)
+        _, response = self._count_queries()
+        card = response.json()["results"][0]
+        self.assertEqual(card["rating"], 4.5)
+        self.assertEqual(card["reviews"], 2)
+
+    def test_query_count_constante(self):
+        self._crear(2)
+        pocos, _ = self._count_queries()
+        self._crear(20, offset=2)
+        muchos, response = self._count_queries()
+        self.assertEqual(len(response.json()["results"]), 20)
+        self.assertEqual(pocos, muchos)
+
+
+@override_settings(SEARCH_CACHE_TTL=0)
+class CuidadorSearchPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+        for i in range(25):
+            # muchos empates en anios_experiencia para ejercitar el desempate por id
+            c = crear_cuidador(f"cuidador{i:02d}", anios=i % 4)
+            calificar(cls.cliente, c, 1 + i % 5)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _recorrer(self, params):
+        ids, url, paginas = [], "/api/search/", 0
+        while url:
+            r = self.client.get(url, params if paginas == 0 else None)
+            self.assertEqual(r.status_code, 200)
+            ids += [c["cuidador_id"] for c in r.json()["results"]]
+            url = r.json()["next"]
+            paginas += 1
+        return ids, paginas
+
+    def test_recorrido_completo_sin_repetidos(self):
+        ids, paginas = self._recorrer({"page_size": 10})
+        self.assertEqual(paginas, 3)
+        esperado = list(Cuidador.objects.order_by("-anios_experiencia", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, esperado)
+
+    def test_ordering_por_nombre_y_rating(self):
+        ids, _ = self._recorrer({"page_size": 7, "ordering": "usuario__first_name"})
+        esperado = list(Cuidador.objects.order_by("usuario__first_name", "id").values_list("id", flat=True))
+        self.assertEqual(ids, esperado)
+
+        ids, _ = self._recorrer({"page_size": 4, "ordering": "-rating"})
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_cursor_invalido(self):
+        r = self.client.get("/api/search/", {"cursor": "no-es-un-cursor"})
+        self.assertEqual(r.status_code, 404)
+
+    def test_cursor_con_tipos_falsificados(self):
+        def cursor(valores):
+            return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+
+        for valores in (["x", 1], [1, "y"], [[1], 1], [None, 1], [True, 1], {"v": ["x", 1]}, [1]):
+            for indice in (False, True):
+                with override_settings(SEARCH_INMEMORY_INDEX=indice):
+                    r = self.client.get("/api/search/", {"cursor": cursor(valores)})
+                self.assertEqual(r.status_code, 404, (valores, indice))
+        # el mismo tipo como texto (lo que produce un cursor legítimo) sigue andando
+        r = self.client.get("/api/search/", {"cursor": cursor(["3", 10**6])})
+        self.assertEqual(r.status_code, 200)
+        r = self.client.get("/api/search/", {"cursor": cursor(["2020-01-01T00:00:00", 1]), "ordering": "-rating"})
+        self.assertEqual(r.status_code, 404)
+
+
+@override_settings(SEARCH_CACHE_TTL=0)
+class CuidadorFullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jose = crear_cuidador("jose", anios=1)
+        cls.jose.usuario.first_name, cls.jose.usuario.last_name = "José", "Pérez"
+        cls.jose.usuario.save()
+        cls.ana = crear_cuidador("ana", anios=9)
+        cls.ana.usuario.descripcion = "Trabajé con José Ignacio, adulto mayor con Alzheimer"
+        cls.ana.usuario.save()
+        cls.otro = crear_cuidador("otro", anios=5)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _buscar(self, texto, **params):
+        r = self.client.get("/api/search/", {"search": texto, **params})
+        self.assertEqual(r.status_code, 200)
+        return [c["cuidador_id"] for c in r.json()["results"]]
+
+    def test_prefijo_sin_acentos_y_ranking(self):
+        # "jos" matchea nombre (José) y descripción (José Ignacio); el nombre rankea primero
+        self.assertEqual(self._buscar("jos"), [self.jose.id, self.ana.id])
+        self.assertEqual(self._buscar("alzh"), [self.ana.id])
+        self.assertEqual(self._buscar("perez jose"), [self.jose.id])
+
+    def test_ordering_explicito_gana(self):
+        self.assertEqual(self._buscar("jos", ordering="-anios_experiencia"), [self.ana.id, self.jose.id])
+
+    def test_paginacion_por_relevancia(self):
+        self.assertEqual(self._buscar("jos", page_size=1), [self.jose.id])
+        r = self.client.get("/api/search/", {"search": "jos", "page_size": 1})
+        r = self.client.get(r.json()["next"])
+        self.assertEqual([c["cuidador_id"] for c in r.json()["results"]], [self.ana.id])
+
+    def test_indice_sincronizado_al_guardar(self):
+        self.assertEqual(self._buscar("enfermera"), [])
+        self.otro.usuario.descripcion = "Enfermera con 5 años de experiencia"
+        self.otro.usuario.save()
+        self.assertEqual(self._buscar("enfermera"), [self.otro.id])
+        self.otro.usuario.delete()
+        self.assertEqual(self._buscar("enfermera"), [])
+
+    def test_login_no_reindexa(self):
+        usuario = self.jose.usuario
+        with mock.patch("users.signals.search_index.indexar") as indexar:
+            usuario.last_login = timezone.now()
+            usuario.save(update_fields=["last_login"])
+            indexar.assert_not_called()
+            usuario.descripcion = "Acompañante"
+            usuario.save(update_fields=["descripcion"])
+            indexar.assert_called_once_with(usuario)
+
+
+@override_settings(SEARCH_INMEMORY_INDEX=True, SEARCH_CACHE_TTL=0)
+class CuidadorIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cba = Provincia.objects.create(nombre="Córdoba")
+        cls.sfe = Provincia.objects.create(nombre="Santa Fe")
+        cls.ciudades = [
+            Ciudad.objects.create(nombre="Córdoba", provincia=cls.cba),
+            Ciudad.objects.create(nombre="Villa María", provincia=cls.cba),
+            Ciudad.objects.create(nombre="Rosario", provincia=cls.sfe),
+        ]
+        dirs = [Direccion.objects.create(direccion=f"Calle {i}", ciudad=c) for i, c in enumerate(cls.ciudades)]
+        cls.tipos = [TipoCliente.objects.create(nombre=n) for n in ("Niños", "Adultos mayores", "Discapacidad")]
+        for i in range(30):
+            crear_cuidador(f"c{i:02d}", anios=i % 7, direccion=dirs[i % 3] if i % 10 else None,
+                           tipos=cls.tipos[: 1 + i % 3])
+
+    def setUp(self):
+        self.client = APIClient()
+        cuidador_index._index = None
+
+    def _ids(self, params, indice):
+        with override_settings(SEARCH_INMEMORY_INDEX=indice):
+            ids, url, primero = [], "/api/search/", True
+            while url:
+                r = self.client.get(url, params if primero else None)
+                self.assertEqual(r.status_code, 200)
+                ids += [c["cuidador_id"] for c in r.json()["results"]]
+                url, primero = r.json()["next"], False
+            return ids
+
+    def _comparar(self, params):
+        self.assertEqual(self._ids(params, True), self._ids(params, False), params)
+
+    def test_mismos_resultados_que_el_orm(self):
+        combinaciones = [
+            {},
+            {"provincia": self.cba.id},
+            {"ciudad": self.ciudades[2].id, "page_size": 3},
+            {"min_experiencia": 4, "ordering": "anios_experiencia"},
+            {"especialidad": [self.tipos[2].id]},
+            {"provincia": self.cba.id, "especialidad": [self.tipos[1].id, self.tipos[2].id], "min_experiencia": 2, "page_size": 2},
+        ]
+        for params in combinaciones:
+            self._comparar(params)
+        self.assertIsNotNone(cuidador_index._index)
+
+    def test_refresco_incremental(self):
+        params = {"provincia": self.sfe.id, "especialidad": [self.tipos[0].id]}
+        self._comparar(params)
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = crear_cuidador(
+                "nuevo", anios=50, direccion=Direccion.objects.create(direccion="X", ciudad=self.ciudades[2]),
+                tipos=[self.tipos[0]],
+            )
+        self.assertEqual(self._ids(params, True)[0], nuevo.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.tipos_cliente.set([self.tipos[1]])
+        self.assertNotIn(nuevo.id, self._ids(params, True))
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.tipos_cliente.add(self.tipos[0])
+        self.assertIn(nuevo.id, self._ids(params, True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.usuario.direccion = None
+            nuevo.usuario.save()
+        self.assertNotIn(nuevo.id, self._ids(params, True))
+
+        otro = Cuidador.objects.filter(usuario__direccion__ciudad__provincia=self.sfe).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            otro.delete()
+        self._comparar(params)
+
+    def test_marca_recien_en_el_commit(self):
+        params = {"provincia": self.sfe.id}
+        self._comparar(params)
+        cuidador = Cuidador.objects.filter(usuario__direccion__ciudad__provincia=self.sfe).first()
+        with self.captureOnCommitCallbacks() as callbacks:
+            cuidador.anios_experiencia = 99
+            cuidador.save()
+            self.assertEqual(cuidador_index._index._sucios, set())  # todavía sin confirmar
+        for callback in callbacks:
+            callback()
+        self.assertIn(cuidador.pk, cuidador_index._index._sucios)
+        self.assertEqual(self._ids(params, True)[0], cuidador.id)
+
+    def test_consultas_no_soportadas_usan_el_orm(self):
+        self.assertIsNone(cuidador_index.filtros_desde_request(QueryDict("search=ana")))
+        self.assertIsNone(cuidador_index.filtros_desde_request(QueryDict("ordering=-rating")))
+        self.assertIsNotNone(cuidador_index.filtros_desde_request(QueryDict("provincia=1&especialidad=2")))
+
+
+@override_settings(SEARCH_CACHE_TTL=0)
+class CuidadorProximidadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cba = Provincia.objects.create(nombre="Córdoba")
+        sfe = Provincia.objects.create(nombre="Santa Fe")
+        # las coordenadas salen del nomenclátor al guardar
+        cls.cordoba = Ciudad.objects.create(nombre="Córdoba", provincia=cba)
+        cls.carlos_paz = Ciudad.objects.create(nombre="Villa Carlos Paz", provincia=cba)
+        cls.rosario = Ciudad.objects.create(nombre="Rosario", provincia=sfe)
+        cls.c_cba = crear_cuidador("cba", direccion=Direccion.objects.create(direccion="A", ciudad=cls.cordoba))
+        cls.c_vcp = crear_cuidador("vcp", direccion=Direccion.objects.create(direccion="B", ciudad=cls.carlos_paz))
+        cls.c_ros = crear_cuidador("ros", direccion=Direccion.objects.create(direccion="C", ciudad=cls.rosario))
+        # dirección con coordenadas propias (Alta Gracia), pisa las de la ciudad
+        cls.c_ag = crear_cuidador("ag", direccion=Direccion.objects.create(
+            direccion="D", ciudad=cls.cordoba, latitud=-31.6529, longitud=-64.4283))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_coordenadas_desde_nomenclator(self):
+        self.assertAlmostEqual(self.cordoba.latitud, -31.4201)
+        self.assertAlmostEqual(self.rosario.longitud, -60.6505)
+
+    def test_radio_y_orden_por_distancia(self):
+        r = self.client.get("/api/search/", {"near": "-31.4201,-64.1888", "radius_km": 50})
+        self.assertEqual(r.status_code, 200)
+        resultados = r.json()["results"]
+        self.assertEqual([c["cuidador_id"] for c in resultados], [self.c_cba.id, self.c_vcp.id, self.c_ag.id])
+        self.assertEqual(resultados[0]["distancia_km"], 0.0)
+        self.assertAlmostEqual(resultados[1]["distancia_km"], 29.8, delta=1)
+
+        r = self.client.get("/api/search/", {"near": "-31.4201,-64.1888", "radius_km": 500, "page_size": 2})
+        ids = [c["cuidador_id"] for c in r.json()["results"]]
+        r = self.client.get(r.json()["next"])
+        ids += [c["cuidador_id"] for c in r.json()["results"]]
+        self.assertEqual(ids, [self.c_cba.id, self.c_vcp.id, self.c_ag.id, self.c_ros.id])
+
+    def test_parametros_invalidos(self):
+        r = self.client.get("/api/search/", {"near": "abc"})
+        self.assertEqual(r.status_code, 400)
+
+
+@override_settings(SEARCH_CACHE_TTL=0)
+class CuidadorFacetsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cba = Provincia.objects.create(nombre="Córdoba")
+        cls.sfe = Provincia.objects.create(nombre="Santa Fe")
+        cls.cordoba = Ciudad.objects.create(nombre="Córdoba", provincia=cls.cba)
+        cls.rosario = Ciudad.objects.create(nombre="Rosario", provincia=cls.sfe)
+        d_cba = Direccion.objects.create(direccion="A", ciudad=cls.cordoba)
+        d_ros = Direccion.objects.create(direccion="B", ciudad=cls.rosario)
+        cls.ninos = TipoCliente.objects.create(nombre="Niños")
+        cls.mayores = TipoCliente.objects.create(nombre="Adultos mayores")
+        crear_cuidador("a", anios=1, direccion=d_cba, tipos=[cls.ninos, cls.mayores])
+        crear_cuidador("b", anios=4, direccion=d_cba, tipos=[cls.mayores])
+        crear_cuidador("c", anios=12, direccion=d_ros, tipos=[cls.mayores])
+        crear_cuidador("d", anios=7)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_sin_facets_por_defecto(self):
+        self.assertNotIn("facets", self.client.get("/api/search/").json())
+
+    def test_conteos(self):
+        r = self.client.get("/api/search/", {"facets": 1, "page_size": 1})
+        facets = r.json()["facets"]
+        self.assertEqual(len(r.json()["results"]), 1)
+        self.assertEqual(facets["provincia"], [
+            {"id": self.cba.id, "nombre": "Córdoba", "count": 2},
+            {"id": self.sfe.id, "nombre": "Santa Fe", "count": 1},
+        ])
+        self.assertEqual([(f["nombre"], f["count"]) for f in facets["ciudad"]], [("Córdoba", 2), ("Rosario", 1)])
+        self.assertEqual([(f["nombre"], f["count"]) for f in facets["especialidad"]], [("Adultos mayores", 3), ("Niños", 1)])
+        self.assertEqual([f["count"] for f in facets["experiencia"]], [1, 1, 1, 1])
+
+    def test_conteos_respetan_filtros(self):
+        r = self.client.get("/api/search/", {"facets": 1, "especialidad": [self.mayores.id, self.ninos.id], "provincia": self.cba.id})
+        facets = r.json()["facets"]
+        self.assertEqual(facets["provincia"], [{"id": self.cba.id, "nombre": "Córdoba", "count": 2}])
+        self.assertEqual([(f["nombre"], f["count"]) for f in facets["especialidad"]], [("Adultos mayores", 2), ("Niños", 1)])
+
+    def test_query_count_constante(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/search/", {"facets": 1})
+        pocos = len(ctx.captured_queries)
+        for i in range(5):
+            crear_cuidador(f"extra{i}", anios=i, tipos=[self.ninos])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/search/", {"facets": 1})
+        self.assertEqual(pocos, len(ctx.captured_queries))
+
+
+@override_settings(SEARCH_CACHE_TTL=60)
+class CuidadorSearchCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cba = Provincia.objects.create(nombre="Córdoba")
+        cls.sfe = Provincia.objects.create(nombre="Santa Fe")
+        cls.d_cba = Direccion.objects.create(direccion="A", ciudad=Ciudad.objects.create(nombre="Córdoba", provincia=cls.cba))
+        cls.d_ros = Direccion.objects.create(direccion="B", ciudad=Ciudad.objects.create(nombre="Rosario", provincia=cls.sfe))
+        cls.tipo = TipoCliente.objects.create(nombre="Niños")
+        cls.ana = crear_cuidador("ana", anios=5, direccion=cls.d_cba, tipos=[cls.tipo])
+        cls.beto = crear_cuidador("beto", anios=2, direccion=cls.d_ros, tipos=[cls.tipo])
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _get(self, params=None):
+        r = self.client.get("/api/search/", params or {})
+        self.assertEqual(r.status_code, 200)
+        return r
+
+    def test_miss_luego_hit(self):
+        primero = self._get({"min_experiencia": 1, "provincia": self.cba.id})
+        self.assertEqual(primero["X-Cache"], "MISS")
+        with CaptureQueriesContext(connection) as ctx:
+            segundo = self._get({"provincia": self.cba.id, "min_experiencia": 1})
+        self.assertEqual(segundo["X-Cache"], "HIT")
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(primero.json(), segundo.json())
+
+    def test_invalidacion_por_provincia(self):
+        self._get()
+        self._get({"provincia": self.cba.id})
+        self._get({"provincia": self.sfe.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            calificar(self.cliente, self.ana, 5)
+        self.assertEqual(self._get()["X-Cache"], "MISS")
+        r = self._get({"provincia": self.cba.id})
+        self.assertEqual(r["X-Cache"], "MISS")
+        self.assertEqual(r.json()["results"][0]["rating"], 5.0)
+        self.assertEqual(self._get({"provincia": self.sfe.id})["X-Cache"], "HIT")
+
+    def test_invalidacion_con_id_no_canonico(self):
+        for valor in (f"0{self.cba.id}", f"{self.cba.id} "):
+            self._get({"provincia": valor})
+            self.assertEqual(self._get({"provincia": valor})["X-Cache"], "HIT")
+        with self.captureOnCommitCallbacks(execute=True):
+            calificar(self.cliente, self.ana, 4)
+        for valor in (f"0{self.cba.id}", f"{self.cba.id} "):
+            r = self._get({"provincia": valor})
+            self.assertEqual(r["X-Cache"], "MISS", valor)
+            self.assertEqual(r.json()["results"][0]["rating"], 4.0)
+
+    def test_mudanza_invalida_origen_y_destino(self):
+        self._get({"provincia": self.cba.id})
+        self._get({"provincia": self.sfe.id})
+        usuario = Usuario.objects.get(pk=self.ana.usuario_id)
+        usuario.direccion = self.d_ros
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario.save()
+        self.assertEqual(self._get({"provincia": self.cba.id}).json()["results"], [])
+        self.assertEqual(len(self._get({"provincia": self.sfe.id}).json()["results"]), 2)
+
+    def test_last_login_no_invalida(self):
+        self._get()
+        usuario = Usuario.objects.get(pk=self.ana.usuario_id)
+        usuario.last_login = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario.save(update_fields=["last_login"])
+        self.assertEqual(self._get()["X-Cache"], "HIT")
+
+    def test_catalogo_invalida_todo(self):
+        self._get({"provincia": self.sfe.id})
+        self.tipo.nombre = "Infancias"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tipo.save()
+        self.assertEqual(self._get({"provincia": self.sfe.id})["X-Cache"], "MISS")
+
+    def test_misses_concurrentes_calculan_una_vez(self):
+        factory = APIRequestFactory()
+        request = Request(factory.get("/api/search/", {"provincia": 99}))
+        llamadas, liberar = [], threading.Event()
+
+        def calcular():
+            llamadas.append(1)
+            liberar.wait(5)
+            return {"results": []}
+
+        resultados = []
+        hilos = [threading.Thread(target=lambda: resultados.append(search_cache.obtener(request, calcular))) for _ in range(5)]
+        for h in hilos:
+            h.start()
+        liberar.set()
+        for h in hilos:
+            h.join()
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(sorted(hit for _, hit in resultados), [False, True, True, True, True])
+
+
+@override_settings(SEARCH_CACHE_TTL=0)
+class CuidadorDisponibilidadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+        cls.lunes = DiaSemanal.objects.create(nombre="Lunes")
+        cls.martes = DiaSemanal.objects.create(nombre="Martes")
+        cls.libre = crear_cuidador("libre")
+        cls.ocupado = crear_cuidador("ocupado")
+        cls.pendiente = crear_cuidador("pendiente")
+        cls.servicio = cls._servicio(cls.ocupado, "2030-03-10", "2030-03-20", aceptado=True)
+        cls.servicio.dias_semanales.set([cls.lunes])
+        cls._servicio(cls.pendiente, "2030-03-10", "2030-03-20", aceptado=False)
+
+    @classmethod
+    def _servicio(cls, cuidador, inicio, fin, aceptado):
+        tz = timezone.get_current_timezone()
+        return Servicio.objects.create(
+            cliente=cls.cliente, receptor=cuidador.usuario, descripcion="", horas_dia="4", aceptado=aceptado,
+            fecha_inicio=timezone.datetime.fromisoformat(inicio).replace(tzinfo=tz),
+            fecha_fin=timezone.datetime.fromisoformat(fin).replace(tzinfo=tz),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _usernames(self, params):
+        r = self.client.get("/api/search/", params)
+        self.assertEqual(r.status_code, 200)
+        return sorted(c["username"] for c in r.json()["results"])
+
+    def test_excluye_servicios_aceptados_superpuestos(self):
+        self.assertEqual(
+            self._usernames({"disponible_desde": "2030-03-15", "disponible_hasta": "2030-03-25"}),
+            ["libre", "pendiente"],
+        )
+
+    def test_rangos_sin_superposicion(self):
+        todos = ["libre", "ocupado", "pendiente"]
+        self.assertEqual(self._usernames({"disponible_desde": "2030-03-21", "disponible_hasta": "2030-03-30"}), todos)
+        self.assertEqual(self._usernames({"disponible_hasta": "2030-03-09"}), todos)
+        # intervalos semiabiertos: terminar justo cuando empieza el otro no es choque
+        self.assertEqual(self._usernames({"disponible_desde": "2030-03-20T00:00:00", "disponible_hasta": "2030-03-20T08:00:00"}), todos)
+        self.assertEqual(self._usernames({"disponible_desde": "2030-03-19T22:00:00", "disponible_hasta": "2030-03-20T08:00:00"}), ["libre", "pendiente"])
+
+    def test_dias(self):
+        rango = {"disponible_desde": "2030-03-12", "disponible_hasta": "2030-03-14"}
+        self.assertEqual(self._usernames({**rango, "dias": self.martes.id}), ["libre", "ocupado", "pendiente"])
+        self.assertEqual(self._usernames({**rango, "dias": [self.lunes.id, self.martes.id]}), ["libre", "pendiente"])
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get("/api/search/", {"disponible_desde": "mañana"}).status_code, 400)
+        r = self.client.get("/api/search/", {"disponible_desde": "2030-03-10", "disponible_hasta": "2030-03-01"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_query_count_no_depende_de_servicios(self):
+        params = {"disponible_desde": "2030-03-15", "disponible_hasta": "2030-03-25"}
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/search/", params)
+        pocos = len(ctx.captured_queries)
+        for i in range(10):
+            self._servicio(self.libre, f"2031-01-{i + 1:02d}", f"2031-01-{i + 2:02d}", aceptado=True)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/search/", params)
+        self.assertEqual(pocos, len(ctx.captured_queries))
+
+
+@override_settings(SEARCH_CACHE_TTL=0)
+class SparseFieldsetsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tipo = TipoCliente.objects.create(nombre="Niños")
+        cls.cuidador = crear_cuidador("ana", anios=4, tipos=[cls.tipo])
+        cls.cliente = Usuario.objects.create_user(username="cliente")
+        calificar(cls.cliente, cls.cuidador, 5)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _get(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(url, params or {})
+        self.assertEqual(r.status_code, 200)
+        return r.json(), [q["sql"] for q in ctx.captured_queries]
+
+    def test_search_fields(self):
+        completo, q_completo = self._get("/api/search/")
+        self.assertIn("especialidad", completo["results"][0])
+        data, queries = self._get("/api/search/", {"fields": "nombre,experiencia"})
+        self.assertEqual(data["results"], [{"id": self.cuidador.usuario_id, "nombre": "Ana", "experiencia": 4}])
+        self.assertLess(len(queries), len(q_completo))  # sin prefetch de tipos_cliente
+        self.assertFalse(any("rating_stats" in q for q in queries))
+
+    def test_search_fields_con_orden_por_rating(self):
+        data, _ = self._get("/api/search/", {"fields": "nombre", "ordering": "-rating"})
+        self.assertEqual(len(data["results"]), 1)
+
+    def test_campo_desconocido(self):
+        self.assertEqual(self.client.get("/api/search/", {"fields": "nombre,sueldo"}).status_code, 400)
+        self.assertEqual(self.client.get(f"/api/perfil/{self.cuidador.usuario_id}/", {"include": "fotos2"}).status_code, 400)
+
+    def test_perfil_completo_por_defecto(self):
+        data, _ = self._get(f"/api/perfil/{self.cuidador.usuario_id}/")
+        self.assertEqual(len(data["reviews"]), 1)
+        self.assertIn("certificados", data)
+
+    def test_perfil_sin_reviews_no_las_consulta(self):
+        url = f"/api/perfil/{self.cuidador.usuario_id}/"
+        data, queries = self._get(url, {"fields": "username,rating"})
+        self.assertEqual(data, {"id": self.cuidador.usuario_id, "username": "ana", "rating": 5.0})
+        self.assertFalse(any("services_calificacion" in q for q in queries))
+        self.assertFalse(any("services_certificacion" in q for q in queries))
+
+        data, queries = self._get(url, {"include": "reviews"})
+        self.assertEqual(len(data["reviews"]), 1)
+        self.assertIn("email", data)
+        self.assertNotIn("certificados", data)
+        self.assertFalse(any("services_certificacion" in q for q in queries))
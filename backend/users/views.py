@@ -10,12 +10,18 @@ from users.serializers import (
 )
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from django.db.models import Q, Avg, Count
+from django.db.models import Q, Avg, Count, FloatField
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from location.models import Provincia, Ciudad
 from rest_framework.generics import RetrieveUpdateAPIView
 from django.contrib.auth import get_user_model
+from services.models import RatingStats
+from users.pagination import KeysetPagination
+from users.fieldsets import Fieldset
+from users.filters import DisponibilidadFilter, FullTextSearchFilter, ProximidadFilter
+from users import cuidador_index, search_cache
 
 User = get_user_model()
 
@@ -60,17 +66,57 @@ class RegistroCuidadorView(CreateAPIView):
 
 class CuidadorSearchView(ListAPIView):
     """
-    Search and filter cuidadores with location, experience, and specialty filters
+    Search and filter cuidadores with location, experience, and specialty filters.
+    `?search=` uses the full-text index (prefix match, ranked by relevance).
+    `?near=lat,lng&radius_km=N` limits to cuidadores within N km, sorted by distance.
+    `?facets=1` adds counts per provincia, ciudad, especialidad and experience bucket
+    for the current filter set under "facets".
+    `?fields=id,nombre,rating` returns only those card fields (and skips the
+    joins/queries behind the rest).
+    Results are keyset-paginated: {"next": url|null, "results": [...]}
     """
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter, ProximidadFilter, DisponibilidadFilter]
+    pagination_class = KeysetPagination
     search_fields = ['usuario__first_name', 'usuario__last_name', 'usuario__descripcion']
-    ordering_fields = ['anios_experiencia', 'usuario__first_name']
+    ordering_fields = ['anios_experiencia', 'usuario__first_name', 'rating']
     ordering = ['-anios_experiencia']
+    card_fields = [
+        'id', 'cuidador_id', 'nombre', 'username', 'especialidad', 'experiencia', 'provincia', 'ciudad',
+        'rating', 'reviews', 'descripcion', 'foto_perfil', 'telefono', 'email', 'distancia_km',
+    ]
+    experiencia_buckets = [(0, 2), (3, 5), (6, 10), (11, None)]
+
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = Fieldset(self.request.query_params, self.card_fields)
+        return self._fieldset
+
+    def base_queryset(self):
+        # Rating y cantidad de reseñas salen del agregado mantenido (RatingStats):
+        # un LEFT JOIN, así toda la búsqueda cuesta un número fijo de queries.
+        # Con ?fields= sólo se traen los joins/prefetch de los campos pedidos.
+        fieldset = self.get_fieldset()
+        queryset = Cuidador.objects.select_related('usuario')
+        if fieldset.alguno('provincia', 'ciudad'):
+            queryset = queryset.select_related('usuario__direccion__ciudad__provincia')
+        if fieldset.alguno('rating', 'reviews') or 'rating' in self.request.query_params.get('ordering', ''):
+            queryset = queryset.select_related('usuario__rating_stats').annotate(
+                # promedio ordenable (sin reseñas = 0) para ?ordering=-rating
+                rating=Coalesce(
+                    Cast('usuario__rating_stats__suma', FloatField()) / NullIf('usuario__rating_stats__cantidad', 0),
+                    0.0,
+                ),
+            )
+        if 'especialidad' in fieldset:
+            queryset = queryset.prefetch_related('tipos_cliente')
+        if 'descripcion' not in fieldset:
+            queryset = queryset.defer('usuario__descripcion')
+        return queryset
 
     def get_queryset(self):
-        queryset = Cuidador.objects.select_related('usuario', 'usuario__direccion', 'usuario__direccion__ciudad', 'usuario__direccion__ciudad__provincia').prefetch_related('tipos_cliente')
-        
+        queryset = self.base_queryset()
+
         # Filter by provincia
         provincia_id = self.request.query_params.get('provincia')
         if provincia_id:
@@ -97,44 +143,135 @@ class CuidadorSearchView(ListAPIView):
         return queryset
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Calculate ratings for each cuidador
-        cuidadores_data = []
-        for cuidador in queryset:
-            # Get average rating from calificaciones
-            from services.models import Calificacion
-            ratings = Calificacion.objects.filter(receptor=cuidador.usuario)
-            avg_rating = ratings.aggregate(avg_rating=Avg('puntuacion'))['avg_rating'] or 0
-            review_count = ratings.count()
-            
-            # Get location info
+        if not search_cache.habilitado():
+            return Response(self.get_payload(request))
+        data, hit = search_cache.obtener(request, lambda: self.get_payload(request))
+        response = Response(data)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    def get_payload(self, request):
+        queryset = None
+        page = self.paginate_from_index(request)
+        if page is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+        cuidadores_data = [self.build_card(request, cuidador) for cuidador in page]
+        data = self.get_paginated_response(cuidadores_data).data
+        if request.query_params.get('facets'):
+            if queryset is None:
+                queryset = self.filter_queryset(self.get_queryset())
+            data['facets'] = self.get_facets(queryset)
+        return data
+
+    def get_facets(self, queryset):
+        """
+        Conteos para la barra de filtros sobre el conjunto ya filtrado: una
+        consulta agrupada por faceta, todas contra el mismo subquery de ids.
+        """
+        ids = queryset.order_by().values('id')
+        cuidadores = Cuidador.objects.filter(id__in=ids).order_by()
+
+        provincias = (
+            cuidadores.filter(usuario__direccion__isnull=False)
+            .values('usuario__direccion__ciudad__provincia_id', 'usuario__direccion__ciudad__provincia__nombre')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'usuario__direccion__ciudad__provincia__nombre')
+        )
+        ciudades = (
+            cuidadores.filter(usuario__direccion__isnull=False)
+            .values('usuario__direccion__ciudad_id', 'usuario__direccion__ciudad__nombre', 'usuario__direccion__ciudad__provincia_id')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'usuario__direccion__ciudad__nombre')
+        )
+        especialidades = (
+            Cuidador.tipos_cliente.through.objects.filter(cuidador_id__in=ids)
+            .values('tipocliente_id', 'tipocliente__nombre')
+            .annotate(count=Count('cuidador_id'))
+            .order_by('-count', 'tipocliente__nombre')
+        )
+        buckets = cuidadores.aggregate(**{
+            f"b{i}": Count('id', filter=Q(anios_experiencia__gte=desde) & (Q(anios_experiencia__lte=hasta) if hasta is not None else Q()))
+            for i, (desde, hasta) in enumerate(self.experiencia_buckets)
+        })
+        return {
+            'provincia': [
+                {'id': f['usuario__direccion__ciudad__provincia_id'], 'nombre': f['usuario__direccion__ciudad__provincia__nombre'], 'count': f['count']}
+                for f in provincias
+            ],
+            'ciudad': [
+                {'id': f['usuario__direccion__ciudad_id'], 'nombre': f['usuario__direccion__ciudad__nombre'],
+                 'provincia_id': f['usuario__direccion__ciudad__provincia_id'], 'count': f['count']}
+                for f in ciudades
+            ],
+            'especialidad': [
+                {'id': f['tipocliente_id'], 'nombre': f['tipocliente__nombre'], 'count': f['count']}
+                for f in especialidades
+            ],
+            'experiencia': [
+                {'desde': desde, 'hasta': hasta, 'count': buckets[f"b{i}"]}
+                for i, (desde, hasta) in enumerate(self.experiencia_buckets)
+            ],
+        }
+
+    def paginate_from_index(self, request):
+        """
+        Resuelve la página con el índice columnar en memoria si está habilitado
+        y la consulta sólo usa filtros que el índice conoce; si no, None (ORM).
+        """
+        if not cuidador_index.habilitado():
+            return None
+        filtros = cuidador_index.filtros_desde_request(request.query_params)
+        if filtros is None:
+            return None
+        ordering = cuidador_index.ORDENES_SOPORTADOS[request.query_params.get('ordering', '-anios_experiencia')]
+
+        def fetch(cursor, limite):
+            ids = cuidador_index.get_index().buscar(filtros, ordering, cursor, limite)
+            objs = self.base_queryset().in_bulk(ids)
+            return [objs[i] for i in ids if i in objs]
+
+        return self.paginator.paginate_fetch(fetch, request, ordering, Cuidador)
+
+    def build_card(self, request, cuidador):
+        fieldset = self.get_fieldset()
+        usuario = cuidador.usuario
+        card = {
+            'id': usuario.id,  # Use user ID for profile links
+            'cuidador_id': cuidador.id,  # Keep cuidador ID for reference
+            'nombre': f"{usuario.first_name} {usuario.last_name}".strip() or usuario.username,
+            'username': usuario.username,
+            'experiencia': cuidador.anios_experiencia,
+            'telefono': usuario.telefono or "",
+            'email': usuario.email,
+        }
+
+        if fieldset.alguno('rating', 'reviews'):
+            try:
+                stats = usuario.rating_stats
+            except RatingStats.DoesNotExist:
+                stats = None
+            card['rating'] = round((stats.promedio if stats else None) or 0, 1)
+            card['reviews'] = stats.cantidad if stats else 0
+
+        # Get location info
+        if fieldset.alguno('provincia', 'ciudad'):
             provincia = ""
             ciudad = ""
-            if cuidador.usuario.direccion and cuidador.usuario.direccion.ciudad:
-                ciudad = cuidador.usuario.direccion.ciudad.nombre
-                if cuidador.usuario.direccion.ciudad.provincia:
-                    provincia = cuidador.usuario.direccion.ciudad.provincia.nombre
-            
-            # Get specialties
-            especialidades = [tc.nombre for tc in cuidador.tipos_cliente.all()]
-            
-            cuidadores_data.append({
-                'id': cuidador.usuario.id,  # Use user ID for profile links
-                'cuidador_id': cuidador.id,  # Keep cuidador ID for reference
-                'nombre': f"{cuidador.usuario.first_name} {cuidador.usuario.last_name}".strip() or cuidador.usuario.username,
-                'username': cuidador.usuario.username,
-                'especialidad': especialidades,
-                'experiencia': cuidador.anios_experiencia,
-                'provincia': provincia,
-                'ciudad': ciudad,
-                'rating': round(avg_rating, 1),
-                'reviews': review_count,
-                'descripcion': cuidador.usuario.descripcion or "",
-                'foto_perfil': request.build_absolute_uri(cuidador.usuario.foto_perfil.url) if cuidador.usuario.foto_perfil else None,
-                'telefono': cuidador.usuario.telefono or "",
-                'email': cuidador.usuario.email,
-            })
-        
-        return Response(cuidadores_data)
+            if usuario.direccion and usuario.direccion.ciudad:
+                ciudad = usuario.direccion.ciudad.nombre
+                if usuario.direccion.ciudad.provincia:
+                    provincia = usuario.direccion.ciudad.provincia.nombre
+            card['provincia'] = provincia
+            card['ciudad'] = ciudad
 
+        # Get specialties
+        if 'especialidad' in fieldset:
+            card['especialidad'] = [tc.nombre for tc in cuidador.tipos_cliente.all()]
+        if 'descripcion' in fieldset:
+            card['descripcion'] = usuario.descripcion or ""
+        if 'foto_perfil' in fieldset:
+            card['foto_perfil'] = request.build_absolute_uri(usuario.foto_perfil.url) if usuario.foto_perfil else None
+        if hasattr(cuidador, 'distancia_km'):
+            card['distancia_km'] = round(cuidador.distancia_km, 1)
+        return fieldset.recortar(card)
@@ -1,6 +1,5 @@
 # users/views_public.py
 from django.utils.timezone import localtime
-from django.db.models import Avg, Count
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
@@ -9,7 +8,8 @@ from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
 from location.models import Direccion
 from users.models import Cliente, Cuidador, TipoCliente, FotoCliente
-from services.models import Calificacion, Experiencia, Certificacion
+from users.fieldsets import Fieldset
+from services.models import Calificacion, Experiencia, Certificacion, RatingStats
 
 User = get_user_model()
 
@@ -22,10 +22,26 @@ def _full_media_url(request, f):
         return ""
 
 class PerfilPublicoView(APIView):
+    """
+    GET /api/perfil/<pk>/ — perfil público completo.
+    `?fields=` recorta los campos y `?include=reviews,experiencias,certificados,fotos`
+    elige las relaciones; con cualquiera de los dos, las relaciones no pedidas
+    no se consultan. Sin parámetros devuelve todo.
+    """
     permission_classes = [AllowAny]
+    campos = [
+        "id", "username", "first_name", "last_name", "email", "telefono", "direccion",
+        "fecha_nacimiento", "descripcion", "foto_perfil", "categorias", "provincia", "ciudad",
+        "rating", "reviews_count", "experiencia", "especialidad", "precio", "disponible", "tipo_usuario",
+    ]
+    incluibles = ["reviews", "experiencias", "certificados", "fotos"]
 
     def get(self, request, pk: int):
-        user = get_object_or_404(User, pk=pk)
+        fieldset = Fieldset(request.query_params, self.campos, self.incluibles)
+        user = get_object_or_404(
+            User.objects.select_related("cliente", "cuidador", "direccion__ciudad__provincia"),
+            pk=pk,
+        )
 
         es_cliente = hasattr(user, "cliente")
         es_cuidador = hasattr(user, "cuidador")
@@ -43,47 +59,49 @@ class PerfilPublicoView(APIView):
         foto_perfil = _full_media_url(request, user.foto_perfil) if user.foto_perfil else ""
 
         categorias = []
-        if es_cuidador:
-            categorias = list(user.cuidador.tipos_cliente.values_list("nombre", flat=True))
-        elif es_cliente:
-            categorias = list(user.cliente.tipos_cliente.values_list("nombre", flat=True))
+        if "categorias" in fieldset:
+            if es_cuidador:
+                categorias = list(user.cuidador.tipos_cliente.values_list("nombre", flat=True))
+            elif es_cliente:
+                categorias = list(user.cliente.tipos_cliente.values_list("nombre", flat=True))
 
         fotos = []
-        if es_cliente:
+        if es_cliente and "fotos" in fieldset:
             fotos = [
                 _full_media_url(request, f.imagen)
                 for f in user.cliente.fotos.all()
             ]
 
-        agg = Calificacion.objects.filter(receptor=user).aggregate(
-            rating=Avg("puntuacion"),
-            total=Count("id"),
-        )
-        rating = round(agg["rating"], 2) if agg["rating"] is not None else None
-        reviews_total = agg["total"] or 0
-
-        # listado (paginable si quieres; aquí mandamos las últimas 20)
-        califs_qs = (
-            Calificacion.objects
-            .filter(receptor=user)
-            .select_related("autor")
-            .order_by("-creado_en")[:20]
-        )
+        rating = None
+        reviews_total = 0
+        if fieldset.alguno("rating", "reviews_count"):
+            stats = RatingStats.objects.filter(receptor=user).first()
+            rating = round(stats.promedio, 2) if stats and stats.promedio is not None else None
+            reviews_total = stats.cantidad if stats else 0
 
         def _author_name(u: User) -> str: # type: ignore
             full = f"{u.first_name or ''} {u.last_name or ''}".strip()
             return full or u.username
-        
-        reviews = [
-            {
-                "id": c.id,
-                "rating": c.puntuacion,
-                "author": _author_name(c.autor),
-                "date": c.creado_en.strftime("%d/%m/%Y"),
-                "comment": c.comentario or "",
-            }
-            for c in califs_qs
-        ]
+
+        reviews = []
+        if "reviews" in fieldset:
+            # listado (paginable si quieres; aquí mandamos las últimas 20)
+            califs_qs = (
+                Calificacion.objects
+                .filter(receptor=user)
+                .select_related("autor")
+                .order_by("-creado_en")[:20]
+            )
+            reviews = [
+                {
+                    "id": c.id,
+                    "rating": c.puntuacion,
+                    "author": _author_name(c.autor),
+                    "date": c.creado_en.strftime("%d/%m/%Y"),
+                    "comment": c.comentario or "",
+                }
+                for c in califs_qs
+            ]
 
         experiencias = []
         certificados = []
@@ -93,21 +111,23 @@ class PerfilPublicoView(APIView):
             experiencia_anios = user.cuidador.anios_experiencia
             especialidad = user.descripcion_min or None
 
-            experiencias = [
-                {
-                    "descripcion": e.descripcion,
-                    "fecha_inicio": e.fecha_inicio.isoformat(),
-                    "fecha_fin": e.fecha_fin.isoformat(),
-                }
-                for e in Experiencia.objects.filter(cuidador=user).order_by("-fecha_fin", "-fecha_inicio")
-            ]
-            certificados = [
-                {
-                    "file": _full_media_url(request, c.archivo),
-                    "name": c.nombre,  
-                }
-                for c in Certificacion.objects.filter(cuidador=user).order_by("nombre")
-            ]
+            if "experiencias" in fieldset:
+                experiencias = [
+                    {
+                        "descripcion": e.descripcion,
+                        "fecha_inicio": e.fecha_inicio.isoformat(),
+                        "fecha_fin": e.fecha_fin.isoformat(),
+                    }
+                    for e in Experiencia.objects.filter(cuidador=user).order_by("-fecha_fin", "-fecha_inicio")
+                ]
+            if "certificados" in fieldset:
+                certificados = [
+                    {
+                        "file": _full_media_url(request, c.archivo),
+                        "name": c.nombre,
+                    }
+                    for c in Certificacion.objects.filter(cuidador=user).order_by("nombre")
+                ]
 
         payload = {
             "id": user.id,
@@ -135,4 +155,4 @@ class PerfilPublicoView(APIView):
             "certificados": certificados, 
             "experiencias": experiencias, 
         }
-        return Response(payload)
+        return Response(fieldset.recortar(payload))
@@ -8,7 +8,7 @@ import { Badge } from "@/components/ui/badge";
 import { Skeleton } from "@/components/ui/skeleton";
 import { Send, Phone, Video, MoreVertical } from "lucide-react";
 import { apiGet } from "@/lib/api";
-import { Conversation, Message } from "@/lib/types";
+import { Conversation, Message, MessagePage } from "@/lib/types";
 import { set } from "date-fns";
 import { toast } from "sonner";
 import PageTitle from "@/components/ui/title";
@@ -58,8 +58,8 @@ export default function Chat() {
   useEffect(() => {
     if (selectedChat !== null) {
       setLoadingMessages(true);
-      apiGet<Message[]>(`/conversaciones/${selectedChat}/mensajes/`)
-        .then(setMessages)
+      apiGet<MessagePage>(`/conversaciones/${selectedChat}/mensajes/`)
+        .then((page) => setMessages(page.results))
         .catch(() => {
           toast.error("No se pudieron cargar los mensajes.");
           setMessages([
@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Label } from "@/components/ui/label";
@@ -22,10 +22,22 @@ import { SolicitarServicioModal } from "@/components/ui/SolicitarServicioModal";
 import { toast } from "sonner";
 import { apiGet, apiPost } from "@/lib/api";
 
+type Facet = { id: number; nombre: string; count: number };
+type SearchPage = {
+  next: string | null;
+  results: any[];
+  facets?: { provincia: Facet[]; ciudad: Facet[]; especialidad: Facet[] };
+};
+
+// /api/search/ pagina por cursor: el link "next" trae el cursor de la próxima página
+const cursorFrom = (next: string | null) =>
+  next ? new URL(next, window.location.origin).searchParams.get("cursor") : null;
+
 export default function BuscarCuidadoresPage() {
   const [filters, setFilters] = useState({
     especialidad: [] as number[],
-    disponibilidad: "",
+    disponible_desde: "",
+    disponible_hasta: "",
     experiencia: "",
   });
   const [orden, setOrden] = useState("");
@@ -44,6 +56,11 @@ export default function BuscarCuidadoresPage() {
   const [diasSemanales, setDiasSemanales] = useState<any[]>([]);
   const [horariosDiarios, setHorariosDiarios] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [facets, setFacets] = useState<SearchPage["facets"]>();
+  const [loadingMore, setLoadingMore] = useState(false);
+  const lastParams = useRef<any>({});
+  const sentinelRef = useRef<HTMLDivElement | null>(null);
 
 
   const handleFilterChange = (field: string, value: string) => {
@@ -73,13 +90,15 @@ export default function BuscarCuidadoresPage() {
       try {
         setLoading(true);
         const [cuidadoresData, servicios, provinciasData, diasData, horariosData] = await Promise.all([
-          apiGet<any[]>("/search/"),
+          apiGet<SearchPage>("/search/", { facets: 1 }),
           apiGet<any[]>("/tipos-cliente/"),
           apiGet<any[]>("/provincias/"),
           apiGet<any[]>("/dias-semanales/"),
           apiGet<any[]>("/horarios-diarios/"),
         ]);
-        setCuidadores(cuidadoresData);
+        setCuidadores(cuidadoresData.results);
+        setNextCursor(cursorFrom(cuidadoresData.next));
+        setFacets(cuidadoresData.facets);
         setServiciosDisponibles(servicios);
         setProvincias(provinciasData);
         setDiasSemanales(diasData);
@@ -122,12 +141,17 @@ export default function BuscarCuidadoresPage() {
       if (provincia) searchParams.provincia = provincia;
       if (ciudad) searchParams.ciudad = ciudad;
       if (filters.experiencia) searchParams.min_experiencia = filters.experiencia;
+      if (filters.disponible_desde) searchParams.disponible_desde = filters.disponible_desde;
+      if (filters.disponible_hasta) searchParams.disponible_hasta = filters.disponible_hasta;
       if (filters.especialidad.length > 0) searchParams.especialidad = filters.especialidad;
       if (orden) searchParams.ordering = orden;
 
-      const cuidadoresData = await apiGet<any[]>("/search/", searchParams);
-      console.log(cuidadoresData);
-      setCuidadores(cuidadoresData);
+      lastParams.current = searchParams;
+      // los conteos del sidebar vienen en la misma respuesta (facets)
+      const cuidadoresData = await apiGet<SearchPage>("/search/", { ...searchParams, facets: 1 });
+      setCuidadores(cuidadoresData.results);
+      setNextCursor(cursorFrom(cuidadoresData.next));
+      setFacets(cuidadoresData.facets);
     } catch (error) {
       console.error("Error al buscar cuidadores:", error);
       toast.error("Error al buscar cuidadores.");
@@ -142,6 +166,32 @@ export default function BuscarCuidadoresPage() {
     }
   }, [provincia, ciudad, filters, orden]);
 
+  // Scroll infinito: pide sólo la página siguiente al cursor, nunca re-descarga las anteriores
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await apiGet<SearchPage>("/search/", { ...lastParams.current, cursor: nextCursor });
+      setCuidadores((prev) => [...prev, ...page.results]);
+      setNextCursor(cursorFrom(page.next));
+    } catch (error) {
+      console.error("Error al cargar más cuidadores:", error);
+      toast.error("Error al cargar más cuidadores.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  useEffect(() => {
+    const el = sentinelRef.current;
+    if (!el || !nextCursor) return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) loadMore();
+    });
+    observer.observe(el);
+    return () => observer.disconnect();
+  }, [nextCursor, loadingMore]);
+
   const handleSolicitud = async (formData: any) => {
     if (!selectedCuidador) return;
     
@@ -213,7 +263,13 @@ export default function BuscarCuidadoresPage() {
       setModalOpen(false);
     } catch (error) {
       console.error("Error sending solicitud:", error);
-      toast.error("Error al enviar la solicitud. Inténtalo de nuevo.");
+      // 400 con "horario": el cuidador ya tiene un servicio aceptado en esos días y franja
+      const choque = error instanceof Error && error.message.includes('"horario"');
+      toast.error(
+        choque
+          ? "El cuidador ya tiene un servicio en ese horario. Probá otros días o franja."
+          : "Error al enviar la solicitud. Inténtalo de nuevo."
+      );
     } finally {
       setModalLoading(false);
     }
@@ -257,6 +313,11 @@ export default function BuscarCuidadoresPage() {
                       />
                       <label htmlFor={servicio.id.toString()}>
                         {servicio.nombre}
+                        {facets && (
+                          <span className="text-gray-400 ml-1">
+                            ({facets.especialidad.find((f) => f.id === servicio.id)?.count ?? 0})
+                          </span>
+                        )}
                       </label>
                     </div>
                   ))}
@@ -322,12 +383,30 @@ export default function BuscarCuidadoresPage() {
                 </Select>
               </div>
 
+              <div>
+                <Label>Disponible entre</Label>
+                <div className="space-y-2">
+                  <Input
+                    type="date"
+                    value={filters.disponible_desde}
+                    onChange={(e) => handleFilterChange("disponible_desde", e.target.value)}
+                  />
+                  <Input
+                    type="date"
+                    value={filters.disponible_hasta}
+                    min={filters.disponible_desde || undefined}
+                    onChange={(e) => handleFilterChange("disponible_hasta", e.target.value)}
+                  />
+                </div>
+              </div>
+
               <Button
                 variant="outline"
                 onClick={() => {
                   setFilters({
                     especialidad: [],
-                    disponibilidad: "",
+                    disponible_desde: "",
+                    disponible_hasta: "",
                     experiencia: "",
                   });
                   setProvincia("");
@@ -439,6 +518,11 @@ export default function BuscarCuidadoresPage() {
             </Card>
           ))
           )}
+          {!loading && nextCursor && (
+            <div ref={sentinelRef} className="text-center py-4 text-gray-500">
+              {loadingMore ? "Cargando más cuidadores..." : ""}
+            </div>
+          )}
         </div>
       </div>
 
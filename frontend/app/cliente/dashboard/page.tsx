@@ -22,6 +22,8 @@ import { useUser } from "@/context/UserContext";
 import { CalificarModal } from "@/components/ui/CalificarModal";
 import { ReviewCard } from "@/components/ui/ReviewCard";
 import { Flag } from "lucide-react";
+import type { EstadoServicio, ServicioPage } from "@/lib/types";
+import { CalendarioMes } from "@/components/ui/calendarioMes";
 
 type UsuarioMini = { id: number; username: string; first_name?: string; last_name?: string; foto_perfil?: string };
 type CalificacionMini = { puntuacion: number; comentario?: string | null; creado_en: string } | null;
@@ -33,6 +35,7 @@ type ServicioRead = {
   fecha_fin: string;
   descripcion: string;
   horas_dia: string;
+  estado: EstadoServicio;
   aceptado: boolean;
   en_curso: boolean;
   calificacion_cliente: CalificacionMini;
@@ -66,17 +69,18 @@ export default function ClienteDashboard() {
       try {
         
         const [recientes, proximos, recibidas] = await Promise.all([
-          apiGet<ServicioRead[]>("/servicios", {
+          apiGet<ServicioPage<ServicioRead>>("/servicios", {
             cliente_id: user.id,
             aceptado: "true",
             fecha_inicio_before: nowISO,
             ordering: "-fecha_inicio",
           }),
-          apiGet<ServicioRead[]>("/servicios", {
+          apiGet<ServicioPage<ServicioRead>>("/servicios", {
             cliente_id: user.id,
             fecha_inicio_after: nowISO,
             ordering: "-fecha_inicio",
             aceptado: "true",
+            page_size: 100,
 
           }),
           apiGet<any[]>("/calificaciones", { receptor_id: user.id }),
@@ -85,10 +89,10 @@ export default function ClienteDashboard() {
 
         if (!ac.signal.aborted) {
           // Filter out active services from recent services
-          const serviciosCompletados = recientes.filter((s) => !s.en_curso);
+          const serviciosCompletados = recientes.results.filter((s) => !s.en_curso);
           setRecentServices(serviciosCompletados.slice(0, 5));
-          setUpcomingServices(proximos);
-          const servicioActivo = recientes.find((s) => s.en_curso);
+          setUpcomingServices(proximos.results);
+          const servicioActivo = recientes.results.find((s) => s.en_curso);
           setCurrentService(servicioActivo || null);
           setNeedsCarer(!servicioActivo);
           setReviews(recibidas);
@@ -248,6 +252,8 @@ export default function ClienteDashboard() {
           </Card>
         </div>
 
+        <CalendarioMes />
+
         {/* Recent Activity */}
         <div className="grid lg:grid-cols-2 gap-8">
           {/* Recent Services */}
@@ -4,7 +4,7 @@ import { useEffect, useState } from "react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
-import { ServicioDTO, Solicitud } from "@/lib/types";
+import { CuidadorStats, ServicioPage, Solicitud } from "@/lib/types";
 
 import { Heart, Bell, History, User, MessageCircle, Calendar, DollarSign, Star } from "lucide-react";
 import Link from "next/link";
@@ -23,6 +23,7 @@ import { DetalleSolicitudModal } from "@/components/ui/serviceModal";
 import { ReviewCard } from "@/components/ui/ReviewCard";
 import { useUser } from "@/context/UserContext";
 import { mapServiciosToUI } from "@/lib/mappers/servicios";
+import { CalendarioMes } from "@/components/ui/calendarioMes";
 
 
 export default function CuidadorDashboard() {
@@ -35,6 +36,9 @@ export default function CuidadorDashboard() {
   serviciosCompletados: 0,
   calificacionPromedio: 0,
   solicitudesPendientes: 0,
+  enCurso: 0,
+  horasServidas: 0,
+  tendencia: null as CuidadorStats["tendencia"] | null,
 });
 
 
@@ -50,7 +54,7 @@ useEffect(() => {
     
     try {
 
-      const s = await apiGet<{ pendientes: number; completados: number; calificacion_promedio: number }>(
+      const s = await apiGet<CuidadorStats>(
         "/servicios/stats/cuidador/",
         { receptor_id: user.id }
       );
@@ -59,17 +63,20 @@ useEffect(() => {
           serviciosCompletados: s.completados,
           calificacionPromedio: s.calificacion_promedio,
           solicitudesPendientes: s.pendientes,
+          enCurso: s.en_curso,
+          horasServidas: s.horas_servidas,
+          tendencia: s.tendencia,
         });
       }
       
-      const data = await apiGet<ServicioDTO[]>("/servicios/", {
+      const data = await apiGet<ServicioPage>("/servicios/", {
         receptor_id: uid,           
-        aceptado: "false",          
+        estado: "pendiente",        // sin aceptar y todavía no empezadas
         ordering: "-fecha_inicio",
+        page_size: 100,
       });
-      console.log("Solicitudes cargadas:", data);
 
-      if (!ac.signal.aborted) setSolicitudes(mapServiciosToUI(data) as unknown as Solicitud[]);
+      if (!ac.signal.aborted) setSolicitudes(mapServiciosToUI(data.results) as unknown as Solicitud[]);
 
       // cargar calificaciones recibidas por el cuidador
       const califs = await apiGet<any[]>("/calificaciones", { receptor_id: uid });
@@ -186,6 +193,19 @@ useEffect(() => {
           </Card>
         </div>
 
+        <p className="text-sm text-gray-600 -mt-4 mb-8">
+          En curso: <b>{stats.enCurso}</b> · Horas servidas: <b>{stats.horasServidas}</b>
+          {stats.tendencia && (
+            <>
+              {" "}· Últimos {stats.tendencia.dias} días: <b>{stats.tendencia.completados}</b> completados
+              ({stats.tendencia.completados >= stats.tendencia.completados_previos ? "▲" : "▼"}{" "}
+              {stats.tendencia.completados_previos} el período anterior), <b>{stats.tendencia.horas}</b> h
+            </>
+          )}
+        </p>
+
+        <CalendarioMes />
+
         <Card className="mb-8">
           <CardHeader>
             <CardTitle className="flex items-center">
@@ -12,7 +12,7 @@ import { DetalleSolicitudModal } from "@/components/ui/serviceModal";
 
 import { apiGet } from "@/lib/api";
 import { useUser } from "@/context/UserContext";
-import type { Solicitud, ServicioDTO } from "@/lib/types";
+import type { Solicitud, ServicioPage } from "@/lib/types";
 import { mapServiciosToUI } from "@/lib/mappers/servicios";
 
 type Props = { tipoUsuario: "cliente" | "cuidador" };
@@ -33,9 +33,9 @@ export default function SolicitudesServicios({ tipoUsuario }: Props) {
         // Armamos los filtros según el tipo de usuario
         
 
-        const rows = await apiGet<ServicioDTO[]>("/servicios", { receptor_id: uid, aceptado: "false", ordering: "-fecha_inicio" });
+        const page = await apiGet<ServicioPage>("/servicios", { receptor_id: uid, estado: "pendiente", ordering: "-fecha_inicio", page_size: 100 });
         if (!ac.signal.aborted) {
-          setSolicitudes(mapServiciosToUI(rows) as unknown as Solicitud[]);
+          setSolicitudes(mapServiciosToUI(page.results) as unknown as Solicitud[]);
         }
       } catch {
         if (!ac.signal.aborted) {
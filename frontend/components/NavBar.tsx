@@ -5,6 +5,7 @@ import { useUser } from "@/context/UserContext"
 import LogoutButton from "@/components/LogoutButton"
 import { useEffect, useState } from "react"
 import { apiGet } from "@/lib/api"
+import { onChatEvent } from "@/lib/realtime"
 
 export default function NavBar() {
   const user = useUser()
@@ -39,6 +40,15 @@ export default function NavBar() {
     return () => window.removeEventListener('refreshUnreadStatus', handleRefreshUnread)
   }, [user])
 
+  // Push del backend: el badge se actualiza sin volver a pedir /unread
+  useEffect(() => {
+    if (!user) return
+    return onChatEvent((e) => {
+      if (e.type === "unread") setHasUnread(e.has_unread)
+      else if (e.type === "resync") fetchUnread()
+    })
+  }, [user])
+
   return (
     <header className="bg-white shadow-sm border-b">
       <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8">
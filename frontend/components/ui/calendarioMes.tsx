@@ -0,0 +1,117 @@
+"use client";
+
+import { useEffect, useMemo, useState } from "react";
+import { CalendarDays, Link2 } from "lucide-react";
+import { toast } from "sonner";
+
+import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
+import { Button } from "@/components/ui/button";
+import { Skeleton } from "@/components/ui/skeleton";
+import { apiGet, apiPost } from "@/lib/api";
+import type { Ocurrencia } from "@/lib/types";
+
+const iso = (d: Date) =>
+  `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, "0")}-${String(d.getDate()).padStart(2, "0")}`;
+
+const hhmm = (s: string) => new Date(s).toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" });
+
+/** Visitas del mes (las expande el backend) y link de suscripción .ics. */
+export function CalendarioMes() {
+  const [mes, setMes] = useState(() => {
+    const hoy = new Date();
+    return new Date(hoy.getFullYear(), hoy.getMonth(), 1);
+  });
+  const [ocurrencias, setOcurrencias] = useState<Ocurrencia[]>([]);
+  const [loading, setLoading] = useState(true);
+
+  useEffect(() => {
+    const ac = new AbortController();
+    setLoading(true);
+    const siguiente = new Date(mes.getFullYear(), mes.getMonth() + 1, 1);
+    apiGet<{ ocurrencias: Ocurrencia[] }>("/servicios/calendario/", { desde: iso(mes), hasta: iso(siguiente) })
+      .then((data) => { if (!ac.signal.aborted) setOcurrencias(data.ocurrencias); })
+      .catch(() => { if (!ac.signal.aborted) toast.error("No se pudo cargar el calendario."); })
+      .finally(() => { if (!ac.signal.aborted) setLoading(false); });
+    return () => ac.abort();
+  }, [mes]);
+
+  const porDia = useMemo(() => {
+    const grupos = new Map<string, Ocurrencia[]>();
+    ocurrencias.forEach((o) => grupos.set(o.fecha, [...(grupos.get(o.fecha) ?? []), o]));
+    return Array.from(grupos.entries());
+  }, [ocurrencias]);
+
+  const suscribirse = async () => {
+    try {
+      const { url } = await apiGet<{ url: string; webcal: string }>("/servicios/calendario/suscripcion/");
+      await navigator.clipboard.writeText(url);
+      toast.success("Link copiado: pegalo en tu app de calendario para suscribirte");
+    } catch {
+      toast.error("No se pudo obtener el link del calendario.");
+    }
+  };
+
+  // POST: invalida los links entregados antes (por si se compartió) y copia uno nuevo
+  const regenerar = async () => {
+    try {
+      const { url } = await apiPost<{ url: string; webcal: string }>("/servicios/calendario/suscripcion/", {});
+      await navigator.clipboard.writeText(url);
+      toast.success("Link nuevo copiado: los anteriores dejaron de funcionar");
+    } catch {
+      toast.error("No se pudo regenerar el link del calendario.");
+    }
+  };
+
+  const mover = (delta: number) => setMes((m) => new Date(m.getFullYear(), m.getMonth() + delta, 1));
+
+  return (
+    <Card className="mb-8">
+      <CardHeader>
+        <CardTitle className="flex items-center justify-between">
+          <span className="flex items-center">
+            <CalendarDays className="h-5 w-5 mr-2" />
+            Mi calendario
+          </span>
+          <span className="flex gap-2">
+            <Button size="sm" variant="outline" onClick={suscribirse}>
+              <Link2 className="h-4 w-4 mr-1" /> Suscribirse
+            </Button>
+            <Button size="sm" variant="ghost" onClick={regenerar}>
+              Regenerar link
+            </Button>
+          </span>
+        </CardTitle>
+      </CardHeader>
+      <CardContent>
+        <div className="flex items-center justify-between mb-4">
+          <Button size="sm" variant="ghost" onClick={() => mover(-1)}>‹</Button>
+          <span className="font-medium capitalize">
+            {mes.toLocaleDateString([], { month: "long", year: "numeric" })}
+          </span>
+          <Button size="sm" variant="ghost" onClick={() => mover(1)}>›</Button>
+        </div>
+        {loading ? (
+          <Skeleton className="h-24 w-full rounded-lg" />
+        ) : porDia.length === 0 ? (
+          <p className="text-center text-gray-600">No hay visitas este mes</p>
+        ) : (
+          <div className="max-h-96 overflow-y-auto space-y-3 pr-2">
+            {porDia.map(([fecha, visitas]) => (
+              <div key={fecha}>
+                <p className="text-sm font-semibold text-gray-700">
+                  {new Date(`${fecha}T00:00:00`).toLocaleDateString([], { weekday: "long", day: "numeric" })}
+                </p>
+                {visitas.map((v) => (
+                  <div key={`${v.servicio}-${v.inicio}`} className="flex justify-between text-sm p-2 bg-blue-50 rounded">
+                    <span>{v.contraparte.nombre}</span>
+                    <span className="text-blue-600">{hhmm(v.inicio)} - {hhmm(v.fin)}</span>
+                  </div>
+                ))}
+              </div>
+            ))}
+          </div>
+        )}
+      </CardContent>
+    </Card>
+  );
+}
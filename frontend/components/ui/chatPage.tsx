@@ -1,14 +1,15 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Input } from "@/components/ui/input";
 import { Badge } from "@/components/ui/badge";
 import { Skeleton } from "@/components/ui/skeleton";
-import { Send, MessageSquare } from "lucide-react";
+import { Send, MessageSquare, Search } from "lucide-react";
 import { apiGet, apiPost } from "@/lib/api";
-import { Conversation, Message } from "@/lib/types";
+import { onChatEvent, send } from "@/lib/realtime";
+import { ChatSync, Conversation, Message, MessagePage, MessageSearchResult } from "@/lib/types";
 import { toast } from "sonner";
 import { useSearchParams, useRouter } from "next/navigation";
 import { useUserContext } from "@/context/UserContext";
@@ -22,16 +23,32 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
   const [messages, setMessages] = useState<Message[]>([]);
   const [loadingConversations, setLoadingConversations] = useState(true);
   const [loadingMessages, setLoadingMessages] = useState(false);
+  const [olderCursor, setOlderCursor] = useState<number | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const [newerCursor, setNewerCursor] = useState<number | null>(null);
+  const [query, setQuery] = useState("");
+  const [searchResults, setSearchResults] = useState<MessageSearchResult[]>([]);
+  // salto desde un resultado de búsqueda: ?around=<id> al cargar la conversación
+  const jumpTo = useRef<{ conversacion: number; around: number } | null>(null);
+  const [reloadKey, setReloadKey] = useState(0);
+  const messagesRef = useRef<HTMLDivElement | null>(null);
   const search = useSearchParams();
   const router = useRouter();
   const { refreshUnreadStatus } = useUserContext();
 
+  // token de /conversaciones/sync/: se toma antes de la carga completa
+  const syncToken = useRef<string | null>(null);
+
   // CARGAR CONVERSACIONES
   useEffect(() => {
     let abort = false;
     setLoadingConversations(true);
 
-    apiGet<Conversation[]>("/conversaciones/")
+    apiGet<{ token: string }>("/conversaciones/sync/")
+      .then(({ token }) => {
+        syncToken.current = token;
+        return apiGet<Conversation[]>("/conversaciones/");
+      })
       .then((data) => {
         if (abort) return;
         setConversations(data);
@@ -59,10 +76,19 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
     let abort = false;
     setLoadingMessages(true);
 
-    apiGet<Message[]>(`/conversaciones/${selectedChat}/mensajes/`)
-      .then(async (data) => {
+    const salto = jumpTo.current?.conversacion === selectedChat ? jumpTo.current : null;
+    jumpTo.current = null;
+    apiGet<MessagePage>(`/conversaciones/${selectedChat}/mensajes/`, salto ? { around: salto.around } : undefined)
+      .then(async (page) => {
         if (abort) return;
-        setMessages(data);
+        setMessages(page.results);
+        setOlderCursor(page.older);
+        setNewerCursor(page.newer);
+        if (salto) {
+          requestAnimationFrame(() =>
+            document.getElementById(`msg-${salto.around}`)?.scrollIntoView({ block: "center" })
+          );
+        }
         let currentConvo = conversations.find(c => c.id === selectedChat)
         if (currentConvo) {
           currentConvo.noLeidos = 0;
@@ -77,17 +103,163 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
       .finally(() => !abort && setLoadingMessages(false));
 
     return () => { abort = true; };
-  }, [selectedChat]);
+  }, [selectedChat, reloadKey]);
+
+  // BÚSQUEDA EN MENSAJES (full-text en el backend)
+  useEffect(() => {
+    const q = query.trim();
+    if (!q) {
+      setSearchResults([]);
+      return;
+    }
+    const t = setTimeout(() => {
+      apiGet<{ results: MessageSearchResult[] }>("/mensajes/", { search: q })
+        .then((data) => setSearchResults(data.results))
+        .catch(() => toast.error("No se pudo buscar en los mensajes."));
+    }, 300);
+    return () => clearTimeout(t);
+  }, [query]);
+
+  const markAllRead = async () => {
+    try {
+      await apiPost<{ count: number }>("/conversaciones/leer-todo/", {});
+      setConversations((prev) => prev.map((c) => ({ ...c, noLeidos: 0 })));
+      await refreshUnreadStatus();
+    } catch {
+      toast.error("No se pudieron marcar como leídas.");
+    }
+  };
+
+  const openResult = (r: MessageSearchResult) => {
+    jumpTo.current = { conversacion: r.conversacion, around: r.cursor.around };
+    setQuery("");
+    if (r.conversacion === selectedChat) setReloadKey((k) => k + 1);
+    else setSelectedChat(r.conversacion);
+  };
+
+  // HISTORIAL: al llegar arriba se pide la ventana anterior (?before=)
+  const loadOlder = async () => {
+    if (selectedChat == null || olderCursor == null || loadingOlder) return;
+    const el = messagesRef.current;
+    const prevHeight = el?.scrollHeight ?? 0;
+    try {
+      setLoadingOlder(true);
+      const page = await apiGet<MessagePage>(`/conversaciones/${selectedChat}/mensajes/`, { before: olderCursor });
+      setMessages((prev) => [...page.results, ...prev]);
+      setOlderCursor(page.older);
+      // mantener a la vista el mensaje que estaba arriba
+      requestAnimationFrame(() => {
+        if (el) el.scrollTop = el.scrollHeight - prevHeight;
+      });
+    } catch {
+      toast.error("No se pudieron cargar mensajes anteriores.");
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  // ESCRIBIENDO: aviso a lo sumo cada 3s mientras se tipea, y fin al enviar
+  const typingTimers = useRef<Record<number, ReturnType<typeof setTimeout>>>({});
+  const lastTypingSent = useRef(0);
+  const notifyTyping = (activo: boolean) => {
+    if (selectedChat == null) return;
+    const now = Date.now();
+    if (activo && now - lastTypingSent.current < 3000) return;
+    lastTypingSent.current = activo ? now : 0;
+    send({ type: "escribiendo", conversacion: selectedChat, activo });
+  };
+
+  // MENSAJES EN VIVO (WebSocket)
+  const selectedRef = useRef<number | null>(null);
+  selectedRef.current = selectedChat;
+  // viendo una ventana vieja (salto de búsqueda): no pegar mensajes nuevos al final
+  const atBottomRef = useRef(true);
+  atBottomRef.current = newerCursor == null;
+
+  // PONERSE AL DÍA (reconexión o cola desbordada): sólo los cambios desde el token
+  const applySync = async () => {
+    if (syncToken.current == null) return;
+    try {
+      let data: ChatSync;
+      do {
+        data = await apiGet<ChatSync>("/conversaciones/sync/", { since: syncToken.current });
+        syncToken.current = data.token;
+        const nuevos = data.mensajes.filter((m) => m.conversacion === selectedRef.current).map((m) => m.mensaje);
+        if (nuevos.length && atBottomRef.current) {
+          setMessages((prev) => [...prev, ...nuevos.filter((n) => !prev.some((m) => m.id === n.id))]);
+        }
+        const cambiadas = new Map(data.conversaciones.map((c) => [c.id, c]));
+        if (cambiadas.size) {
+          setConversations((prev) => [
+            ...data.conversaciones,
+            ...prev.filter((c) => !cambiadas.has(c.id)),
+          ]);
+        }
+      } while (data.has_more);
+    } catch {
+      // el próximo resync vuelve a intentar desde el mismo token
+    }
+  };
+
+  useEffect(() => {
+    return onChatEvent((e) => {
+      if (e.type === "resync") {
+        applySync();
+        return;
+      }
+      if (e.type === "presencia") {
+        setConversations((prev) => prev.map((c) => (c.user_id === e.usuario ? { ...c, enLinea: e.en_linea } : c)));
+        return;
+      }
+      if (e.type === "escribiendo") {
+        setConversations((prev) =>
+          prev.map((c) => (c.id === e.conversacion ? { ...c, escribiendo: e.activo } : c))
+        );
+        // sin aviso de fin (pestaña cerrada), se apaga solo como en el backend
+        if (e.activo) {
+          clearTimeout(typingTimers.current[e.conversacion]);
+          typingTimers.current[e.conversacion] = setTimeout(() => {
+            setConversations((prev) =>
+              prev.map((c) => (c.id === e.conversacion ? { ...c, escribiendo: false } : c))
+            );
+          }, 8000);
+        }
+        return;
+      }
+      if (e.type !== "mensaje") return;
+      const abierta = e.conversacion === selectedRef.current;
+      if (abierta && atBottomRef.current) {
+        // el POST propio ya lo agregó: no duplicar
+        setMessages((prev) => (prev.some((m) => m.id === e.mensaje.id) ? prev : [...prev, e.mensaje]));
+      }
+      setConversations((prev) =>
+        prev
+          .map((c) =>
+            c.id === e.conversacion
+              ? {
+                  ...c,
+                  escribiendo: e.mensaje.isOwn ? c.escribiendo : false,
+                  ultimoMensaje: e.mensaje.content,
+                  hora: e.mensaje.time,
+                  noLeidos: abierta || e.mensaje.isOwn ? c.noLeidos : c.noLeidos + 1,
+                }
+              : c
+          )
+          .sort((a, b) => (a.id === e.conversacion ? -1 : b.id === e.conversacion ? 1 : 0))
+      );
+    });
+  }, []);
 
   // ENVIAR MENSAJE
   const handleSendMessage = async () => {
     if (!newMessage.trim() || selectedChat == null) return;
     const content = newMessage.trim();
     setNewMessage("");
+    notifyTyping(false);
 
     try {
       const created = await apiPost<Message>(`/conversaciones/${selectedChat}/mensajes/`, { content });
-      setMessages((prev) => [...prev, created]);
+      setMessages((prev) => (prev.some((m) => m.id === created.id) ? prev : [...prev, created]));
       // Opcional: mover conversación arriba y reset contador no leídos en UI
       setConversations((prev) =>
         prev
@@ -108,9 +280,48 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
       <div className="grid lg:grid-cols-3 gap-6 h-[600px]">
         {/* LISTA DE CONVERSACIONES */}
         <Card className="lg:col-span-1">
-          <CardHeader><CardTitle>Conversaciones</CardTitle></CardHeader>
+          <CardHeader className="space-y-3">
+            <div className="flex items-center justify-between">
+              <CardTitle>Conversaciones</CardTitle>
+              {conversations.some((c) => c.noLeidos > 0) && (
+                <Button variant="ghost" size="sm" onClick={markAllRead}>
+                  Marcar todo como leído
+                </Button>
+              )}
+            </div>
+            <div className="relative">
+              <Search className="absolute left-2 top-2.5 h-4 w-4 text-gray-400" />
+              <Input
+                value={query}
+                onChange={(e) => setQuery(e.target.value)}
+                placeholder="Buscar en mensajes..."
+                className="pl-8"
+              />
+            </div>
+          </CardHeader>
           <CardContent className="p-0 overflow-y-auto">
-            {loadingConversations ? (
+            {query.trim() ? (
+              searchResults.length === 0 ? (
+                <p className="p-4 text-sm text-gray-500">Sin resultados.</p>
+              ) : (
+                searchResults.map((r) => (
+                  <div key={r.id} onClick={() => openResult(r)} className="p-4 cursor-pointer hover:bg-gray-50">
+                    <div className="flex justify-between mb-1">
+                      <h4 className="text-sm font-medium">
+                        {conversations.find((c) => c.id === r.conversacion)?.nombre ?? r.sender}
+                      </h4>
+                      <span className="text-xs text-gray-500">{r.time}</span>
+                    </div>
+                    <p className="text-sm text-gray-600">
+                      {/* el backend marca las coincidencias con [[ ]] */}
+                      {r.snippet.split(/(\[\[.*?\]\])/).map((part, i) =>
+                        part.startsWith("[[") ? <mark key={i}>{part.slice(2, -2)}</mark> : part
+                      )}
+                    </p>
+                  </div>
+                ))
+              )
+            ) : loadingConversations ? (
               <div className="space-y-4 p-4">
                 {[1,2,3].map(i => <Skeleton key={i} className="h-16 w-full bg-gray-300" />)}
               </div>
@@ -138,7 +349,10 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
                       </div>
                       <div className="ml-3">
                         <h4 className="font-medium">{conversation.nombre}</h4>
-                        <p className="text-xs text-gray-500">{conversation.tipo}</p>
+                        <p className="text-xs text-gray-500">
+                          {conversation.tipo}
+                          {conversation.enLinea && <span className="text-green-600"> · En línea</span>}
+                        </p>
                       </div>
                     </div>
                     <div className="text-right">
@@ -148,7 +362,9 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
                       )}
                     </div>
                   </div>
-                  <p className="text-sm text-gray-600 truncate">{conversation.ultimoMensaje}</p>
+                  <p className="text-sm text-gray-600 truncate">
+                    {conversation.escribiendo ? <em className="text-blue-600">escribiendo...</em> : conversation.ultimoMensaje}
+                  </p>
                 </div>
               ))
             )}
@@ -178,13 +394,25 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
                       >
                         <h3 className="font-semibold">{selectedConversation.nombre}</h3>
                       </Link>
+                      <p className="text-xs text-gray-500">
+                        {selectedConversation.escribiendo
+                          ? "escribiendo..."
+                          : selectedConversation.enLinea
+                          ? "En línea"
+                          : ""}
+                      </p>
                     </div>
                   </div>
                   <div className="flex space-x-2" />
                 </div>
               </CardHeader>
 
-              <CardContent className="flex-1 overflow-y-auto p-4">
+              <CardContent
+                ref={messagesRef}
+                className="flex-1 overflow-y-auto p-4"
+                onScroll={(e) => e.currentTarget.scrollTop === 0 && loadOlder()}
+              >
+                {loadingOlder && <Skeleton className="h-6 w-1/3 mx-auto mb-4 bg-gray-300" />}
                 {messages.length === 0 ? (
                   <div className="h-full w-full flex items-center justify-center">
                     <div className="text-center">
@@ -196,7 +424,7 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
                 ) : (
                   <div className="space-y-4">
                     {messages.map((m) => (
-                      <div key={m.id} className={`flex ${m.isOwn ? "justify-end" : "justify-start"}`}>
+                      <div key={m.id} id={`msg-${m.id}`} className={`flex ${m.isOwn ? "justify-end" : "justify-start"}`}>
                         <div className={`max-w-xs lg:max-w-md px-4 py-2 rounded-lg ${m.isOwn ? "bg-blue-500 text-white" : "bg-gray-200 text-gray-900"}`}>
                           <p className="text-sm">{m.content}</p>
                           <p className={`text-xs mt-1 ${m.isOwn ? "text-blue-100" : "text-gray-500"}`}>{m.time}</p>
@@ -205,13 +433,23 @@ export default function ChatPage({ tipoUsuario }: { tipoUsuario: "cliente" | "cu
                     ))}
                   </div>
                 )}
+                {newerCursor != null && (
+                  <div className="text-center mt-4">
+                    <Button variant="outline" size="sm" onClick={() => setReloadKey((k) => k + 1)}>
+                      Ir a los mensajes más recientes
+                    </Button>
+                  </div>
+                )}
               </CardContent>
 
               <div className="border-t p-4">
                 <div className="flex space-x-2">
                   <Input
                     value={newMessage}
-                    onChange={(e) => setNewMessage(e.target.value)}
+                    onChange={(e) => {
+                      setNewMessage(e.target.value);
+                      notifyTyping(e.target.value.trim() !== "");
+                    }}
                     placeholder="Escribe un mensaje..."
                     onKeyDown={(e) => e.key === "Enter" && handleSendMessage()}
                     className="flex-1"
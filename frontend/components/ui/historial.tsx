@@ -17,6 +17,7 @@ import { DetalleSolicitudModal } from "@/components/ui/serviceModal";
 import { apiGet, apiPost } from "@/lib/api";
 import { useRouter } from "next/navigation";
 import { useUser } from "@/context/UserContext";
+import type { EstadoServicio, ServicioPage } from "@/lib/types";
 import {
   Tooltip,
   TooltipContent,
@@ -48,6 +49,7 @@ type ServicioRead = {
   fecha_fin: string;
   descripcion: string;
   horas_dia: string;
+  estado: EstadoServicio;
   aceptado: boolean;
   en_curso: boolean;
   calificacion_cliente: CalificacionMini; // hecha por el cliente
@@ -90,13 +92,24 @@ export function HistorialServicios({ tipoUsuario }: Props) {
         const params: Record<string, string | number> = {
           aceptado: "true", // string en lugar de boolean
           ordering: "-fecha_inicio",
+          page_size: 100,
           ...(tipoUsuario === "cuidador"
             ? { receptor_id: user.id }
             : { cliente_id: user.id }),
         };
 
         // Historico = aceptados y no-futuros (excluye futura agenda)
-        const data = await apiGet<ServicioRead[]>("/servicios", params);
+        // el listado viene paginado por cursor: seguimos `next` hasta el final
+        const data: ServicioRead[] = [];
+        let cursor: string | null = null;
+        do {
+          const page: ServicioPage<ServicioRead> = await apiGet<ServicioPage<ServicioRead>>(
+            "/servicios",
+            cursor ? { ...params, cursor } : params,
+          );
+          data.push(...page.results);
+          cursor = page.next ? new URL(page.next, window.location.origin).searchParams.get("cursor") : null;
+        } while (cursor && !ac.signal.aborted);
 
         if (!ac.signal.aborted) setRows(data);
       } catch {
@@ -171,6 +184,17 @@ export function HistorialServicios({ tipoUsuario }: Props) {
     };
   };
 
+  // POST /servicios/{id}/cancelar/ (409 si ya terminó o ya estaba cancelado)
+  const cancelarServicio = async (s: ServicioRead) => {
+    try {
+      await apiPost(`/servicios/${s.id}/cancelar/`, {});
+      toast.success("Servicio cancelado");
+      setRows((prev) => prev.filter((r) => r.id !== s.id));
+    } catch {
+      toast.error("No se pudo cancelar el servicio");
+    }
+  };
+
   const enviarCalificacion = async (puntuacion: number, comentario: string) => {
     if (!seleccion) return;
     try {
@@ -278,6 +302,11 @@ export function HistorialServicios({ tipoUsuario }: Props) {
                   <Link href={perfilHref}>
                     <Button variant="outline">Ver perfil</Button>
                   </Link>
+                  {s.estado === "aceptado" && (
+                    <Button variant="outline" onClick={() => cancelarServicio(s)}>
+                      Cancelar
+                    </Button>
+                  )}
                   
                   {s.en_curso || s.fecha_inicio > nowISO ? (
                     <TooltipProvider delayDuration={100}>
@@ -55,7 +55,9 @@ export function DetalleSolicitudModal({
       // Remover del listado local (ya no es pendiente)
       actualizarSolicitudes((prev) => prev.filter((s) => s.id !== solicitud.id));
     } catch (err) {
-      toast.error("Error al aceptar solicitud");
+      // 409: choca con otro servicio ya aceptado (mismos días y franja)
+      const choque = err instanceof Error && err.message.includes('"conflictos"');
+      toast.error(choque ? "Ya tenés un servicio aceptado en ese horario" : "Error al aceptar solicitud");
     } finally {
       setLoading(false);
       onOpenChange(false);
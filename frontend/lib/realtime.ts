@@ -0,0 +1,70 @@
+// lib/realtime.ts
+// WebSocket de chat (/ws/chat/ del backend). Se autentica con la cookie del
+// access token (mismo host), así que no hace falta exponer el JWT al JS.
+import { Message } from "@/lib/types";
+
+export type ChatEvent =
+  | { type: "mensaje"; conversacion: number; mensaje: Message }
+  | { type: "unread"; count: number; has_unread: boolean }
+  | { type: "resync" }
+  | { type: "presencia"; usuario: number; en_linea: boolean }
+  | { type: "escribiendo"; conversacion: number; usuario: number; activo: boolean }
+  | { type: "pong" };
+
+type Listener = (e: ChatEvent) => void;
+
+const listeners = new Set<Listener>();
+let socket: WebSocket | null = null;
+let retry = 0;
+let timer: ReturnType<typeof setTimeout> | null = null;
+let heartbeat: ReturnType<typeof setInterval> | null = null;
+// el backend da por desconectado a quien no hace ping en CHAT_PRESENCIA_TTL (60s)
+const HEARTBEAT_MS = 25000;
+
+function wsUrl() {
+  if (process.env.NEXT_PUBLIC_WS_URL) return process.env.NEXT_PUBLIC_WS_URL;
+  const proto = window.location.protocol === "https:" ? "wss" : "ws";
+  return `${proto}://${window.location.hostname}:8000/ws/chat/`;
+}
+
+function connect() {
+  if (socket || listeners.size === 0) return;
+  socket = new WebSocket(wsUrl());
+  socket.onopen = () => {
+    // al reconectar pudo perderse algo: que cada vista se ponga al día
+    if (retry > 0) listeners.forEach((l) => l({ type: "resync" }));
+    retry = 0;
+    heartbeat = setInterval(() => send({ type: "ping" }), HEARTBEAT_MS);
+  };
+  socket.onmessage = (msg) => {
+    const event = JSON.parse(msg.data) as ChatEvent;
+    listeners.forEach((l) => l(event));
+  };
+  socket.onclose = (ev) => {
+    socket = null;
+    if (heartbeat) clearInterval(heartbeat);
+    heartbeat = null;
+    if (ev.code === 4401 || listeners.size === 0) return; // sin sesión: no reintentar
+    // backoff exponencial hasta 30s
+    timer = setTimeout(connect, Math.min(30000, 1000 * 2 ** retry++));
+  };
+}
+
+// Manda un evento al backend si el socket está abierto (si no, se descarta).
+export function send(event: { type: "ping" } | { type: "escribiendo"; conversacion: number; activo: boolean }) {
+  if (socket?.readyState === WebSocket.OPEN) socket.send(JSON.stringify(event));
+}
+
+// Suscribe un listener; devuelve la función para desuscribir (para useEffect).
+export function onChatEvent(listener: Listener) {
+  listeners.add(listener);
+  connect();
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0) {
+      if (timer) clearTimeout(timer);
+      socket?.close(1000);
+      socket = null;
+    }
+  };
+}
@@ -6,6 +6,8 @@ export type Conversation = {
   hora: string;      
   noLeidos: number;
   user_id: number;
+  enLinea: boolean;
+  escribiendo: boolean;
 };
 
 export type Message = {
@@ -16,6 +18,34 @@ export type Message = {
   isOwn: boolean;
 };
 
+// GET /conversaciones/{id}/mensajes/ : ventana del historial (older/newer = anclas para ?before= / ?after=)
+export type MessagePage = {
+  results: Message[];
+  older: number | null;
+  newer: number | null;
+};
+
+// GET /mensajes/?search= : resultado con fragmento y ancla para abrirlo (?around=)
+export type MessageSearchResult = {
+  id: number;
+  conversacion: number;
+  sender: string;
+  snippet: string;
+  time: string;
+  isOwn: boolean;
+  cursor: { around: number };
+};
+
+// GET /conversaciones/sync/?since=<token> : lo que cambió desde el token
+export type ChatSync = {
+  token: string;
+  has_more: boolean;
+  mensajes: { conversacion: number; mensaje: Message }[];
+  conversaciones: Conversation[];
+  lecturas: { conversacion: number; ultimo_leido: number; no_leidos: number }[];
+  unread: { count: number; has_unread: boolean; version: number };
+};
+
 export interface Solicitud {
   id: number;
   id_cliente: number;
@@ -58,7 +88,49 @@ export type ServicioDTO = {
   descripcion: string;
   horas_dia: string;
   dias_semanales: Array<number | { id: number; nombre?: string }>;
-  aceptado: boolean;
+  dias_mask?: number;      // bit 0 = lunes ... bit 6 = domingo
+  minuto_inicio?: number;  // franja diaria [inicio, fin) en minutos
+  minuto_fin?: number;
+  estado: EstadoServicio;
+  aceptado: boolean;         // derivado de estado (aceptado, en curso o completado)
+};
+
+// ciclo de vida del servicio (services/estados.py); se filtra con ?estado=
+export type EstadoServicio = "pendiente" | "aceptado" | "en_curso" | "completado" | "cancelado" | "vencido";
+
+// GET /servicios/ : listado paginado por cursor (page_size hasta 100)
+export type ServicioPage<T = ServicioDTO> = {
+  next: string | null;
+  results: T[];
+};
+
+// GET /servicios/calendario/?desde=&hasta= : visitas concretas de los servicios aceptados
+export type Ocurrencia = {
+  servicio: number;
+  fecha: string;   // YYYY-MM-DD
+  inicio: string;  // ISO
+  fin: string;     // ISO
+  descripcion: string;
+  rol: "cliente" | "cuidador";
+  contraparte: { id: number; nombre: string };
+};
+
+// GET /servicios/stats/cuidador/?receptor_id=
+export type CuidadorStats = {
+  pendientes: number;
+  completados: number;
+  calificacion_promedio: number;
+  calificaciones: number;
+  en_curso: number;
+  horas_servidas: number;
+  tendencia: {
+    dias: number;
+    completados: number;
+    completados_previos: number;
+    horas: number;
+    horas_previas: number;
+    calificacion_promedio: number | null;
+  };
 };
 
 export type Review = {